@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cassette import cassette_adapter
+from deadlines import DeadlineExceeded, request_timeout
+from latency_stats import endpoint_key, recorder, request_bytes
+from tracing import CORRELATION_HEADER, tracer
+
+# Shared HTTP sessions for the setup scripts.
+#
+# Each thread of each process gets its own requests.Session, so keep-alive
+# connections are reused across calls instead of opening a new connection for
+# every request. Worker processes started by --shards never share a pool with
+# their parent.
+#
+# Inside a retryable_errors() block (which is how RetryQueue runs its tasks)
+# a connection failure or a transient status such as 503 raises
+# RetryableError instead of reaching the endpoint wrapper. The queue can then
+# retry the task later, instead of the wrapper printing an error and moving on.
+#
+# When a token manager is installed (see token_manager.py), bearer tokens are
+# swapped for the latest token of their account just before sending, and a
+# 401 response is retried once with a freshly obtained token.
+#
+# Every request's latency is recorded per endpoint (see latency_stats.py).
+# Every request runs in its own trace span and carries that span's id in an
+# X-Correlation-ID header (see tracing.py).
+#
+# Requests that do not set a timeout get one from deadlines.py, clipped to
+# the step's deadline when it has one.
+#
+# With PARIDHI_CASSETTE set, sessions record their traffic to a cassette or
+# replay it from one instead of the network (see cassette.py).
+
+# API configuration; PARIDHI_BASE_URL points every script at another backend
+BASE_URL = os.environ.get("PARIDHI_BASE_URL", "http://localhost:8080").rstrip("/")
+
+POOL_SIZE = 10
+
+# Statuses that say "try again later" rather than "this request is wrong"
+RETRY_STATUSES = frozenset({408, 429, 502, 503, 504})
+
+# Credentials are not written to dead-letter files; replay logs in again
+REDACTED_HEADERS = ("Authorization", "Cookie")
+REDACTED = "<redacted>"
+
+_local = threading.local()
+_token_manager = None
+
+
+def set_token_manager(manager):
+    """Route bearer tokens of every session through manager"""
+    global _token_manager
+    _token_manager = manager
+
+
+def _bearer_token(headers):
+    value = (headers or {}).get("Authorization", "")
+    return value[7:] if value.startswith("Bearer ") else None
+
+
+def _with_token(kwargs, token):
+    kwargs = dict(kwargs)
+    kwargs["headers"] = dict(kwargs["headers"], Authorization=f"Bearer {token}")
+    return kwargs
+
+
+class RetryableError(Exception):
+    """A request failed transiently; carries enough to resend it later"""
+
+    def __init__(self, message, request, retry_after=None):
+        super().__init__(message)
+        self.request = request
+        self.retry_after = retry_after
+
+
+def describe_request(method, url, kwargs):
+    """JSON-serialisable description of a request, for dead-letter files
+
+    Authorization and Cookie headers are replaced by REDACTED.
+    """
+    request = {"method": method.upper(), "url": url}
+    for key in ("headers", "params", "json"):
+        if kwargs.get(key):
+            request[key] = dict(kwargs[key]) if key == "headers" else kwargs[key]
+    for header in REDACTED_HEADERS:
+        if header in request.get("headers", {}):
+            request["headers"][header] = REDACTED
+    data = kwargs.get("data")
+    if data:
+        request["data"] = data if isinstance(data, (str, dict)) else str(data)
+    files = kwargs.get("files")
+    if files:
+        # Uploads are recorded by path and reopened on replay
+        request["files"] = {field: [name, getattr(f, "name", None), mime]
+                            for field, (name, f, mime) in files.items()}
+    return request
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+
+class ApiSession(requests.Session):
+    """requests.Session with token refresh that raises RetryableError inside retryable_errors()"""
+
+    def request(self, method, url, **kwargs):
+        token = _bearer_token(kwargs.get("headers")) if _token_manager else None
+        if token:
+            current = _token_manager.current(token)
+            if current and current != token:
+                kwargs, token = _with_token(kwargs, current), current
+
+        response = self._send(method, url, kwargs)
+
+        if response.status_code == 401 and token:
+            fresh = _token_manager.refresh(token)
+            if fresh:
+                # Uploads have been read once already
+                for value in (kwargs.get("files") or {}).values():
+                    if hasattr(value[1], "seek"):
+                        value[1].seek(0)
+                response = self._send(method, url, _with_token(kwargs, fresh))
+        return response
+
+    def _timed(self, method, url, kwargs):
+        with tracer.span(endpoint_key(method, url)[1], "http") as span:
+            kwargs = dict(kwargs, headers=dict(kwargs.get("headers") or {}, **{CORRELATION_HEADER: span.id}))
+            kwargs.setdefault("timeout", request_timeout())
+            start = time.perf_counter()
+            response = super().request(method, url, **kwargs)
+            recorder.record(method, url, time.perf_counter() - start, request_bytes(kwargs))
+            span.args["status"] = response.status_code
+        return response
+
+    def _send(self, method, url, kwargs):
+        if not getattr(_local, "retryable", False):
+            return self._timed(method, url, kwargs)
+        try:
+            response = self._timed(method, url, kwargs)
+        except DeadlineExceeded:
+            raise
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise RetryableError(str(e), describe_request(method, url, kwargs)) from e
+        if response.status_code in RETRY_STATUSES:
+            raise RetryableError(f"{response.status_code} - {response.text[:200]}",
+                                 describe_request(method, url, kwargs), _retry_after(response))
+        return response
+
+
+@contextmanager
+def retryable_errors():
+    """Raise RetryableError for transient failures of requests made in this block"""
+    previous = getattr(_local, "retryable", False)
+    _local.retryable = True
+    try:
+        yield
+    finally:
+        _local.retryable = previous
+
+
+def new_session(pool_size=POOL_SIZE):
+    """Create a requests session with a connection pool of the given size"""
+    session = ApiSession()
+    adapter = cassette_adapter(pool_size) or HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session():
+    """Return the session for the current process and thread"""
+    session = getattr(_local, "session", None)
+    if session is None or _local.pid != os.getpid():
+        session = new_session()
+        _local.session = session
+        _local.pid = os.getpid()
+    return session
@@ -0,0 +1,297 @@
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import string
+import sys
+import tempfile
+import timeit
+
+from entities import COMBO_SPECS, combo_members, find_event_poster, group_by_domain, normalize_name
+from mrd_report import build_report, load_columns
+from records import format_timestamp, make_group, mrd_writer
+
+# Micro-benchmarks for the scripts' pure helpers.
+#
+# Every case builds synthetic input of a given scale (number of names, links,
+# files, events or users) outside the timed region, then times one call of
+# the code under test over that input. timeit's autorange picks how many
+# calls make one sample; the best and median of the samples are kept, with
+# the time per item. Results are appended to BENCHMARK_FILE so run-benchmarks.py
+# can compare a run against the previous one.
+#
+# Helpers that still live in hyphenated scripts are loaded with importlib.
+# Cases that build files on disk are capped at FILESYSTEM_LIMIT items.
+
+BENCHMARK_FILE = os.path.join("logs", "benchmarks.jsonl")
+SCALES = (10, 100, 1000, 10000, 100000, 1000000)
+FILESYSTEM_LIMIT = 100000
+DEFAULT_REPEAT = 3
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DOMAINS = ("ROBOTICS", "CODING", "GAMING", "GENERAL", "ELECTRICAL", "CIVIL")
+YEARS = ("1st Year", "2nd year", "Third Year", "fourth year", "4th Year", "3rd year", "Final Year", "")
+IMAGE_NAMES = (".jpg", ".JPEG", ".png", ".webp", ".txt", ".pdf")
+
+_scripts = {}
+
+
+def load_script(filename):
+    """Import a hyphenated script such as create-combos.py as a module"""
+    module = _scripts.get(filename)
+    if module is None:
+        name = filename[:-3].replace('-', '_')
+        spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPTS_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _scripts[filename] = module
+    return module
+
+
+def _word(rng, low=3, high=10):
+    return "".join(rng.choices(string.ascii_letters, k=rng.randint(low, high)))
+
+
+def _event_name(rng):
+    return " ".join(_word(rng) for _ in range(rng.randint(1, 4))) + rng.choice(("", " 2.0", " (Solo)", "!"))
+
+
+class Case:
+    """One benchmark: setup(scale, rng, tmp) builds the input, run(data) is timed"""
+
+    def __init__(self, name, setup, run, limit=None):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.limit = limit
+
+    def scales(self, scales):
+        return [scale for scale in scales if self.limit is None or scale <= self.limit]
+
+
+# normalize_name and find_event_poster (upload-event-posters.py)
+
+def _normalize_setup(scale, rng, tmp):
+    return normalize_name, [_event_name(rng) for _ in range(scale)]
+
+
+def _normalize_run(data):
+    normalize_name, names = data
+    for name in names:
+        normalize_name(name)
+
+
+def _poster_setup(scale, rng, tmp):
+    """A posters directory of `scale` files and a mix of lookups
+
+    The lookups hit an exact DOMAIN_EventName file, a fuzzy match, a domain
+    poster fallback and a miss, which is what upload-event-posters.py sees.
+    """
+    posters_dir = os.path.join(tmp, "posters")
+    os.makedirs(posters_dir)
+    names = {"CODING_CodeQuest.jpg", "zz_gaming_valorant_cup_final.png", "ROBOTICS.png"}
+    while len(names) < scale:
+        names.add(f"{rng.choice(DOMAINS)}_{_word(rng, 6, 14)}.{rng.choice(('jpg', 'png'))}")
+    for name in names:
+        open(os.path.join(posters_dir, name), 'w').close()
+    lookups = [("CODING", "Code Quest"), ("GAMING", "Valorant Cup"), ("ROBOTICS", "Line Follower"),
+               ("CIVIL", "Bridge It")]
+    return find_event_poster, posters_dir, lookups
+
+
+def _poster_run(data):
+    find_event_poster, posters_dir, lookups = data
+    for domain, name in lookups:
+        find_event_poster(posters_dir, domain, name)
+
+
+# clean_link, convert_year_format and extract_google_drive_id (create-megatronix-team.py)
+
+def _links(rng, scale):
+    kinds = (lambda: f"https://www.{_word(rng)}.com/in/{_word(rng)}",
+             lambda: f"www.instagram.com/{_word(rng)}",
+             lambda: f"github.com/{_word(rng)}",
+             lambda: rng.choice(("", "N/A", "null", "None", "n/ a")),
+             lambda: f"http://{_word(rng)}.in")
+    return [rng.choice(kinds)() for _ in range(scale)]
+
+
+def _clean_link_setup(scale, rng, tmp):
+    return load_script("create-megatronix-team.py").clean_link, _links(rng, scale)
+
+
+def _year_setup(scale, rng, tmp):
+    return load_script("create-megatronix-team.py").convert_year_format, [rng.choice(YEARS) for _ in range(scale)]
+
+
+def _drive_setup(scale, rng, tmp):
+    links = [rng.choice((f"https://drive.google.com/open?id={_word(rng, 20, 33)}",
+                         f"https://drive.google.com/file/d/{_word(rng, 20, 33)}/view",
+                         ""))
+             for _ in range(scale)]
+    return load_script("create-megatronix-team.py").extract_google_drive_id, links
+
+
+def _map_run(data):
+    function, values = data
+    for value in values:
+        function(value)
+
+
+# collect_all_images (upload-gallery-images.py)
+
+def _gallery_setup(scale, rng, tmp):
+    """A gallery tree of `scale` files, 100 per directory, some not images"""
+    gallery = os.path.join(tmp, "gallery")
+    for index in range(scale):
+        directory = os.path.join(gallery, f"album{index // 100:05d}")
+        if index % 100 == 0:
+            os.makedirs(directory)
+        open(os.path.join(directory, f"IMG_{index:07d}{rng.choice(IMAGE_NAMES)}"), 'w').close()
+    return load_script("upload-gallery-images.py").collect_all_images, gallery
+
+
+def _gallery_run(data):
+    collect_all_images, gallery = data
+    collect_all_images(gallery)
+
+
+# Combo matching (create-combos.py)
+
+def _combo_setup(scale, rng, tmp):
+    """`scale` events over the combo domains, with each combo's events near the end"""
+    domains = sorted({spec['domain'] for spec in COMBO_SPECS} | set(DOMAINS))
+    events = [{"name": _event_name(rng), "domain": rng.choice(domains)} for _ in range(scale)]
+    for spec in COMBO_SPECS:
+        for fragment in spec['events'] or ():
+            events.insert(rng.randint(len(events) * 3 // 4, len(events)),
+                          {"name": f"{_word(rng)} {fragment}", "domain": spec['domain']})
+    return COMBO_SPECS, events
+
+
+def _combo_run(data):
+    specs, events = data
+    events_by_domain = group_by_domain(events)
+    for spec in specs:
+        combo_members(spec, events_by_domain)
+
+
+# users.json load and dump
+
+def _user(rng, index):
+    return {
+        "name": f"{_word(rng)} {_word(rng)}",
+        "email": f"user{index}@example.com",
+        "password": _word(rng, 10, 16),
+        "contact": "".join(rng.choices(string.digits, k=10)),
+        "college": f"College {rng.randrange(200)}",
+        "year": rng.choice(("FIRST", "SECOND", "THIRD", "FOURTH")),
+        "department": rng.choice(("CSE", "ECE", "ME", "CE", "IT", "EE")),
+        "rollNo": f"R{index:07d}",
+        "jwt": "eyJ" + _word(rng, 120, 160),
+        "gids": [f"PD-2025-{rng.getrandbits(32):08X}" for _ in range(rng.randint(0, 3))]
+    }
+
+
+def _users_dump_setup(scale, rng, tmp):
+    return {"users": [_user(rng, index) for index in range(scale)]}, os.path.join(tmp, "users.json")
+
+
+def _users_dump_run(data):
+    users, path = data
+    with open(path, 'w') as f:
+        json.dump(users, f, indent=2)
+
+
+def _users_load_setup(scale, rng, tmp):
+    data = _users_dump_setup(scale, rng, tmp)
+    _users_dump_run(data)
+    return data[1]
+
+
+def _users_load_run(path):
+    with open(path, 'r') as f:
+        json.load(f)
+
+
+# mrd-report.py, from the column cache and from the JSON
+
+def _mrd_report_setup(scale, rng, tmp):
+    path = os.path.join(tmp, "mrd_data.json")
+    with mrd_writer(path) as writer:
+        for index in range(0, scale, 5):
+            user = _user(rng, index)
+            records = [{"id": index + offset, "gid": f"PD-2025-{index + offset:08X}",
+                        "hasPaid": rng.random() < 0.4,
+                        "registeredAt": format_timestamp(1738368000 + rng.randrange(3 * 86400))}
+                       for offset in range(min(5, scale - index))]
+            writer.write(make_group(user, records))
+    cache_dir = os.path.join(tmp, "cache")
+    # Both paths must give the same report; this also warms the cache
+    cached = build_report(load_columns(path, cache_dir)[0])
+    if build_report(load_columns(path, use_cache=False)[0]) != cached:
+        raise AssertionError("mrd report differs between the column cache and the JSON file")
+    return path, cache_dir
+
+
+def _mrd_report_cached_run(data):
+    path, cache_dir = data
+    build_report(load_columns(path, cache_dir)[0])
+
+
+def _mrd_report_uncached_run(data):
+    path, _ = data
+    build_report(load_columns(path, use_cache=False)[0])
+
+
+CASES = [
+    Case("normalize_name", _normalize_setup, _normalize_run),
+    Case("find_event_poster", _poster_setup, _poster_run, limit=FILESYSTEM_LIMIT),
+    Case("clean_link", _clean_link_setup, _map_run),
+    Case("convert_year_format", _year_setup, _map_run),
+    Case("extract_google_drive_id", _drive_setup, _map_run),
+    Case("collect_all_images", _gallery_setup, _gallery_run, limit=FILESYSTEM_LIMIT),
+    Case("combo_matching", _combo_setup, _combo_run),
+    Case("users_json_dump", _users_dump_setup, _users_dump_run),
+    Case("users_json_load", _users_load_setup, _users_load_run),
+    Case("mrd_report_cached", _mrd_report_setup, _mrd_report_cached_run, limit=FILESYSTEM_LIMIT),
+    Case("mrd_report_uncached", _mrd_report_setup, _mrd_report_uncached_run, limit=FILESYSTEM_LIMIT),
+]
+
+
+def run_case(case, scale, repeat=DEFAULT_REPEAT):
+    """Time one case at one scale; return its result record"""
+    tmp = tempfile.mkdtemp(prefix="paridhi-bench-")
+    try:
+        data = case.setup(scale, random.Random(scale), tmp)
+        timer = timeit.Timer(lambda: case.run(data))
+        number, _ = timer.autorange()
+        samples = [seconds / number for seconds in timer.repeat(repeat=repeat, number=number)]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    best = min(samples)
+    return {
+        "case": case.name,
+        "scale": scale,
+        "number": number,
+        "best": best,
+        "median": statistics.median(samples),
+        "per_item": best / scale
+    }
+
+
+def environment():
+    """What a result depends on besides the code"""
+    return {"python": platform.python_version(), "machine": platform.machine(),
+            "platform": sys.platform, "cpus": os.cpu_count()}
+
+
+def previous_results(runs, env):
+    """{(case, scale): result} from the newest earlier run on the same environment"""
+    for run in reversed(runs):
+        if run.get("environment") == env:
+            return {(result["case"], result["scale"]): result for result in run.get("results", [])}
+    return {}
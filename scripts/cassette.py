@@ -0,0 +1,258 @@
+import base64
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Record and replay of the scripts' HTTP traffic.
+#
+# With PARIDHI_CASSETTE set to a file and PARIDHI_CASSETTE_MODE=record, every
+# session (see api_session.py) sends requests through RecordingAdapter. It
+# appends each exchange to the cassette as one JSON object per line: the
+# request's method, path and body fingerprint, and the response's status,
+# headers, body and latency. Shards and concurrent steps append to the same
+# file.
+#
+# With PARIDHI_CASSETTE_MODE=replay no request leaves the machine.
+# ReplayAdapter answers each request from the cassette after sleeping for
+# the recorded latency times PARIDHI_CASSETTE_SCALE (1 by default, 0 for no
+# wait). Requests are matched on method, path and query, body and whether
+# they are conditional. The base URL and headers are ignored, so a
+# cassette recorded against one backend replays under any PARIDHI_BASE_URL.
+# Multipart boundaries are random, so they are masked before the body is
+# hashed. A request sent more than once gets its recorded responses in
+# order, then the last one again. A request whose body never appeared (a
+# timestamp in the payload, say) falls back to the responses for its method
+# and path. A request that matches neither raises CassetteMiss.
+#
+# JWTs in a cassette expire like any other. While replaying,
+# token_manager.py moves their iat/exp claims forward by time_shift(), so
+# tokens are as fresh as when they were recorded.
+
+CASSETTE_ENV = "PARIDHI_CASSETTE"
+CASSETTE_MODE_ENV = "PARIDHI_CASSETTE_MODE"
+CASSETTE_SCALE_ENV = "PARIDHI_CASSETTE_SCALE"
+MODES = ("record", "replay")
+
+# Not replayed: the body is stored decoded and the connection is not real
+DROPPED_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding", "connection",
+                             "keep-alive", "date"})
+CONDITIONAL_HEADERS = ("If-None-Match", "If-Modified-Since")
+
+
+class CassetteMiss(requests.RequestException):
+    """A replayed request has no recorded response"""
+
+
+def cassette_mode():
+    """(mode, cassette path) from the environment, (None, None) when off"""
+    path = os.environ.get(CASSETTE_ENV)
+    mode = os.environ.get(CASSETTE_MODE_ENV, "replay")
+    if not path or mode not in MODES:
+        return None, None
+    return mode, path
+
+
+def _request_path(url):
+    parts = urlsplit(url)
+    return parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+def body_fingerprint(request):
+    """sha1 of a prepared request's body, with any multipart boundary masked"""
+    body = request.body or b""
+    if hasattr(body, "read"):
+        # Streamed bodies are not sent by the scripts; match them on path only
+        return None
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    content_type = request.headers.get("Content-Type", "")
+    if "boundary=" in content_type:
+        boundary = content_type.split("boundary=", 1)[1].split(";")[0].strip('"')
+        body = body.replace(boundary.encode("ascii"), b"BOUNDARY")
+    return hashlib.sha1(body).hexdigest()
+
+
+def _is_conditional(request):
+    return any(header in request.headers for header in CONDITIONAL_HEADERS)
+
+
+def _match_keys(method, path, fingerprint, conditional):
+    return (method, path, fingerprint, conditional), (method, path)
+
+
+def exchange_record(request, response, seconds):
+    """The cassette line for one request and its response"""
+    record = {
+        "time": time.time(),
+        "method": request.method,
+        "path": _request_path(request.url),
+        "body": body_fingerprint(request),
+        "conditional": _is_conditional(request),
+        "status": response.status_code,
+        "reason": response.reason,
+        "headers": {name: value for name, value in response.headers.items()
+                    if name.lower() not in DROPPED_HEADERS},
+        "seconds": round(seconds, 6)
+    }
+    content = response.content or b""
+    try:
+        record["text"] = content.decode("utf-8")
+    except UnicodeDecodeError:
+        record["base64"] = base64.b64encode(content).decode("ascii")
+    return record
+
+
+def append_records(path, records):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    data = "".join(json.dumps(record) + "\n" for record in records)
+    with open(path, 'a', encoding='utf-8') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(data)
+
+
+def read_cassette(path):
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except OSError:
+        pass
+    return records
+
+
+class RecordingAdapter(HTTPAdapter):
+    """HTTPAdapter that appends every exchange to a cassette"""
+
+    def __init__(self, cassette_path, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette_path = cassette_path
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        # Reading the body here keeps the download inside the recorded latency
+        response.content
+        append_records(self.cassette_path, [exchange_record(request, response, time.perf_counter() - start)])
+        return response
+
+
+class Cassette:
+    """Recorded responses, queued per request"""
+
+    def __init__(self, records):
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._fallback = {}
+        for record in records:
+            exact, fallback = _match_keys(record["method"], record["path"], record.get("body"),
+                                          record.get("conditional", False))
+            self._exact.setdefault(exact, deque()).append(record)
+            self._fallback.setdefault(fallback, deque()).append(record)
+        times = [record["time"] for record in records if "time" in record]
+        self.recorded_at = min(times) if times else None
+
+    def __len__(self):
+        return sum(len(queue) for queue in self._exact.values())
+
+    @staticmethod
+    def _next(queue):
+        # The last response keeps answering once the recorded ones run out
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def match(self, request):
+        """The recorded response for a prepared request, None if there is none"""
+        path = _request_path(request.url)
+        exact, fallback = _match_keys(request.method, path, body_fingerprint(request), _is_conditional(request))
+        with self._lock:
+            queue = self._exact.get(exact) or self._fallback.get(fallback)
+            return self._next(queue) if queue else None
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def load_cassette(path):
+    """The replay Cassette for path, read once per process"""
+    with _cassettes_lock:
+        cassette = _cassettes.get(path)
+        if cassette is None:
+            cassette = _cassettes[path] = Cassette(read_cassette(path))
+        return cassette
+
+
+def time_shift():
+    """Seconds between the cassette's recording and now while replaying, else 0"""
+    mode, path = cassette_mode()
+    if mode != "replay":
+        return 0
+    cassette = load_cassette(path)
+    return time.time() - cassette.recorded_at if cassette.recorded_at else 0
+
+
+def replay_scale():
+    try:
+        return max(0.0, float(os.environ.get(CASSETTE_SCALE_ENV, 1)))
+    except ValueError:
+        return 1.0
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter that answers requests from a cassette"""
+
+    def __init__(self, cassette_path, scale=None):
+        super().__init__()
+        self.cassette = load_cassette(cassette_path)
+        self.scale = replay_scale() if scale is None else scale
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        record = self.cassette.match(request)
+        if record is None:
+            raise CassetteMiss(f"no recorded response for {request.method} {_request_path(request.url)}",
+                               request=request)
+        seconds = record.get("seconds", 0) * self.scale
+        if seconds > 0:
+            time.sleep(seconds)
+
+        response = requests.Response()
+        response.status_code = record["status"]
+        response.reason = record.get("reason")
+        response.headers = CaseInsensitiveDict(record.get("headers", {}))
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = (base64.b64decode(record["base64"]) if "base64" in record
+                             else record.get("text", "").encode("utf-8"))
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=seconds)
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
+
+
+def cassette_adapter(pool_size):
+    """The adapter sessions should mount for the cassette mode, None when it is off"""
+    mode, path = cassette_mode()
+    if mode == "record":
+        return RecordingAdapter(path, pool_connections=pool_size, pool_maxsize=pool_size)
+    if mode == "replay":
+        return ReplayAdapter(path)
+    return None
@@ -0,0 +1,86 @@
+import sys
+import argparse
+
+from run_history import (DEFAULT_BASELINE_RUNS, DEFAULT_THRESHOLD, RUN_HISTORY_FILE, baseline_runs,
+                         compare_run, read_runs, step_throughput)
+
+def print_runs(runs):
+    """List the recorded runs with their per-step items, requests and throughput"""
+    for run in runs:
+        flags = [f"shards {run.get('shards')}"]
+        if run.get("pipeline"):
+            flags.append(f"pipeline x{run.get('workers')}")
+        if run.get("replay_scale") is not None:
+            flags.append(f"replay x{run.get('replay_scale'):g}")
+        if run.get("sample"):
+            flags.append(f"sample {run.get('sample')}")
+        if run.get("dry_run"):
+            flags.append("dry run")
+        print(f"{run.get('run')}  {run.get('backend')}  {run.get('seconds', 0):.1f}s  ({', '.join(flags)})")
+        for step in run.get("steps", []):
+            throughput = step_throughput(step)
+            items = step.get("items")
+            done = (f"{items['succeeded']}/{items['submitted']} items ({items['failed']} failed), "
+                    if items else "")
+            print(f"    step {step['step']} {step['script']}: {done}{step['requests']} requests in {step['seconds']:.1f}s"
+                  + (f" ({throughput:.1f} items/s)" if throughput is not None else "")
+                  + ("" if step.get("ok") else "  FAILED"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the latest setup run for throughput regressions")
+    parser.add_argument('--file', default=RUN_HISTORY_FILE, help=f"Run history file (default: {RUN_HISTORY_FILE})")
+    parser.add_argument('--run', help="Timestamp of the run to check (default: the latest run of each backend)")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Relative slowdown that counts as a regression (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument('--baseline', type=int, default=DEFAULT_BASELINE_RUNS,
+                        help=f"Earlier comparable runs to take the median of (default: {DEFAULT_BASELINE_RUNS})")
+    parser.add_argument('--list', action='store_true', help="List the recorded runs instead")
+    args = parser.parse_args()
+
+    runs = read_runs(args.file)
+    if not runs:
+        print(f"No runs recorded in {args.file}")
+        return
+
+    if args.list:
+        print_runs(runs)
+        return
+
+    # The run to check for every backend
+    latest = {}
+    for run in runs:
+        if not run.get("dry_run") and (args.run is None or run.get("run") == args.run):
+            latest[run.get("backend")] = run
+    if not latest:
+        print(f"No run {args.run} in {args.file}")
+        return
+
+    regressed = 0
+    for backend, run in latest.items():
+        baseline = baseline_runs(runs, run, args.baseline)
+        print(f"\n=== Run {run['run']} against {backend} ===")
+        if not baseline:
+            print("No earlier run with the same settings to compare with")
+            continue
+        print(f"Baseline: median of {len(baseline)} earlier runs ({baseline[0]['run']} to {baseline[-1]['run']})")
+
+        regressions = compare_run(run, baseline, args.threshold)
+        for regression in regressions:
+            if regression["metric"] == "throughput":
+                print(f"❌ Step {regression['step']} {regression['script']}: throughput "
+                      f"{regression['current']:.1f} items/s vs {regression['baseline']:.1f} items/s "
+                      f"({regression['change']:+.0%})")
+            else:
+                print(f"❌ Step {regression['step']} {regression['script']}: {regression['metric']} "
+                      f"{regression['current'] * 1000:.0f} ms vs {regression['baseline'] * 1000:.0f} ms "
+                      f"({regression['change']:+.0%})")
+        if not regressions:
+            print(f"✅ No step or endpoint slowed down by more than {args.threshold:.0%}")
+        regressed += len(regressions)
+
+    # Non-zero exit so a scheduled check can alert on it
+    if regressed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
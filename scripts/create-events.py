@@ -1,59 +1,23 @@
-import requests
 import json
 import time
 import os
+import sys
 import random
 import argparse
 
-# API configuration
-BASE_URL = "http://localhost:8080"
-EVENT_ENDPOINT = f"{BASE_URL}/api/events"
-AUTH_VERIFY_ENDPOINT = f"{BASE_URL}/api/auth/check-token"
-
-def is_token_valid(token):
-    """Check if a JWT token is still valid"""
-    if not token:
-        return False
-        
-    try:
-        response = requests.get(
-            AUTH_VERIFY_ENDPOINT,
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        return response.status_code == 200
-    except Exception as e:
-        print(f"Error checking token validity: {str(e)}")
-        return False
-
-def create_event(token, event_data):
-    """Create a new event using admin token"""
-    
-    print(f"Creating event: {event_data['name']} ({event_data['domain']})")
-    
-    response = requests.post(
-        EVENT_ENDPOINT,
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {token}"
-        },
-        data=json.dumps(event_data)
-    )
-    
-    if response.status_code == 201:
-        print(f"✅ Successfully created event: {event_data['name']}")
-        return True
-    elif response.status_code == 409:
-        print(f"⚠️ Event {event_data['name']} already exists")
-        return True
-    else:
-        print(f"❌ Failed to create event: {response.status_code} - {response.text}")
-        return False
+from daemon_client import run_in_daemon
+from entities import create_event
+from event_schedule import DEFAULT_DURATION_MINUTES, check_schedule
+from retry_queue import RetryQueue
+from token_manager import is_token_valid, track_admins
 
 def main():
     parser = argparse.ArgumentParser(description="Create events using admin accounts")
     parser.add_argument('--events-file', default="json/events.json", help="Path to events JSON file")
     parser.add_argument('--admins-file', default="json/admins.json", help="Path to admins JSON file")
     parser.add_argument('--dry-run', action='store_true', help="Validate without making changes")
+    parser.add_argument('--default-duration', type=int, default=DEFAULT_DURATION_MINUTES, help=f"Minutes an event without durationMinutes holds its venue (default: {DEFAULT_DURATION_MINUTES})")
+    parser.add_argument('--allow-conflicts', action='store_true', help="Create events even if their venues or coordinators clash")
     args = parser.parse_args()
     
     events_file = args.events_file
@@ -85,6 +49,11 @@ def main():
         print(f"Error loading admins file: {str(e)}")
         return
     
+    # Log in again for admins whose tokens are missing or about to expire; a dry run
+    # keeps the stored tokens and leaves admins.json alone
+    if not dry_run:
+        track_admins(admins_data, admins_file)
+    
     # Extract data
     if 'events' not in events_data:
         print("Error: JSON file must contain 'events' section")
@@ -92,6 +61,11 @@ def main():
     
     events = events_data['events']
     
+    # Two events in one venue, or one coordinator in two events, at once
+    if not args.allow_conflicts and not check_schedule(events, args.default_duration):
+        print("Fix the schedule in events.json, or pass --allow-conflicts to create the events anyway")
+        sys.exit(1)
+    
     # Collect all admin tokens (including superadmin)
     admin_tokens = []
     
@@ -126,31 +100,41 @@ def main():
         print("DRY RUN MODE: No changes will be made")
     
     # Create events using random admin tokens
-    success_count = 0
-    failed_count = 0
+    counts = {"success": 0, "failed": 0}
+    
+    def create(token, event):
+        def task():
+            created, _ = create_event(token, event)
+            counts["success" if created else "failed"] += 1
+        return task
+    
+    def give_up(error):
+        counts["failed"] += 1
     
     print(f"\nProcessing {len(events)} events...")
     
-    for index, event in enumerate(events, 1):
-        # Select a random admin
-        admin = random.choice(admin_tokens)
-        
-        print(f"\n[{index}/{len(events)}] Using admin: {admin['name']} ({admin['email']})")
-        
-        if not dry_run:
-            if create_event(admin['token'], event):
-                success_count += 1
-            else:
-                failed_count += 1
+    # Events that hit a transient error are retried after the others
+    with RetryQueue() as queue:
+        for index, event in enumerate(events, 1):
+            # Select a random admin
+            admin = random.choice(admin_tokens)
+            
+            print(f"\n[{index}/{len(events)}] Using admin: {admin['name']} ({admin['email']})")
+            
+            if not dry_run:
+                queue.submit(f"event {event['name']}", create(admin['token'], event), give_up,
+                             item={"kind": "event", "event": event})
     
     # Print summary
     print("\n=== Event Creation Summary ===")
     print(f"Total events processed: {len(events)}")
     if not dry_run:
-        print(f"Successfully created/validated: {success_count}")
-        print(f"Failed: {failed_count}")
+        print(f"Successfully created/validated: {counts['success']}")
+        print(f"Failed: {counts['failed']}")
+        queue.print_summary()
     else:
         print("Dry run completed, no changes were made.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if not run_in_daemon():
+        main()
\ No newline at end of file
@@ -1,63 +1,41 @@
 import csv
-import requests
 import json
 import argparse
 import os
 import re
+import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-# API configuration
-BASE_URL = "http://localhost:8080"
-TEAM_ENDPOINT = f"{BASE_URL}/api/megatronix-team"
-AUTH_VERIFY_ENDPOINT = f"{BASE_URL}/api/auth/check-token"
+from daemon_client import run_in_daemon
+from entities import create_team_member
+from retry_queue import RetryQueue
+from seed_schemas import TEAM_COLUMNS, parse_team_year
+from token_manager import is_token_valid, track_admins
 
-def is_token_valid(token):
-    """Check if a JWT token is still valid"""
-    if not token:
-        return False
-        
-    try:
-        response = requests.get(
-            AUTH_VERIFY_ENDPOINT,
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        return response.status_code == 200
-    except Exception as e:
-        print(f"Error checking token validity: {str(e)}")
-        return False
+# Rows are read from the CSV in batches and posted by a bounded thread pool,
+# so a large roster never sits in memory and at most --workers requests are in
+# flight. Rows whose year cannot be parsed are reported and skipped. A member
+# whose request fails transiently is retried by its worker, and written to the
+# dead-letter file once it runs out of attempts.
+
+EMPTY_LINKS = frozenset(("", "n/a", "null", "none", "n/ a"))
+BARE_HOST_RE = re.compile(r'[a-zA-Z0-9]')
+DRIVE_ID_RE = re.compile(r'id=([a-zA-Z0-9_-]+)')
 
 def convert_year_format(year_str):
-    """Convert '4th Year' to 'FOURTH' etc."""
-    year_mapping = {
-        "1st year": "FIRST",
-        "1st Year": "FIRST",
-        "first year": "FIRST",
-        "First Year": "FIRST",
-        "2nd year": "SECOND",
-        "2nd Year": "SECOND",
-        "second year": "SECOND",
-        "Second Year": "SECOND",
-        "3rd year": "THIRD",
-        "3rd Year": "THIRD",
-        "third year": "THIRD", 
-        "Third Year": "THIRD",
-        "4th year": "FOURTH",
-        "4th Year": "FOURTH",
-        "fourth year": "FOURTH",
-        "Fourth Year": "FOURTH"
-    }
-    
-    return year_mapping.get(year_str, "FOURTH")  # Default to FOURTH if mapping not found
+    """Convert '4th Year', 'fourth year', ... to 'FOURTH'; None if unrecognised"""
+    return parse_team_year(year_str)
 
 def clean_link(link):
     """Clean and validate links, return empty string if invalid"""
-    if not link or link.lower() in ["", "n/a", "null", "none", "n/ a"]:
+    if not link or link.lower() in EMPTY_LINKS:
         return ""
     
     # Ensure links start with http:// or https://
-    if link and not link.startswith(("http://", "https://")):
-        if re.match(r'^www\.', link):
+    if not link.startswith(("http://", "https://")):
+        if link.startswith("www."):
             return f"https://{link}"
-        elif re.match(r'^[a-zA-Z0-9]', link):
+        elif BARE_HOST_RE.match(link):
             return f"https://www.{link}"
     
     return link
@@ -68,46 +46,69 @@ def extract_google_drive_id(drive_link):
         return ""
     
     # Extract ID from forms_web format
-    match = re.search(r'id=([a-zA-Z0-9_-]+)', drive_link)
+    match = DRIVE_ID_RE.search(drive_link)
     if match:
-        file_id = match.group(1)
-        return f"https://drive.google.com/uc?export=view&id={file_id}"
+        return f"https://drive.google.com/uc?export=view&id={match.group(1)}"
     
     return ""
 
-def create_team_member(token, member_data):
-    """Create a Megatronix team member entry"""
-    print(f"Creating team member: {member_data['name']} ({member_data['email']})...")
-    
-    response = requests.post(
-        TEAM_ENDPOINT,
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {token}"
-        },
-        data=json.dumps(member_data)
-    )
-    
-    if response.status_code == 201:
-        print(f"✅ Successfully added {member_data['name']} to Megatronix team")
-        return True
-    elif response.status_code == 409:
-        print(f"⚠️ Team member {member_data['email']} already exists")
-        return True
-    else:
-        print(f"❌ Failed to add team member: {response.status_code} - {response.text}")
+def member_payload(member):
+    """Request body for a CSV row, None if its year is not recognised"""
+    year = convert_year_format(member['Year'])
+    if year is None:
+        return None
+    return {
+        "name": member['Name'].strip(),
+        "email": member['Email'].strip(),
+        "year": year,
+        "linkedInLink": clean_link(member['LinkedIn Profile Link']),
+        "facebookLink": clean_link(member['Facebook Profile Link']),
+        "instagramLink": clean_link(member['Instagram Profile Link']),
+        "githubLink": clean_link(member['GitHub Account Link']),
+        "imageLink": extract_google_drive_id(member['Profile Picture']),
+        "designation": "MEMBER"  # Default designation
+    }
+
+def read_batches(f, batch_size):
+    """Yield lists of up to batch_size (line, row) pairs from a CSV file"""
+    reader = csv.DictReader(f)
+    missing = [column for column in TEAM_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"missing columns {', '.join(missing)}")
+    batch = []
+    for line, row in enumerate(reader, 2):
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def add_member(queue, token, member_data):
+    """Add one member through the retry queue; return True if it was added"""
+    results = []
+    try:
+        queue.run(f"team member {member_data['email']}", lambda: results.append(create_team_member(token, member_data)),
+                  item={"kind": "team_member", "member": member_data})
+    except requests.RequestException as e:
+        print(f"❌ Error adding team member {member_data['email']}: {str(e)}")
         return False
+    return bool(results and results[-1])
 
 def main():
     parser = argparse.ArgumentParser(description="Import Megatronix team members from CSV")
     parser.add_argument('--csv-file', default="team-members/Contact Information.csv", help="Path to CSV file")
     parser.add_argument('--admins-file', default="json/admins.json", help="Path to admins JSON file")
+    parser.add_argument('--workers', type=int, default=8, help="Members to add concurrently (default: 8)")
+    parser.add_argument('--batch-size', type=int, default=500, help="CSV rows to read and normalise at a time (default: 500)")
     parser.add_argument('--dry-run', action='store_true', help="Validate without making changes")
     args = parser.parse_args()
     
     csv_file = args.csv_file
     admins_file = args.admins_file
     dry_run = args.dry_run
+    workers = max(1, args.workers)
+    batch_size = max(1, args.batch_size)
     
     # Check if the files exist
     if not os.path.exists(csv_file):
@@ -122,7 +123,12 @@ def main():
     try:
         with open(admins_file, 'r') as f:
             admins_data = json.load(f)
-            
+        
+        # Log in again if the stored token is missing or about to expire; a dry run
+        # keeps the stored tokens and leaves admins.json alone
+        if not dry_run:
+            track_admins(admins_data, admins_file)
+        
         superadmin = admins_data.get('superadmin', {})
         superadmin_token = superadmin.get('jwt', '')
         
@@ -134,58 +140,69 @@ def main():
         print(f"Error loading admins file: {str(e)}")
         return
     
-    # Read CSV file
-    try:
-        with open(csv_file, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            team_members = list(reader)
-    except Exception as e:
-        print(f"Error reading CSV file: {str(e)}")
-        return
-    
-    print(f"Found {len(team_members)} team members in CSV file")
-    
     if dry_run:
         print("DRY RUN MODE: No changes will be made")
     
-    # Process each team member
+    # Stream the CSV and post members as rows are normalised
+    total_count = 0
     success_count = 0
     failed_count = 0
+    bad_years = []
+    queue = RetryQueue()
     
-    for index, member in enumerate(team_members, 1):
-        print(f"\n[{index}/{len(team_members)}] Processing: {member['Name']}")
-        
-        # Prepare member data for API
-        member_data = {
-            "name": member['Name'].strip(),
-            "email": member['Email'].strip(),
-            "year": convert_year_format(member['Year'].strip()),
-            "linkedInLink": clean_link(member['LinkedIn Profile Link']),
-            "facebookLink": clean_link(member['Facebook Profile Link']),
-            "instagramLink": clean_link(member['Instagram Profile Link']),
-            "githubLink": clean_link(member['GitHub Account Link']),
-            "imageLink": extract_google_drive_id(member['Profile Picture']),
-            "designation": "MEMBER"  # Default designation
-        }
-        
-        if dry_run:
-            print(json.dumps(member_data, indent=2))
-            continue
-        
-        # Create team member
-        if create_team_member(superadmin_token, member_data):
-            success_count += 1
-        else:
-            failed_count += 1
+    try:
+        with open(csv_file, 'r', encoding='utf-8') as f, ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            
+            def collect():
+                nonlocal success_count, failed_count
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    if future.result():
+                        success_count += 1
+                    else:
+                        failed_count += 1
+            
+            for batch in read_batches(f, batch_size):
+                for line, member in batch:
+                    total_count += 1
+                    member_data = member_payload(member)
+                    if member_data is None:
+                        bad_years.append((line, member['Name'], member['Year']))
+                        continue
+                    
+                    if dry_run:
+                        print(json.dumps(member_data, indent=2))
+                        continue
+                    
+                    # Keep at most two requests per worker queued
+                    if len(pending) >= 2 * workers:
+                        collect()
+                    pending.add(pool.submit(add_member, queue, superadmin_token, member_data))
+            
+            while pending:
+                collect()
+    except (OSError, ValueError, csv.Error, UnicodeDecodeError) as e:
+        print(f"Error reading CSV file: {str(e)}")
+        return
+    
+    if bad_years:
+        print(f"\n⚠️ Skipped {len(bad_years)} members with an unrecognised year:")
+        for line, name, year in bad_years:
+            print(f"  - line {line}: {name} ('{year}')")
     
     # Print summary
     print("\n=== Megatronix Team Creation Summary ===")
-    print(f"Total team members processed: {len(team_members)}")
+    print(f"Total team members processed: {total_count}")
+    print(f"Skipped (unrecognised year): {len(bad_years)}")
     if not dry_run:
         print(f"Successfully added: {success_count}")
         print(f"Failed: {failed_count}")
+        queue.print_summary()
     else:
         print("Dry run completed, no changes were made.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if not run_in_daemon():
+        main()
\ No newline at end of file
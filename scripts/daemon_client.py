@@ -0,0 +1,128 @@
+import json
+import os
+import socket
+import sys
+
+from api_session import BASE_URL
+from cassette import CASSETTE_ENV
+import deadlines
+from item_counts import ITEMS_FILE_ENV
+from latency_stats import STATS_FILE_ENV
+from tracing import TRACE_FILE_ENV, TRACE_ID_ENV
+
+# Thin-client side of the seeding daemon (seeding-daemon.py).
+#
+# Scripts call run_in_daemon() before running main(). When a daemon is
+# listening on SOCKET_PATH the script's command line is sent to it as a job
+# and the daemon runs it in its own warm process: connection pool, checked
+# admin tokens and cached listings are already there. The job's output is
+# streamed back and the script exits with the job's exit code. Without a
+# daemon, with PARIDHI_NO_DAEMON or PARIDHI_CASSETTE set, or when the daemon
+# seeds a different backend than PARIDHI_BASE_URL points at, the script runs
+# as usual. So do runs with one of LOCAL_OPTIONS.
+#
+# Messages are JSON objects, one per line, in both directions.
+
+SOCKET_PATH = os.environ.get("PARIDHI_DAEMON_SOCKET", os.path.join(".cache", "seeding-daemon.sock"))
+
+# Scripts the daemon accepts jobs for
+DAEMON_SCRIPTS = frozenset({
+    "create-events.py",
+    "create-combos.py",
+    "upload-event-posters.py",
+    "upload-combo-posters.py",
+    "upload-gallery-images.py",
+    "create-megatronix-team.py",
+    "mrd-registration.py",
+    "event-pipeline.py",
+    "replay-dead-letters.py",
+    "snapshot-portal.py",
+    "restore-portal.py",
+})
+
+# Options that make a run hold the daemon's only job slot indefinitely
+# (--watch) or fork worker processes from the multithreaded daemon (--shards)
+LOCAL_OPTIONS = ("--watch", "--shards")
+
+
+def local_option(args):
+    """Return the option of LOCAL_OPTIONS that args use, or None"""
+    for arg in args:
+        name = arg.split("=", 1)[0]
+        if len(name) > 2 and name.startswith("--"):
+            for option in LOCAL_OPTIONS:
+                # argparse also accepts unambiguous prefixes
+                if option.startswith(name):
+                    return option
+    return None
+
+
+def connect(path=SOCKET_PATH):
+    """Return a socket connected to the daemon, or None if none is listening"""
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def send_message(sock, message):
+    sock.sendall((json.dumps(message) + "\n").encode('utf-8'))
+
+
+def read_messages(sock):
+    """Yield the messages sent on a connection until it is closed"""
+    with sock.makefile('r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def request(message, path=SOCKET_PATH):
+    """Send a control message and return the daemon's reply, None without a daemon"""
+    sock = connect(path)
+    if sock is None:
+        return None
+    with sock:
+        send_message(sock, message)
+        return next(read_messages(sock), None)
+
+
+def run_in_daemon():
+    """Run this script as a daemon job if a daemon is listening
+
+    Exits with the job's exit code; returns False when the script should
+    run by itself, including when the daemon refuses the job.
+    """
+    script = os.path.basename(sys.argv[0])
+    # The daemon's sessions neither record nor replay cassettes
+    if os.environ.get("PARIDHI_NO_DAEMON") or os.environ.get(CASSETTE_ENV) or script not in DAEMON_SCRIPTS:
+        return False
+    if local_option(sys.argv[1:]):
+        return False
+    sock = connect()
+    if sock is None:
+        return False
+
+    code = 1
+    with sock:
+        send_message(sock, {"script": script, "args": sys.argv[1:], "cwd": os.getcwd(),
+                            "base_url": BASE_URL, "stats_file": os.environ.get(STATS_FILE_ENV),
+                            "items_file": os.environ.get(ITEMS_FILE_ENV),
+                            "trace_file": os.environ.get(TRACE_FILE_ENV), "trace_id": os.environ.get(TRACE_ID_ENV),
+                            "deadline": deadlines.deadline})
+        for message in read_messages(sock):
+            if "refused" in message:
+                print(f"Seeding daemon refused the job ({message['refused']}), running it here")
+                return False
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "exit" in message:
+                code = message["exit"]
+            elif "error" in message:
+                print(f"Error from seeding daemon: {message['error']}")
+    sys.exit(code)
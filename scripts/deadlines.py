@@ -0,0 +1,62 @@
+import os
+import time
+
+import requests
+
+# Deadlines and request timeouts.
+#
+# Every request gets a connect and a read timeout, so a hung connection fails
+# instead of stalling a step forever. setup-paridhi-portal.py can also give a
+# step a deadline. It passes the deadline as an epoch time in PARIDHI_DEADLINE,
+# and request timeouts are clipped to the time left. Once the deadline has
+# passed, requests fail at once with DeadlineExceeded. That error is a
+# requests.Timeout, so the scripts' usual error handling skips the item, and
+# RetryQueue cancels what is still pending instead of retrying it. Journals
+# and MRD groups are written item by item, so the work done before the
+# deadline is kept.
+
+DEADLINE_ENV = "PARIDHI_DEADLINE"
+CONNECT_TIMEOUT = float(os.environ.get("PARIDHI_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("PARIDHI_READ_TIMEOUT", 60))
+
+
+class DeadlineExceeded(requests.Timeout):
+    """The step's deadline passed before a request could be sent"""
+
+
+def _read_deadline():
+    try:
+        return float(os.environ[DEADLINE_ENV])
+    except (KeyError, ValueError):
+        return None
+
+
+deadline = _read_deadline()
+
+
+def set_deadline(value):
+    """Set this process's deadline (epoch seconds), None for no deadline"""
+    global deadline
+    deadline = value
+
+
+def remaining():
+    """Seconds left before the deadline, None without one"""
+    return None if deadline is None else deadline - time.time()
+
+
+def expired():
+    return deadline is not None and time.time() >= deadline
+
+
+def request_timeout():
+    """(connect, read) timeouts for a request sent now
+
+    Raises DeadlineExceeded once the deadline has passed.
+    """
+    left = remaining()
+    if left is None:
+        return CONNECT_TIMEOUT, READ_TIMEOUT
+    if left <= 0:
+        raise DeadlineExceeded("deadline passed, request not sent")
+    return min(CONNECT_TIMEOUT, left), min(READ_TIMEOUT, left)
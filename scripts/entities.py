@@ -0,0 +1,393 @@
+import json
+import os
+import threading
+
+from api_session import BASE_URL, RetryableError, get_session
+from event_schedule import DURATION_FIELD
+from listing_cache import get_all_combos, get_all_events, invalidate
+from posters import find_domain_poster, find_event_poster, normalize_name
+from tracing import traced
+
+# Event, combo, gallery, team and MRD calls shared by the setup steps, the
+# pipeline and restore-portal.py.
+#
+# Creating an event or combo returns the id the server assigned, so callers
+# can chain the next call (a poster upload, a combo) without refetching the
+# whole listing. When the server does not echo the new entity, or it already
+# existed, the id is None and callers fall back to the listing.
+
+EVENT_ENDPOINT = f"{BASE_URL}/api/events"
+COMBOS_ENDPOINT = f"{BASE_URL}/api/combos"
+GALLERIES_ENDPOINT = f"{BASE_URL}/api/galleries"
+TEAM_ENDPOINT = f"{BASE_URL}/api/megatronix-team"
+MRD_ENDPOINT = f"{BASE_URL}/api/mrd"
+REGISTER_ENDPOINT = f"{BASE_URL}/api/auth/register"
+LOGIN_ENDPOINT = f"{BASE_URL}/api/auth/login"
+PROFILE_ENDPOINT = f"{BASE_URL}/api/profiles"
+
+# Combos offered by Paridhi. Each one bundles the first event in its domain
+# whose name contains each of the given fragments; None takes the first two
+# events of the domain in listing order.
+COMBO_SPECS = [
+    {
+        "name": "Robo Battle Combo",
+        "description": "Register for both Throne of Bots weight classes at a discounted price!",
+        "domain": "ROBOTICS",
+        "events": ("8kg", "15kg"),
+        "registrationFee": 800  # Instead of 500 + 600 = 1100
+    },
+    {
+        "name": "Robot Challenge Pack",
+        "description": "Master both Triathlon and Chakravyuh challenges with one registration!",
+        "domain": "ROBOTICS",
+        "events": ("Triathlon", "Chakravyuh"),
+        "registrationFee": 500  # Instead of 300 + 350 = 650
+    },
+    {
+        "name": "Pro Coder Pack",
+        "description": "Showcase your coding skills in both competitive programming and debugging!",
+        "domain": "CODING",
+        "events": ("Code Quest", "Bug Blitz"),
+        "registrationFee": 300  # Instead of 250 + 150 = 400
+    },
+    {
+        "name": "Shooter Games Bundle",
+        "description": "Join both Valorant and BGMI tournaments at a reduced price!",
+        "domain": "GAMING",
+        "events": ("Valorant", "BGMI"),
+        "registrationFee": 700  # Instead of 500 + 400 = 900
+    },
+    {
+        "name": "Football Gaming Bundle",
+        "description": "Experience both EA FC24 and E-Football tournaments!",
+        "domain": "GAMING",
+        "events": ("EA FC24", "E-Football"),
+        "registrationFee": 250  # Instead of 200 + 150 = 350
+    },
+    {
+        "name": "Design Master Combo",
+        "description": "Showcase your civil design skills in both physical and digital formats!",
+        "domain": "CIVIL",
+        "events": ("Mega-Arch", "CAD-O-Mania"),
+        "registrationFee": 400  # Instead of 300 + 200 = 500
+    },
+    {
+        "name": "Board Games Pack",
+        "description": "Participate in both Chess and Carrom competitions!",
+        "domain": "GENERAL",
+        "events": ("Chess", "Carrom"),
+        "registrationFee": 150  # Instead of 100 + 100 = 200
+    },
+    {
+        "name": "Electrical Engineering Bundle",
+        "description": "Complete package for electrical engineering enthusiasts!",
+        "domain": "ELECTRICAL",
+        "events": None,  # Power-Blitz + Electri-Quest
+        "registrationFee": 250  # Instead of 200 + 150 = 350
+    },
+]
+
+
+def _post_entity(endpoint, token, data, label):
+    """POST a new entity, return (ok, id or None)"""
+    response = get_session().post(
+        endpoint,
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}"
+        },
+        data=json.dumps(data)
+    )
+
+    if response.status_code == 201:
+        print(f"✅ Successfully created {label}: {data['name']}")
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return True, body.get('id') if isinstance(body, dict) else None
+    elif response.status_code == 409:
+        print(f"⚠️ {label.capitalize()} {data['name']} already exists")
+        return True, None
+    else:
+        print(f"❌ Failed to create {label}: {response.status_code} - {response.text}")
+        return False, None
+
+
+@traced("event", lambda token, event_data: event_data['name'])
+def create_event(token, event_data):
+    """Create a new event using admin token, return (ok, event id or None)"""
+    print(f"Creating event: {event_data['name']} ({event_data['domain']})")
+    # The duration only matters to the schedule check
+    event_data = {key: value for key, value in event_data.items() if key != DURATION_FIELD}
+    return _post_entity(EVENT_ENDPOINT, token, event_data, "event")
+
+
+@traced("combo", lambda token, combo_data: combo_data['name'])
+def create_combo(token, combo_data):
+    """Create a new combo using admin token, return (ok, combo id or None)"""
+    print(f"Creating combo: {combo_data['name']}")
+    return _post_entity(COMBOS_ENDPOINT, token, combo_data, "combo")
+
+
+class IdResolver:
+    """Look up ids the server did not return in the event and combo listings"""
+
+    def __init__(self, token):
+        self.token = token
+        self._lock = threading.Lock()
+
+    def _lookup(self, url, fetch, name):
+        def find(items):
+            return next((item.get('id') for item in items or [] if item.get('name') == name), None)
+
+        with self._lock:
+            entity_id = find(fetch(self.token))
+            if entity_id is None:
+                # Created after the listing was cached, revalidate once
+                invalidate(url)
+                entity_id = find(fetch(self.token))
+            return entity_id
+
+    def event_id(self, name):
+        return self._lookup(EVENT_ENDPOINT, get_all_events, name)
+
+    def combo_id(self, name):
+        return self._lookup(COMBOS_ENDPOINT, get_all_combos, name)
+
+
+def combo_members(spec, events_by_domain):
+    """Return the events a combo spec bundles, or None if any is missing"""
+    domain_events = events_by_domain.get(spec['domain'], [])
+    if spec['events'] is None:
+        return domain_events[:2] if len(domain_events) >= 2 else None
+    members = []
+    for fragment in spec['events']:
+        event = next((e for e in domain_events if fragment in e.get('name', '')), None)
+        if event is None:
+            return None
+        members.append(event)
+    return members
+
+
+def group_by_domain(events):
+    """Map domain -> events, keeping listing order"""
+    events_by_domain = {}
+    for event in events:
+        domain = event.get('domain')
+        if domain:
+            events_by_domain.setdefault(domain, []).append(event)
+    return events_by_domain
+
+
+def combo_payload(spec, event_ids):
+    """Request body for creating the combo described by spec"""
+    return {
+        "name": spec['name'],
+        "description": spec['description'],
+        "domain": spec['domain'],
+        "eventIds": list(event_ids),
+        "registrationFee": spec['registrationFee']
+    }
+
+
+def upload_file(endpoint, token, image_path):
+    """PUT an image to an upload endpoint and return the response"""
+    with open(image_path, 'rb') as image_file:
+        files = {'file': (os.path.basename(image_path), image_file, 'image/jpeg')}
+        return get_session().put(
+            endpoint,
+            headers={"Authorization": f"Bearer {token}"},
+            files=files
+        )
+
+
+@traced("poster", lambda token, event_id, image_path: f"event {event_id}")
+def upload_poster(token, event_id, image_path):
+    """Upload a poster image for an event"""
+    try:
+        response = upload_file(f"{EVENT_ENDPOINT}/{event_id}/upload", token, image_path)
+        if response.status_code == 200:
+            print(f"✅ Successfully uploaded poster for event ID {event_id}")
+            return True
+        else:
+            print(f"❌ Failed to upload poster for event ID {event_id}: {response.status_code} - {response.text}")
+            return False
+    except RetryableError:
+        raise
+    except Exception as e:
+        print(f"❌ Error uploading poster for event ID {event_id}: {str(e)}")
+        return False
+
+
+@traced("poster", lambda token, combo_id, image_path: f"combo {combo_id}")
+def upload_combo_poster(token, combo_id, image_path):
+    """Upload a poster image for a combo"""
+    try:
+        response = upload_file(f"{COMBOS_ENDPOINT}/{combo_id}/upload", token, image_path)
+        if response.status_code == 200:
+            print(f"✅ Successfully uploaded poster for combo ID {combo_id}")
+            return True
+        else:
+            print(f"❌ Failed to upload poster for combo ID {combo_id}: {response.status_code} - {response.text}")
+            return False
+    except RetryableError:
+        raise
+    except Exception as e:
+        print(f"❌ Error uploading poster for combo ID {combo_id}: {str(e)}")
+        return False
+
+
+@traced("image", lambda token, image_path, paridhi_year: os.path.basename(image_path))
+def upload_gallery_image(token, image_path, paridhi_year):
+    """Upload an image to the gallery"""
+    print(f"Uploading {os.path.basename(image_path)} (Paridhi {paridhi_year})...")
+
+    try:
+        with open(image_path, 'rb') as image_file:
+            files = {'image': (os.path.basename(image_path), image_file, 'image/jpeg')}
+            data = {'paridhiYear': str(paridhi_year)}
+
+            response = get_session().post(
+                GALLERIES_ENDPOINT,
+                headers={"Authorization": f"Bearer {token}"},
+                files=files,
+                data=data
+            )
+
+            if response.status_code == 201:
+                print(f"✅ Successfully uploaded {os.path.basename(image_path)} to gallery")
+                return True
+            else:
+                print(f"❌ Failed to upload to gallery: {response.status_code} - {response.text}")
+                return False
+    except RetryableError:
+        raise
+    except Exception as e:
+        print(f"❌ Error uploading to gallery: {str(e)}")
+        return False
+
+
+@traced("team member", lambda token, member_data: member_data['email'])
+def create_team_member(token, member_data):
+    """Create a Megatronix team member entry"""
+    print(f"Creating team member: {member_data['name']} ({member_data['email']})...")
+
+    response = get_session().post(
+        TEAM_ENDPOINT,
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}"
+        },
+        data=json.dumps(member_data)
+    )
+
+    if response.status_code == 201:
+        print(f"✅ Successfully added {member_data['name']} to Megatronix team")
+        return True
+    elif response.status_code == 409:
+        print(f"⚠️ Team member {member_data['email']} already exists")
+        return True
+    else:
+        print(f"❌ Failed to add team member: {response.status_code} - {response.text}")
+        return False
+
+
+def login_user(credentials):
+    """Login as a user and get JWT token"""
+    print(f"Logging in as {credentials['email']}...")
+
+    response = get_session().post(
+        LOGIN_ENDPOINT,
+        headers={"Content-Type": "application/json"},
+        data=json.dumps(credentials)
+    )
+
+    if response.status_code == 200:
+        token = response.json().get("token")
+        print(f"✅ Successfully logged in as {credentials['email']}")
+        return token
+    else:
+        print(f"❌ Failed to login: {response.status_code} - {response.text}")
+        return None
+
+
+def register_user(user_data):
+    """Register a new user and get JWT token"""
+    print(f"Registering user: {user_data['name']} ({user_data['email']})...")
+
+    registration_data = {
+        "name": user_data["name"],
+        "email": user_data["email"],
+        "password": user_data["password"]
+    }
+
+    response = get_session().post(
+        REGISTER_ENDPOINT,
+        headers={"Content-Type": "application/json"},
+        data=json.dumps(registration_data)
+    )
+
+    if response.status_code == 201:
+        print(f"✅ Successfully registered user {user_data['name']}")
+        # Extract JWT token from response
+        jwt_token = response.json().get("token")
+        return jwt_token
+    elif response.status_code == 409:
+        print(f"⚠️ User {user_data['email']} already exists")
+        # For existing users, we'll try to login instead
+        return "existing"
+    else:
+        print(f"❌ Failed to register user: {response.status_code} - {response.text}")
+        return None
+
+
+def create_profile(token, profile_data):
+    """Create a profile for a registered user"""
+    print(f"Creating profile for: {profile_data['email']}...")
+
+    response = get_session().post(
+        PROFILE_ENDPOINT,
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}"
+        },
+        data=json.dumps(profile_data)
+    )
+
+    if response.status_code == 201:
+        print(f"✅ Successfully created profile for {profile_data['email']}")
+        return True
+    elif response.status_code == 409:
+        print(f"⚠️ Profile for {profile_data['email']} already exists")
+        return True  # Consider it a success since the profile exists
+    else:
+        print(f"❌ Failed to create profile: {response.status_code} - {response.text}")
+        return False
+
+
+@traced("mrd", lambda email: email)
+def register_mrd(email):
+    """Register a user for MRD and get their GID"""
+    print(f"Registering MRD for: {email}...")
+
+    request_data = {
+        "email": email
+    }
+
+    response = get_session().post(
+        f"{MRD_ENDPOINT}/register",
+        headers={"Content-Type": "application/json"},
+        data=json.dumps(request_data)
+    )
+
+    if response.status_code == 201:
+        mrd_data = response.json()
+        gid = mrd_data.get("gid")
+        print(f"✅ Successfully registered MRD for {email} - GID: {gid}")
+        return gid, mrd_data
+    else:
+        print(f"❌ Failed to register MRD: {response.status_code} - {response.text}")
+        return None, None
+
+
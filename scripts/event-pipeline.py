@@ -0,0 +1,292 @@
+import requests
+import json
+import os
+import sys
+import random
+import argparse
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from daemon_client import run_in_daemon
+from entities import (COMBO_SPECS, IdResolver, combo_members, combo_payload, create_combo,
+                      create_event, find_domain_poster, find_event_poster, group_by_domain,
+                      upload_combo_poster, upload_poster)
+from event_schedule import DEFAULT_DURATION_MINUTES, check_schedule
+from retry_queue import DEAD_LETTER_FILE, RetryQueue
+from token_manager import is_token_valid, track_admins
+
+# Steps 4-7 of the setup as one entity-level pipeline.
+#
+# Instead of creating every event, then uploading every poster, then creating
+# every combo, each entity moves on as soon as what it depends on exists: an
+# event's poster upload is queued the moment the event is created, a combo is
+# created once both of its events have ids, and its poster follows right
+# after. All calls share one thread pool, so the run takes about as long as
+# the longest event -> combo -> poster chain. A call that fails transiently is
+# retried by its worker (RetryQueue.run), and dead-lettered when it runs out
+# of attempts.
+
+def plan_combos(events):
+    """Return [(spec, member event names)] for every combo the events allow"""
+    events_by_domain = group_by_domain(events)
+    plan = []
+    for spec in COMBO_SPECS:
+        members = combo_members(spec, events_by_domain)
+        if members:
+            plan.append((spec, [event['name'] for event in members]))
+    return plan
+
+def print_plan(events, combo_plan, posters_dir, stages):
+    """Show what the pipeline would do without calling the API"""
+    print(f"\nPipeline plan for {len(events)} events and {len(combo_plan)} combos:")
+    for event in events:
+        poster = None
+        if "event-posters" in stages:
+            poster, _ = find_event_poster(posters_dir, event['domain'], event['name'])
+        print(f"  event {event['domain']} - {event['name']}"
+              + (f" -> poster {os.path.basename(poster)}" if poster else ""))
+    if "combos" in stages:
+        for spec, names in combo_plan:
+            poster = find_domain_poster(posters_dir, spec['domain']) if "combo-posters" in stages else None
+            print(f"  combo {spec['name']} after {' + '.join(names)}"
+                  + (f" -> poster {os.path.basename(poster)}" if poster else ""))
+
+def run_pipeline(events, admin_tokens, posters_dir, stages, workers):
+    """Create events and combos and upload their posters as dependencies resolve"""
+    admin = random.choice(admin_tokens)
+    resolver = IdResolver(admin['token'])
+    combo_plan = plan_combos(events) if "combos" in stages else []
+    queue = RetryQueue()
+
+    # Combos still waiting for event ids, keyed by the event names they need
+    waiting = {index: set(names) for index, (_, names) in enumerate(combo_plan)}
+    event_ids = {}
+    counts = {"events": 0, "events_failed": 0, "event_posters": 0, "combos": 0,
+              "combos_failed": 0, "combo_posters": 0, "uploads_failed": 0, "no_poster": 0}
+
+    def retried(description, item, fn, *args):
+        """fn(*args) with retries, or None once it gave up or was cancelled"""
+        results = []
+        queue.run(description, lambda: results.append(fn(*args)), item=item)
+        return results[-1] if results else None
+
+    def make_event(event):
+        # Spread event creation across admins, as create-events.py does
+        token = random.choice(admin_tokens)['token']
+        try:
+            created, event_id = retried(f"event {event['name']}", {"kind": "event", "event": event},
+                                        create_event, token, event) or (False, None)
+        except requests.RequestException as e:
+            print(f"❌ Error creating event {event['name']}: {str(e)}")
+            return False, None
+        if created and event_id is None:
+            event_id = resolver.event_id(event['name'])
+        return created, event_id
+
+    def make_combo(spec, names):
+        payload = combo_payload(spec, [event_ids[name] for name in names])
+        try:
+            created, combo_id = retried(f"combo {spec['name']}", {"kind": "combo", "combo": payload},
+                                        create_combo, admin['token'], payload) or (False, None)
+        except requests.RequestException as e:
+            print(f"❌ Error creating combo {spec['name']}: {str(e)}")
+            return False, None
+        if created and combo_id is None:
+            combo_id = resolver.combo_id(spec['name'])
+        return created, combo_id
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+
+        def submit(kind, key, fn, *args):
+            pending[pool.submit(fn, *args)] = (kind, key)
+
+        for event in events:
+            submit("event", event, make_event, event)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, key = pending.pop(future)
+                result = future.result()
+
+                if kind == "event":
+                    created, event_id = result
+                    if not created or event_id is None:
+                        counts["events_failed"] += 1
+                        if created:
+                            print(f"❌ Could not find the id of event {key['name']}, skipping what depends on it")
+                        continue
+                    counts["events"] += 1
+                    event_ids[key['name']] = event_id
+
+                    if "event-posters" in stages:
+                        poster_path, _ = find_event_poster(posters_dir, key['domain'], key['name'])
+                        if poster_path:
+                            submit("event_poster", key['name'], retried, f"poster for event {key['name']}",
+                                   {"kind": "event_poster", "event_id": event_id, "poster": poster_path},
+                                   upload_poster, admin['token'], event_id, poster_path)
+                        else:
+                            counts["no_poster"] += 1
+
+                    # Start every combo whose last missing event this was
+                    for index, missing in list(waiting.items()):
+                        missing.discard(key['name'])
+                        if not missing:
+                            del waiting[index]
+                            spec, names = combo_plan[index]
+                            submit("combo", spec, make_combo, spec, names)
+
+                elif kind == "combo":
+                    created, combo_id = result
+                    if not created or combo_id is None:
+                        counts["combos_failed"] += 1
+                        if created:
+                            print(f"❌ Could not find the id of combo {key['name']}, skipping its poster")
+                        continue
+                    counts["combos"] += 1
+
+                    if "combo-posters" in stages:
+                        poster_path = find_domain_poster(posters_dir, key['domain'])
+                        if poster_path:
+                            submit("combo_poster", key['name'], retried, f"poster for combo {key['name']}",
+                                   {"kind": "combo_poster", "combo_id": combo_id, "poster": poster_path},
+                                   upload_combo_poster, admin['token'], combo_id, poster_path)
+                        else:
+                            counts["no_poster"] += 1
+
+                elif result:
+                    counts[f"{kind}s"] += 1
+                else:
+                    counts["uploads_failed"] += 1
+
+    # Combos whose events never got an id
+    counts["combos_failed"] += len(waiting)
+    counts["retries"] = queue.retried
+    counts["dead_lettered"] = queue.dead
+    counts["cancelled"] = queue.cancelled
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Create events and combos and upload their posters as one pipeline")
+    parser.add_argument('--events-file', default="json/events.json", help="Path to events JSON file")
+    parser.add_argument('--admins-file', default="json/admins.json", help="Path to admins JSON file")
+    parser.add_argument('--posters-dir', default="event-posters", help="Directory containing poster images")
+    parser.add_argument('--skip', type=str, default="", help="Comma-separated stages to leave out (event-posters,combos,combo-posters)")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent API calls (default: 8)")
+    parser.add_argument('--dry-run', action='store_true', help="Show the pipeline plan without making changes")
+    parser.add_argument('--default-duration', type=int, default=DEFAULT_DURATION_MINUTES, help=f"Minutes an event without durationMinutes holds its venue (default: {DEFAULT_DURATION_MINUTES})")
+    parser.add_argument('--allow-conflicts', action='store_true', help="Create events even if their venues or coordinators clash")
+    args = parser.parse_args()
+
+    events_file = args.events_file
+    admins_file = args.admins_file
+    posters_dir = args.posters_dir
+    dry_run = args.dry_run
+
+    stages = {"event-posters", "combos", "combo-posters"}
+    stages -= {stage.strip() for stage in args.skip.split(',')}
+    if "combos" not in stages:
+        stages.discard("combo-posters")
+
+    # Check if the files exist
+    for path in (events_file, admins_file):
+        if not os.path.exists(path):
+            print(f"Error: {path} not found!")
+            return
+
+    if stages & {"event-posters", "combo-posters"} and not os.path.exists(posters_dir):
+        print(f"Warning: Posters directory {posters_dir} not found, skipping poster uploads")
+        stages -= {"event-posters", "combo-posters"}
+
+    # Load events data
+    try:
+        with open(events_file, 'r') as f:
+            events_data = json.load(f)
+    except Exception as e:
+        print(f"Error loading events file: {str(e)}")
+        return
+
+    # Load admins data
+    try:
+        with open(admins_file, 'r') as f:
+            admins_data = json.load(f)
+    except Exception as e:
+        print(f"Error loading admins file: {str(e)}")
+        return
+
+    # Log in again for admins whose tokens are missing or about to expire; a dry run
+    # keeps the stored tokens and leaves admins.json alone
+    if not dry_run:
+        track_admins(admins_data, admins_file)
+
+    if 'events' not in events_data:
+        print("Error: JSON file must contain 'events' section")
+        return
+
+    events = events_data['events']
+
+    # Two events in one venue, or one coordinator in two events, at once
+    if not args.allow_conflicts and not check_schedule(events, args.default_duration):
+        print("Fix the schedule in events.json, or pass --allow-conflicts to create the events anyway")
+        sys.exit(1)
+
+    # Collect all admin tokens (including superadmin)
+    admin_tokens = []
+
+    # Add superadmin token if valid
+    superadmin = admins_data.get('superadmin', {})
+    superadmin_token = superadmin.get('jwt', '')
+    if is_token_valid(superadmin_token):
+        admin_tokens.append({
+            'name': superadmin.get('name', 'Superadmin'),
+            'email': superadmin.get('email', 'unknown'),
+            'token': superadmin_token
+        })
+
+    # Add regular admin tokens if valid
+    admins = admins_data.get('admins', [])
+    for admin in admins:
+        admin_token = admin.get('jwt', '')
+        if is_token_valid(admin_token):
+            admin_tokens.append({
+                'name': admin.get('name', 'Admin'),
+                'email': admin.get('email', 'unknown'),
+                'token': admin_token
+            })
+
+    if not admin_tokens:
+        print("No valid admin tokens found. Cannot create events.")
+        return
+
+    print(f"Found {len(admin_tokens)} valid admin tokens")
+
+    if dry_run:
+        print("DRY RUN MODE: No changes will be made")
+        print_plan(events, plan_combos(events) if "combos" in stages else [], posters_dir, stages)
+        return
+
+    start_time = time.time()
+    counts = run_pipeline(events, admin_tokens, posters_dir, stages, max(1, args.workers))
+
+    # Print summary
+    print("\n=== Event Pipeline Summary ===")
+    print(f"Total events processed: {len(events)}")
+    print(f"Events created/validated: {counts['events']}")
+    print(f"Events failed: {counts['events_failed']}")
+    print(f"Event posters uploaded: {counts['event_posters']}")
+    print(f"Combos created/validated: {counts['combos']}")
+    print(f"Combos failed: {counts['combos_failed']}")
+    print(f"Combo posters uploaded: {counts['combo_posters']}")
+    print(f"Entities with no poster available: {counts['no_poster']}")
+    print(f"Failed uploads: {counts['uploads_failed']}")
+    if counts["retries"] or counts["dead_lettered"]:
+        print(f"Retries: {counts['retries']}")
+        print(f"Dead-lettered: {counts['dead_lettered']}" + (f" (see {DEAD_LETTER_FILE})" if counts["dead_lettered"] else ""))
+    if counts["cancelled"]:
+        print(f"Cancelled at the deadline: {counts['cancelled']}")
+    print(f"Completed in {time.time() - start_time:.2f} seconds")
+
+if __name__ == "__main__":
+    if not run_in_daemon():
+        main()
@@ -0,0 +1,137 @@
+import heapq
+import re
+from datetime import datetime, timedelta
+
+from seed_schemas import EVENT_DATE_FORMAT
+
+# Venue and coordinator clashes in events.json.
+#
+# Every event occupies its venue from eventDate for durationMinutes (or a
+# default duration when the event does not say). Events are grouped per
+# venue and swept in start order with a heap of the slots still running, so
+# each venue is checked in O(n log n) plus one step per clash found. The
+# same sweep over each coordinator's events finds people booked into two
+# events at once. Coordinators are matched by name together with the phone
+# number of their entry ("Name - 9876543210"), since seed data reuses
+# placeholder numbers across people.
+
+DEFAULT_DURATION_MINUTES = 120
+DURATION_FIELD = "durationMinutes"
+
+_PHONE_RE = re.compile(r'\+?\d[\d\s-]{8,}\d')
+
+
+class Slot:
+    """The time an event holds its venue"""
+
+    __slots__ = ("position", "name", "venue", "start", "end", "coordinators")
+
+    def __init__(self, position, name, venue, start, end, coordinators):
+        self.position = position
+        self.name = name
+        self.venue = venue
+        self.start = start
+        self.end = end
+        self.coordinators = coordinators
+
+    def describe(self):
+        return f"'{self.name}' ({self.start:%d %b %H:%M}-{self.end:%H:%M})"
+
+
+def venue_key(venue):
+    return " ".join(venue.split()).casefold()
+
+
+def coordinator_key(entry):
+    """Normalised name and phone digits of a coordinator entry"""
+    match = _PHONE_RE.search(entry)
+    phone = re.sub(r'\D', '', match.group())[-10:] if match else ""
+    name = entry[:match.start()] if match else entry
+    return " ".join(name.replace(' - ', ' ').split()).strip(' -').casefold(), phone
+
+
+def event_slots(events, default_duration=DEFAULT_DURATION_MINUTES):
+    """Slots of the events that have a venue and a valid date
+
+    Events without them are left to the schema checks.
+    """
+    slots = []
+    for position, event in enumerate(events):
+        if not isinstance(event, dict):
+            continue
+        venue, date = event.get('venue'), event.get('eventDate')
+        if not isinstance(venue, str) or not venue.strip() or not isinstance(date, str):
+            continue
+        try:
+            start = datetime.strptime(date, EVENT_DATE_FORMAT)
+        except ValueError:
+            continue
+        duration = event.get(DURATION_FIELD)
+        if not isinstance(duration, int) or isinstance(duration, bool) or duration < 1:
+            duration = default_duration
+        coordinators = {coordinator_key(entry): entry.split(' - ')[0].strip()
+                        for entry in event.get('coordinatorDetails') or [] if isinstance(entry, str)}
+        slots.append(Slot(position, event.get('name', f"events[{position}]"), venue.strip(),
+                          start, start + timedelta(minutes=duration), coordinators))
+    return slots
+
+
+def find_overlaps(slots):
+    """Yield every pair of slots whose times overlap
+
+    Back-to-back slots, where one ends as the next starts, do not overlap.
+    """
+    running = []
+    for slot in sorted(slots, key=lambda s: (s.start, s.position)):
+        while running and running[0][0] <= slot.start:
+            heapq.heappop(running)
+        for _, _, other in running:
+            yield other, slot
+        heapq.heappush(running, (slot.end, slot.position, slot))
+
+
+def find_conflicts(events, default_duration=DEFAULT_DURATION_MINUTES):
+    """Return (venue clashes, coordinator clashes)
+
+    Venue clashes are (venue, slot, slot); coordinator clashes are
+    (coordinator name, slot, slot).
+    """
+    by_venue = {}
+    by_coordinator = {}
+    names = {}
+    for slot in event_slots(events, default_duration):
+        by_venue.setdefault(venue_key(slot.venue), []).append(slot)
+        for key, name in slot.coordinators.items():
+            by_coordinator.setdefault(key, []).append(slot)
+            names.setdefault(key, name)
+
+    venue_clashes = [(slots[0].venue, a, b) for slots in by_venue.values() for a, b in find_overlaps(slots)]
+    coordinator_clashes = [(names[key], a, b) for key, slots in by_coordinator.items()
+                           for a, b in find_overlaps(slots)]
+    return venue_clashes, coordinator_clashes
+
+
+def describe_conflicts(venue_clashes, coordinator_clashes):
+    """One line per clash"""
+    lines = [f"{venue}: {a.describe()} overlaps {b.describe()}" for venue, a, b in venue_clashes]
+    lines += [f"Coordinator {name} is booked for {a.describe()} and {b.describe()}"
+              for name, a, b in coordinator_clashes]
+    return lines
+
+
+def check_schedule(events, default_duration=DEFAULT_DURATION_MINUTES):
+    """Print every clash; return True when the schedule has none"""
+    venue_clashes, coordinator_clashes = find_conflicts(events, default_duration)
+    if not venue_clashes and not coordinator_clashes:
+        return True
+    print(f"❌ {len(venue_clashes)} venue and {len(coordinator_clashes)} coordinator clashes in the schedule:")
+    for line in describe_conflicts(venue_clashes, coordinator_clashes):
+        print(f"  - {line}")
+    return False
+
+
+def validate_schedule(events, report, default_duration=DEFAULT_DURATION_MINUTES, where="events.json"):
+    """Add every venue and coordinator clash to report.errors"""
+    venue_clashes, coordinator_clashes = find_conflicts(events, default_duration)
+    for line in describe_conflicts(venue_clashes, coordinator_clashes):
+        report.errors.append(f"{where}: {line}")
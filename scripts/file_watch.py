@@ -0,0 +1,226 @@
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import threading
+import time
+
+# File watching for the --watch modes of the upload scripts.
+#
+# On Linux, inotify reports new and changed files as they happen, so a watch
+# never rescans the tree. Elsewhere (or when inotify is unavailable) a polling
+# watcher compares stat snapshots instead. Either way, files are only handed
+# out once they have stopped changing for a debounce interval, so half-copied
+# images are never uploaded.
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+DEBOUNCE_SECONDS = 1.0
+POLL_INTERVAL = 2.0
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _is_watched(name, extensions):
+    return name.lower().endswith(extensions)
+
+
+def _scan(root, extensions, recursive=True):
+    """Return {path: (mtime_ns, size)} for matching files under root"""
+    snapshot = {}
+    for dirpath, dirnames, files in os.walk(root):
+        for name in files:
+            if _is_watched(name, extensions):
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        if not recursive:
+            dirnames.clear()
+    return snapshot
+
+
+class PollingWatcher:
+    """Detect changes by comparing periodic stat snapshots"""
+
+    name = "polling"
+
+    def __init__(self, root, extensions, recursive=True, interval=POLL_INTERVAL):
+        self.root = root
+        self.extensions = extensions
+        self.recursive = recursive
+        self.interval = interval
+        self._snapshot = _scan(root, extensions, recursive)
+
+    def changes(self, timeout):
+        time.sleep(max(timeout, self.interval))
+        snapshot = _scan(self.root, self.extensions, self.recursive)
+        changed = [path for path, signature in snapshot.items() if self._snapshot.get(path) != signature]
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Detect changes with Linux inotify, adding watches for new directories"""
+
+    name = "inotify"
+
+    def __init__(self, root, extensions, recursive=True):
+        self.root = root
+        self.extensions = extensions
+        self.recursive = recursive
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        self._add_tree(root)
+
+    def _add_dir(self, path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self._dirs[wd] = path
+
+    def _add_tree(self, root):
+        """Watch root (and its subdirectories), return files already inside"""
+        if not self.recursive:
+            self._add_dir(root)
+            return []
+        found = []
+        for dirpath, _, files in os.walk(root):
+            self._add_dir(dirpath)
+            found.extend(os.path.join(dirpath, name) for name in files if _is_watched(name, self.extensions))
+        return found
+
+    def changes(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+        data = os.read(self._fd, 64 * 1024)
+        changed = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode('utf-8', 'surrogateescape')
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; this is the only case that needs a rescan
+                changed.extend(_scan(self.root, self.extensions, self.recursive))
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                # A folder dropped in whole may already hold images
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.extend(self._add_tree(path))
+            elif _is_watched(name, self.extensions):
+                changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+def open_watcher(root, extensions=IMAGE_EXTENSIONS, recursive=True):
+    """Return an inotify watcher if possible, otherwise a polling one"""
+    try:
+        return InotifyWatcher(root, extensions, recursive)
+    except (OSError, AttributeError):
+        return PollingWatcher(root, extensions, recursive)
+
+
+def ready_files(root, extensions=IMAGE_EXTENSIONS, recursive=True, debounce=DEBOUNCE_SECONDS):
+    """Yield batches of new or changed files once they have stopped changing
+
+    Runs until interrupted. A file is ready when its size has stayed the same
+    for a full debounce interval after the last change event.
+    """
+    watcher = open_watcher(root, extensions, recursive)
+    print(f"Watching {root} for new images ({watcher.name})... press Ctrl+C to stop")
+    pending = {}
+    try:
+        while True:
+            now = time.monotonic()
+            for path in watcher.changes(timeout=debounce / 2):
+                pending[path] = (now, None)
+
+            now = time.monotonic()
+            ready = []
+            for path, (changed_at, size) in list(pending.items()):
+                if now - changed_at < debounce:
+                    continue
+                try:
+                    current = os.stat(path).st_size
+                except OSError:
+                    del pending[path]
+                    continue
+                if current != size:
+                    pending[path] = (now, current)
+                else:
+                    del pending[path]
+                    ready.append(path)
+            if ready:
+                yield ready
+    finally:
+        watcher.close()
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+# Gallery images already uploaded, by upload-gallery-images.py and replay
+GALLERY_MANIFEST = os.path.join(".cache", "gallery_uploaded.jsonl")
+
+
+class UploadManifest:
+    """Append-only record of which file versions have been uploaded"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._uploaded = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._uploaded[entry["path"]] = entry["signature"]
+
+    def is_uploaded(self, path):
+        try:
+            return self._uploaded.get(os.path.abspath(path)) == file_signature(path)
+        except OSError:
+            return False
+
+    def mark_uploaded(self, path, signature):
+        path = os.path.abspath(path)
+        with self._lock:
+            self._uploaded[path] = signature
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({"path": path, "signature": signature}) + "\n")
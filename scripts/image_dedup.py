@@ -0,0 +1,202 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Near-duplicate filtering for gallery uploads.
+#
+# Every image gets a 64-bit difference hash (dHash): the picture is shrunk to
+# 9x8 greyscale and each bit records whether a pixel is brighter than its
+# right-hand neighbour. Burst shots and re-exports of the same photo end up a
+# few bits apart, so images are clustered with a BK-tree over Hamming distance
+# and only one representative per cluster is uploaded. Hashes are computed in
+# a process pool and cached by file mtime and size. Needs Pillow; without it
+# the filter is skipped.
+
+HASH_CACHE = os.path.join(".cache", "phash.json")
+DEFAULT_THRESHOLD = 6
+
+
+def dhash(path, size=8):
+    """Return (difference hash, pixel area) of an image, None if it cannot be decoded"""
+    try:
+        with Image.open(path) as image:
+            area = image.width * image.height
+            image.draft("L", (size * 16, size * 16))
+            pixels = list(image.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+    except (OSError, ValueError):
+        return None
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value, area
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Metric tree for finding hashes within a Hamming distance"""
+
+    def __init__(self):
+        self._root = None
+
+    def add(self, value, item):
+        if self._root is None:
+            self._root = (value, item, {})
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (value, item, {})
+                return
+            node = child
+
+    def find(self, value, threshold):
+        """Return the closest item within threshold, or None"""
+        if self._root is None:
+            return None
+        best = None
+        stack = [self._root]
+        while stack:
+            node_value, item, children = stack.pop()
+            distance = hamming(value, node_value)
+            if distance <= threshold and (best is None or distance < best[0]):
+                best = (distance, item)
+            for child_distance, child in children.items():
+                if distance - threshold <= child_distance <= distance + threshold:
+                    stack.append(child)
+        return best[1] if best else None
+
+
+class HashCache:
+    """(hash, area) pairs keyed by real path, valid while mtime and size match
+
+    Real paths let workspaces that link to the same image directory share
+    their entries.
+    """
+
+    def __init__(self, path=HASH_CACHE):
+        self.path = path
+        self._entries = {}
+        self._dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _signature(path):
+        stat = os.stat(path)
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def get(self, path):
+        entry = self._entries.get(os.path.realpath(path))
+        try:
+            if entry and entry[:2] == self._signature(path):
+                return tuple(entry[2:])
+        except OSError:
+            pass
+        return None
+
+    def put(self, path, value):
+        try:
+            self._entries[os.path.realpath(path)] = self._signature(path) + list(value)
+            self._dirty = True
+        except OSError:
+            pass
+
+    def save(self):
+        if not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f)
+        os.replace(self.path + ".tmp", self.path)
+        self._dirty = False
+
+
+def compute_hashes(paths, cache, workers=None):
+    """Return {path: (hash, area)}, hashing uncached images in a process pool"""
+    hashes = {}
+    missing = []
+    for path in paths:
+        value = cache.get(path)
+        if value is None:
+            missing.append(path)
+        else:
+            hashes[path] = value
+
+    if missing:
+        print(f"Computing perceptual hashes for {len(missing)} images ({len(hashes)} cached)...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, value in zip(missing, pool.map(dhash, missing, chunksize=16)):
+                if value is not None:
+                    cache.put(path, value)
+                    hashes[path] = value
+        cache.save()
+    return hashes
+
+
+class NearDuplicateIndex:
+    """Representatives seen so far, looked up by perceptual hash"""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._tree = BKTree()
+
+    def match(self, value):
+        """Return the representative this hash is a near-duplicate of, or None"""
+        return self._tree.find(value, self.threshold)
+
+    def add(self, value, path):
+        self._tree.add(value, path)
+
+
+def filter_near_duplicates(paths, threshold=DEFAULT_THRESHOLD, workers=None, cache=None, index=None):
+    """Split paths into (representatives, {duplicate: representative})
+
+    Higher-resolution images are considered first so each cluster keeps its
+    best version. Images that cannot be hashed are always kept.
+    """
+    if Image is None:
+        print("Warning: Pillow is not installed, skipping near-duplicate filtering")
+        return list(paths), {}
+
+    cache = cache or HashCache()
+    index = index or NearDuplicateIndex(threshold)
+    hashes = compute_hashes(paths, cache, workers)
+
+    def quality(path):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        return hashes[path][1] if path in hashes else 0, size
+
+    keep = []
+    duplicates = {}
+    for path in sorted(paths, key=quality, reverse=True):
+        if path not in hashes:
+            keep.append(path)
+            continue
+        value = hashes[path][0]
+        representative = index.match(value)
+        if representative is None or representative == path:
+            index.add(value, path)
+            keep.append(path)
+        else:
+            duplicates[path] = representative
+    return keep, duplicates
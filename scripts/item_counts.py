@@ -0,0 +1,92 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+from multiprocessing import util
+
+# Work items a step processed, as opposed to the requests it sent.
+#
+# Every task handed to a RetryQueue is one item: a user, an event, a poster,
+# a team member, ... It is counted once when submitted and once more when it
+# succeeds or fails (dead-lettered, or cancelled at the deadline), however
+# many attempts it took, so retries do not inflate a step's throughput the
+# way they inflate its request count. When PARIDHI_ITEMS_FILE is set, the
+# process's counts are merged into that file at exit, which is how
+# setup-paridhi-portal.py learns what each step got done. Shard workers and
+# seeding daemon jobs merge their own, like the latency histograms.
+
+ITEMS_FILE_ENV = "PARIDHI_ITEMS_FILE"
+FIELDS = ("submitted", "succeeded", "failed")
+
+
+class ItemCounter:
+    """Items submitted, succeeded and failed in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(FIELDS, 0)
+
+    def add(self, field):
+        with self._lock:
+            self._counts[field] += 1
+
+    def take(self):
+        """Return the counts so far and start over"""
+        with self._lock:
+            counts, self._counts = self._counts, dict.fromkeys(FIELDS, 0)
+        return counts
+
+    def save(self, items_file=None):
+        """Merge this process's counts into items_file and start over"""
+        counts = self.take()
+        if items_file:
+            merge_counts(items_file, counts)
+
+
+def load_counts(path):
+    """Return {"submitted", "succeeded", "failed"} from an items file, None if there is none"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return {field: data.get(field, 0) for field in FIELDS}
+
+
+def merge_counts(path, counts):
+    """Add counts to the ones stored in path"""
+    if not any(counts.values()):
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Shards merge into the same file
+    with open(path + ".lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        stored = load_counts(path) or dict.fromkeys(FIELDS, 0)
+        for field in FIELDS:
+            stored[field] += counts.get(field, 0)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(stored, f)
+        os.replace(path + ".tmp", path)
+
+
+counter = ItemCounter()
+
+
+def _save_at_exit():
+    try:
+        counter.save(os.environ.get(ITEMS_FILE_ENV))
+    except OSError:
+        pass
+
+
+def _after_fork(counter):
+    # See latency_stats._after_fork
+    counter.take()
+    util.Finalize(None, _save_at_exit, exitpriority=10)
+
+
+atexit.register(_save_at_exit)
+util.register_after_fork(counter, _after_fork)
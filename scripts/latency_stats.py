@@ -0,0 +1,210 @@
+import atexit
+import bisect
+import fcntl
+import json
+import os
+import re
+import threading
+from multiprocessing import util
+from urllib.parse import urlsplit
+
+# Per-endpoint latency histograms, kept across runs.
+#
+# ApiSession records the time and upload size of every request it sends. When
+# the process exits, its histograms are merged into LATENCY_FILE, grouped by
+# backend and by endpoint ("POST /api/events/{id}/upload"). Ids, GIDs and
+# emails in the path are folded into {id}. Older samples are scaled down once
+# an endpoint has more than MAX_SAMPLES, so the histograms follow the
+# backend's recent behaviour. seed_plan.py reads them to estimate run times.
+#
+# Shard worker processes start with empty histograms and merge their own at
+# exit, so nothing is counted twice. When PARIDHI_STATS_FILE is set, the
+# process's own histograms are also merged into that file, which is how
+# setup-paridhi-portal.py learns what each step sent.
+
+LATENCY_FILE_ENV = "PARIDHI_LATENCY_FILE"
+LATENCY_FILE = os.environ.get(LATENCY_FILE_ENV, os.path.join(".cache", "latency.json"))
+STATS_FILE_ENV = "PARIDHI_STATS_FILE"
+MAX_SAMPLES = 5000
+
+# Bucket upper bounds in seconds; the last bucket is unbounded
+BUCKET_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_ID_SEGMENT = re.compile(r'[0-9@]')
+
+
+def endpoint_key(method, url):
+    """Return (backend, endpoint) for a request, e.g. ("http://host:8080", "GET /api/events")"""
+    parts = urlsplit(url)
+    segments = ["{id}" if _ID_SEGMENT.search(segment) else segment
+                for segment in parts.path.split('/')]
+    return f"{parts.scheme}://{parts.netloc}", f"{method.upper()} {'/'.join(segments) or '/'}"
+
+
+def request_bytes(kwargs):
+    """Size of the files a request uploads, 0 if it uploads none"""
+    size = 0
+    for value in (kwargs.get("files") or {}).values():
+        f = value[1] if isinstance(value, (tuple, list)) else value
+        try:
+            size += os.fstat(f.fileno()).st_size
+        except (AttributeError, OSError, ValueError):
+            pass
+    return size
+
+
+class Histogram:
+    """Latency histogram of one endpoint, with totals for means"""
+
+    __slots__ = ("buckets", "count", "seconds", "bytes", "max")
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.max = 0.0
+
+    def add(self, seconds, nbytes=0):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.seconds += seconds
+        self.bytes += nbytes
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.seconds += other.seconds
+        self.bytes += other.bytes
+        self.max = max(self.max, other.max)
+
+    def scale(self, factor):
+        self.buckets = [count * factor for count in self.buckets]
+        self.count *= factor
+        self.seconds *= factor
+        self.bytes *= factor
+
+    def mean(self):
+        return self.seconds / self.count if self.count else None
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def seconds_per_byte(self):
+        """Observed upload cost, None for endpoints that upload nothing"""
+        return self.seconds / self.bytes if self.bytes else None
+
+    def to_dict(self):
+        return {"buckets": self.buckets, "count": self.count, "seconds": self.seconds,
+                "bytes": self.bytes, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        buckets = data.get("buckets", [])
+        if len(buckets) == len(histogram.buckets):
+            histogram.buckets = list(buckets)
+        histogram.count = data.get("count", 0)
+        histogram.seconds = data.get("seconds", 0.0)
+        histogram.bytes = data.get("bytes", 0)
+        histogram.max = data.get("max", 0.0)
+        return histogram
+
+
+def load_histograms(path=LATENCY_FILE):
+    """Return {backend: {endpoint: Histogram}} from a latency file"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {backend: {endpoint: Histogram.from_dict(h) for endpoint, h in endpoints.items()}
+            for backend, endpoints in data.items()}
+
+
+class LatencyRecorder:
+    """Histograms of the requests sent by this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def record(self, method, url, seconds, nbytes=0):
+        backend, endpoint = endpoint_key(method, url)
+        with self._lock:
+            histogram = self._histograms.setdefault(backend, {}).get(endpoint)
+            if histogram is None:
+                histogram = self._histograms[backend][endpoint] = Histogram()
+            histogram.add(seconds, nbytes)
+
+    def take(self):
+        """Return the histograms recorded so far and start over"""
+        with self._lock:
+            recorded, self._histograms = self._histograms, {}
+        return recorded
+
+    def save(self, stats_file=None):
+        """Merge this process's histograms into LATENCY_FILE (and stats_file) and start over"""
+        save_histograms(self.take(), stats_file)
+
+
+def merge_histograms(path, recorded, max_samples=None):
+    """Add recorded histograms to the ones stored in path"""
+    if not recorded:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Shards and concurrent scripts merge into the same file
+    with open(path + ".lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        stored = load_histograms(path)
+        for backend, endpoints in recorded.items():
+            for endpoint, histogram in endpoints.items():
+                total = stored.setdefault(backend, {}).setdefault(endpoint, Histogram())
+                total.merge(histogram)
+                if max_samples and total.count > max_samples:
+                    total.scale(max_samples / total.count)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({backend: {endpoint: h.to_dict() for endpoint, h in endpoints.items()}
+                       for backend, endpoints in stored.items()}, f)
+        os.replace(path + ".tmp", path)
+
+
+def save_histograms(recorded, stats_file=None):
+    """Keep recorded histograms in LATENCY_FILE, and the run's own in stats_file"""
+    merge_histograms(LATENCY_FILE, recorded, MAX_SAMPLES)
+    if stats_file:
+        merge_histograms(stats_file, recorded)
+
+
+recorder = LatencyRecorder()
+
+
+def _save_at_exit():
+    try:
+        recorder.save(os.environ.get(STATS_FILE_ENV))
+    except OSError:
+        pass
+
+
+def _after_fork(recorder):
+    # Worker processes leave through os._exit, which skips atexit handlers.
+    # This runs after multiprocessing has cleared the finalizers the worker
+    # inherited, so the one registered here survives.
+    recorder.take()
+    util.Finalize(None, _save_at_exit, exitpriority=10)
+
+
+atexit.register(_save_at_exit)
+util.register_after_fork(recorder, _after_fork)
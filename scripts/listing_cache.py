@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+
+from api_session import BASE_URL, get_session
+
+# Conditional-GET cache for the event and combo listings.
+#
+# Listings are kept in memory for the rest of the process and on disk under
+# .cache/listings together with the ETag / Last-Modified headers the server
+# sent. The next fetch, in this step or a later one, revalidates with
+# If-None-Match / If-Modified-Since and only downloads the body again when the
+# server answers with something other than 304 Not Modified. Within one
+# process a listing is served from memory until it is invalidated; the
+# seeding daemon expires them all between jobs, so each job revalidates once.
+
+EVENTS_ENDPOINT = f"{BASE_URL}/api/events"
+COMBOS_ENDPOINT = f"{BASE_URL}/api/combos"
+
+CACHE_DIR = os.path.join(".cache", "listings")
+
+_memory = {}
+_fresh = set()
+
+
+def _cache_file(url):
+    name = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{name}.json")
+
+
+def _load_entry(url):
+    entry = _memory.get(url)
+    if entry is not None:
+        return entry
+    try:
+        with open(_cache_file(url), 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return entry if entry.get("url") == url else None
+
+
+def _store_entry(url, entry):
+    _memory[url] = entry
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = _cache_file(url)
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Warning: could not write listing cache: {str(e)}")
+
+
+def get_listing(url, token, label="items"):
+    """GET a listing endpoint, revalidating a cached copy when there is one
+
+    Returns the decoded list, or None if the request failed.
+    """
+    if url in _fresh:
+        return _memory[url]["body"]
+
+    print(f"Fetching all {label}...")
+
+    entry = _load_entry(url)
+    headers = {"Authorization": f"Bearer {token}"}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = get_session().get(url, headers=headers)
+
+    if response.status_code == 304 and entry:
+        _memory[url] = entry
+        _fresh.add(url)
+        print(f"✅ {label.capitalize()} unchanged, using {len(entry['body'])} cached {label}")
+        return entry["body"]
+    if response.status_code == 200:
+        body = response.json()
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        entry = {"url": url, "etag": etag, "last_modified": last_modified, "body": body}
+        if etag or last_modified:
+            _store_entry(url, entry)
+        else:
+            _memory[url] = entry
+        _fresh.add(url)
+        print(f"✅ Successfully retrieved {len(body)} {label}")
+        return body
+
+    print(f"❌ Failed to retrieve {label}: {response.status_code} - {response.text}")
+    return None
+
+
+def invalidate(url):
+    """Revalidate a listing on next use, e.g. after creating new items"""
+    _fresh.discard(url)
+
+
+def expire_all():
+    """Revalidate every listing on next use"""
+    _fresh.clear()
+
+
+def get_all_events(token):
+    """Get all events from the API"""
+    return get_listing(EVENTS_ENDPOINT, token, "events")
+
+
+def get_all_combos(token):
+    """Get all combos from the API"""
+    return get_listing(COMBOS_ENDPOINT, token, "combos")
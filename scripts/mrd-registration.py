@@ -1,123 +1,170 @@
-import requests
 import json
 import time
 import os
 import argparse
 
-# API configuration
-BASE_URL = "http://localhost:8080"
-MRD_ENDPOINT = f"{BASE_URL}/api/mrd/register"
+from daemon_client import run_in_daemon
+from records import load_gid_registry, registrations_due, write_mrd_journals
+from retry_queue import DEAD_LETTER_FILE, RetryQueue
+from shards import run_shards, shard_users, sum_counts
+from user_stream import UserStream, UserJournal, apply_journal, journal_files, journal_path
+from user_tasks import register_user_mrd
 
-def register_mrd(email):
-    """Register a user for MRD and get their GID"""
-    print(f"Registering MRD for: {email}...")
-    
-    request_data = {
-        "email": email
-    }
+def register_users(json_file, mrd_file, mrd_count, top_up=False, shard=None, shards=1):
+    """Make mrd_count MRD registrations for the users of one shard (or all users)
+
+    With top_up, users are only topped up to mrd_count GIDs in the registry.
+
+    MRD groups go to the MRD data journal of the shard, and users whose
+    legacy GIDs move to the registry go to the users journal; returns a dict
+    of counters.
+    """
+    counts = {"users": 0, "due": 0, "complete": 0, "legacy_gids": 0, "successful": 0, "retries": 0,
+              "dead_lettered": 0, "cancelled": 0}
+    registry = load_gid_registry(mrd_file)
     
-    response = requests.post(
-        MRD_ENDPOINT,
-        headers={"Content-Type": "application/json"},
-        data=json.dumps(request_data)
-    )
+    # Users are read one at a time and detailed MRD records are collected as
+    # one compact group per user. Registrations that hit a transient error are
+    # retried later while other users carry on.
+    with UserStream(json_file) as users, \
+            UserJournal(json_file, journal_path(json_file, shard)) as journal, \
+            UserJournal(mrd_file, journal_path(mrd_file, shard)) as groups, \
+            RetryQueue() as queue:
+        try:
+            for index, user in shard_users(users, shard, shards):
+                counts["users"] += 1
+                print(f"\n[User {index + 1}] Processing: {user['name']} ({user['email']})")
+                
+                legacy_gids, due = registrations_due(registry, user, mrd_count, top_up)
+                counts["due"] += due
+                counts["legacy_gids"] += len(legacy_gids)
+                task, finish, dead_letter = register_user_mrd(user, index, due, legacy_gids, journal, groups, counts)
+                if not due:
+                    counts["complete"] += 1
+                    if top_up:
+                        print(f"  Already has {mrd_count} MRD registrations")
+                    finish()
+                    continue
+                queue.submit(f"MRD registration for {user['email']}", task, finish, item=dead_letter)
+        except json.JSONDecodeError as e:
+            # Keep the GIDs and MRD records gathered before the bad record
+            print(f"Error: {json_file} is not a valid JSON file ({str(e)})")
     
-    if response.status_code == 201:
-        mrd_data = response.json()
-        gid = mrd_data.get("gid")
-        print(f"✅ Successfully registered MRD for {email} - GID: {gid}")
-        return gid, mrd_data
-    else:
-        print(f"❌ Failed to register MRD: {response.status_code} - {response.text}")
-        return None, None
+    counts["retries"] = queue.retried
+    counts["dead_lettered"] = queue.dead
+    counts["cancelled"] = queue.cancelled
+    return counts
 
 def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description="Register users for MRD and store GIDs")
     parser.add_argument('--file', default="json/users.json", help="Path to users JSON file")
     parser.add_argument('--mrd-count', type=int, default=10, help="Number of MRD registrations per user")
+    parser.add_argument('--top-up', action='store_true', help="Only register what each user is missing to hold --mrd-count GIDs in the registry")
+    parser.add_argument('--shards', type=int, default=1, help="Number of worker processes to split users across (default: 1)")
+    parser.add_argument('--dry-run', action='store_true', help="Validate without making changes")
     args = parser.parse_args()
     
     json_file = args.file
     mrd_count = args.mrd_count
+    top_up = args.top_up
+    shards = args.shards
+    dry_run = args.dry_run
+    
+    if shards < 1:
+        print("Error: --shards must be at least 1")
+        return
     
     # Check if the JSON file exists
     if not os.path.exists(json_file):
         print(f"Error: {json_file} not found!")
         return
     
-    # Load user data from JSON file
-    try:
-        with open(json_file, 'r') as f:
-            data = json.load(f)
-    except json.JSONDecodeError:
-        print(f"Error: {json_file} is not a valid JSON file")
-        return
-    except Exception as e:
-        print(f"Error reading {json_file}: {str(e)}")
-        return
+    mrd_file = "json/mrd_data.json"
     
-    # Extract data
-    if 'users' not in data:
-        print("Error: JSON file must contain 'users' section")
+    if dry_run:
+        print("DRY RUN MODE: No changes will be made")
+        try:
+            registry = load_gid_registry(mrd_file)
+            total_users = due = 0
+            with UserStream(json_file) as users:
+                for user in users:
+                    total_users += 1
+                    due += registrations_due(registry, user, mrd_count, top_up)[1]
+        except ValueError as e:
+            print(f"Error: {str(e)}")
+            return
+        print(f"{len(registry)} GIDs already registered in {mrd_file}")
+        if top_up:
+            print(f"Would make {due} MRD registrations to bring {total_users} users up to {mrd_count} each")
+        else:
+            print(f"Would make {due} MRD registrations for {total_users} users, {mrd_count} each")
+        print("Dry run completed, no changes were made.")
         return
     
-    users = data['users']
-    updated_users = False
-    all_mrd_data = []
-    total_successful = 0
+    # Fold in updates left behind by an interrupted run before reading the
+    # files, so its GIDs count towards --mrd-count with --top-up
+    try:
+        recovered = apply_journal(json_file)
+        if recovered:
+            print(f"Recovered {recovered} user updates from {journal_path(json_file)}")
+        if journal_files(mrd_file):
+            recovered = write_mrd_journals(mrd_file)
+            print(f"Recovered {recovered} MRD groups from an interrupted run into {mrd_file}")
+    except Exception as e:
+        print(f"Error applying the journals of an interrupted run: {str(e)}")
+        return
     
-    print(f"\nProcessing {len(users)} users, {mrd_count} MRD registrations each...")
+    if top_up:
+        print(f"\nTopping up users from {json_file} to {mrd_count} MRD registrations each...")
+    else:
+        print(f"\nProcessing users from {json_file}, {mrd_count} MRD registrations each...")
     
-    # Process each user
-    for user_index, user in enumerate(users, 1):
-        print(f"\n[User {user_index}/{len(users)}] Processing: {user['name']} ({user['email']})")
-        
-        # Initialize gids array if it doesn't exist
-        if "gids" not in user:
-            user["gids"] = []
-        
-        # Perform MRD registrations for this user
-        successful_registrations = 0
-        
-        for mrd_index in range(mrd_count):
-            print(f"  MRD registration {mrd_index+1}/{mrd_count}")
-            gid, mrd_data = register_mrd(user["email"])
-            
-            if gid:
-                user["gids"].append(gid)
-                all_mrd_data.append(mrd_data)
-                successful_registrations += 1
-                updated_users = True
-        
-        total_successful += successful_registrations
-        print(f"  Completed {successful_registrations}/{mrd_count} MRD registrations for {user['email']}")
+    try:
+        if shards > 1:
+            print(f"Splitting users across {shards} worker processes")
+            counts = sum_counts(run_shards(register_users, shards, json_file, mrd_file, mrd_count, top_up))
+        else:
+            counts = register_users(json_file, mrd_file, mrd_count, top_up)
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return
     
-    # Save updated user data with GIDs
-    if updated_users:
-        try:
-            with open(json_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            print(f"✅ Updated {json_file} with GIDs")
-        except Exception as e:
-            print(f"❌ Error updating {json_file}: {str(e)}")
-        
-    # Save detailed MRD data to a separate file for reference
+    # Merge this run's registrations into the GID registry
     try:
-        mrd_file = "json/mrd_data.json"
-        with open(mrd_file, 'w') as f:
-            json.dump(all_mrd_data, f, indent=2)
-        print(f"✅ Saved detailed MRD data to {mrd_file}")
+        write_mrd_journals(mrd_file)
+        print(f"✅ Merged detailed MRD data into {mrd_file}")
     except Exception as e:
         print(f"❌ Error saving MRD data: {str(e)}")
+        print(f"Registrations are kept in {journal_path(mrd_file)}* and will be merged on the next run")
+    
+    # Drop the legacy GID lists that moved to the registry
+    try:
+        if apply_journal(json_file):
+            print(f"✅ Moved legacy GIDs from {json_file} to {mrd_file}")
+    except Exception as e:
+        print(f"❌ Error updating {json_file}: {str(e)}")
+        print(f"Updates are kept in {journal_path(json_file)} and will be applied on the next run")
     
     # Print summary
+    total_users = counts["users"]
+    total_successful = counts["successful"]
     print("\n=== MRD Registration Summary ===")
-    print(f"Total users processed: {len(users)}")
+    print(f"Total users processed: {total_users}")
     print(f"MRD registrations per user: {mrd_count}")
-    print(f"Total MRD registrations attempted: {len(users) * mrd_count}")
+    if top_up:
+        print(f"Users already complete: {counts['complete']}")
+    if counts["legacy_gids"]:
+        print(f"Legacy GIDs moved from {json_file}: {counts['legacy_gids']}")
+    print(f"Total MRD registrations attempted: {counts['due']}")
     print(f"Total successful registrations: {total_successful}")
-    print(f"Failed registrations: {(len(users) * mrd_count) - total_successful}")
+    print(f"Failed registrations: {counts['due'] - total_successful}")
+    if counts["retries"] or counts["dead_lettered"]:
+        print(f"Retries: {counts['retries']}")
+        print(f"Dead-lettered: {counts['dead_lettered']}" + (f" (see {DEAD_LETTER_FILE})" if counts["dead_lettered"] else ""))
+    if counts["cancelled"]:
+        print(f"Cancelled at the deadline: {counts['cancelled']}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if not run_in_daemon():
+        main()
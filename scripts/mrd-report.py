@@ -0,0 +1,90 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+
+from mrd_report import (DEFAULT_BUCKET_MINUTES, DIMENSIONS, REPORT_CACHE_DIR, build_report, load_columns,
+                        np, report_rows)
+
+CSV_HEADER = ("section", "value", "registrations", "paid", "unpaid", "perMinute")
+
+def print_report(report, top):
+    """Print the report as text tables"""
+    print(f"Registrations: {report['registrations']} "
+          f"(paid {report['paid']}, unpaid {report['unpaid']})")
+    for name in DIMENSIONS:
+        entries = report[name]
+        print(f"\n=== Per {name} ({len(entries)}) ===")
+        print(f"{'registrations':>13} {'paid':>8} {'unpaid':>8}  {name}")
+        for entry in entries[:top] if top else entries:
+            print(f"{entry['registrations']:>13} {entry['paid']:>8} {entry['unpaid']:>8}  {entry['value']}")
+        if top and len(entries) > top:
+            print(f"{'':>13} ... {len(entries) - top} more")
+
+    timeline = report["timeline"]
+    print(f"\n=== Registrations per {timeline['bucketMinutes']} minutes ===")
+    if not timeline["buckets"]:
+        print("No registrations with a registeredAt time")
+    for entry in timeline["buckets"]:
+        print(f"{entry['start']}  {entry['registrations']:>8} ({entry['perMinute']:.2f}/min, paid {entry['paid']})")
+
+def write_report(report, fmt, output):
+    """Write the report as JSON or CSV to output ('-' for stdout)"""
+    f = sys.stdout if output == "-" else open(output, 'w', encoding='utf-8', newline='')
+    try:
+        if fmt == "json":
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        else:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+            writer.writerows(report_rows(report))
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Report MRD registrations per college, department, year and time")
+    parser.add_argument('--file', default="json/mrd_data.json", help="Path to MRD data JSON file")
+    parser.add_argument('--format', choices=("text", "csv", "json"), default="text", help="Output format (default: text)")
+    parser.add_argument('--output', default="-", help="File to write csv/json output to (default: stdout)")
+    parser.add_argument('--bucket-minutes', type=int, default=DEFAULT_BUCKET_MINUTES, help=f"Width of the registration time buckets (default: {DEFAULT_BUCKET_MINUTES})")
+    parser.add_argument('--top', type=int, default=20, help="Rows to print per table in text output, 0 for all (default: 20)")
+    parser.add_argument('--cache-dir', default=REPORT_CACHE_DIR, help=f"Directory for the binary column cache (default: {REPORT_CACHE_DIR})")
+    parser.add_argument('--no-cache', action='store_true', help="Parse the JSON file without reading or writing the cache")
+    args = parser.parse_args()
+
+    if args.bucket_minutes < 1:
+        print("Error: --bucket-minutes must be at least 1")
+        sys.exit(1)
+
+    if not os.path.exists(args.file):
+        print(f"Error: {args.file} not found!")
+        sys.exit(1)
+
+    start_time = time.time()
+    try:
+        columns, cached = load_columns(args.file, args.cache_dir, use_cache=not args.no_cache)
+    except ValueError as e:
+        print(f"Error: {args.file} is not valid MRD data: {str(e)}")
+        sys.exit(1)
+    loaded_ms = (time.time() - start_time) * 1000
+
+    report = build_report(columns, args.bucket_minutes)
+    elapsed_ms = (time.time() - start_time) * 1000
+
+    if args.format == "text":
+        print_report(report, args.top)
+    else:
+        write_report(report, args.format, args.output)
+
+    # Timings go to stderr so they never end up in csv/json output
+    source = "binary cache" if cached else args.file
+    print(f"\n{len(columns)} registrations loaded from {source} in {loaded_ms:.1f} ms, "
+          f"report built in {elapsed_ms:.1f} ms ({'NumPy' if np is not None else 'pure Python'})",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
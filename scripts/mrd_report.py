@@ -0,0 +1,225 @@
+import json
+import os
+import sys
+from array import array
+from collections import Counter
+from itertools import compress, repeat
+from operator import floordiv
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from records import PROFILE_FIELDS, format_timestamp, load_mrd_table
+
+# Columnar report over mrd_data.json.
+#
+# Parsing mrd_data.json is the slow part, so the columns the report needs are
+# cached as raw binary files under REPORT_CACHE_DIR: one int32 code per row
+# for college, department and year (indexes into the value lists kept in
+# meta.json), one byte for hasPaid and an int64 epoch for registeredAt. The
+# cache is rebuilt whenever mrd_data.json changes size or mtime. With NumPy
+# the column files are memory-mapped and counted with bincount; without it
+# they are read into arrays and counted in Python, which is slower but gives
+# the same report.
+
+REPORT_CACHE_DIR = os.path.join(".cache", "mrd_report")
+DIMENSIONS = ("college", "department", "year")
+DEFAULT_BUCKET_MINUTES = 60
+UNKNOWN = "(unknown)"
+
+# Column name -> (array typecode, NumPy dtype)
+COLUMN_TYPES = {
+    "college": ("i", "int32"),
+    "department": ("i", "int32"),
+    "year": ("i", "int32"),
+    "paid": ("B", "uint8"),
+    "registered": ("q", "int64")
+}
+
+
+class MrdColumns:
+    """The report's columns, as NumPy arrays when available, else arrays"""
+
+    def __init__(self, rows, values, columns):
+        self.rows = rows
+        self.values = values
+        self.columns = columns
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return {"source": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def columns_from_table(table):
+    """Build MrdColumns from a records.MrdTable"""
+    values = {}
+    columns = {}
+    for name in DIMENSIONS:
+        field = PROFILE_FIELDS.index(name)
+        codes = {}
+        profile_codes = [codes.setdefault(profile[field] or UNKNOWN, len(codes)) for profile in table.profiles]
+        values[name] = list(codes)
+        columns[name] = array('i', (profile_codes[profile] for profile in table.profile))
+    columns["paid"] = array('B', table.has_paid)
+    columns["registered"] = array('q', table.registered_at)
+    if np is not None:
+        # Same column types as a cache read, so the counting code sees ndarrays either way
+        columns = {name: np.asarray(column) for name, column in columns.items()}
+    return MrdColumns(len(table), values, columns)
+
+
+def write_cache(columns, stamp, cache_dir=REPORT_CACHE_DIR):
+    """Write the columns and their meta.json; meta.json goes last so a torn cache is never used"""
+    os.makedirs(cache_dir, exist_ok=True)
+    for name, (typecode, _) in COLUMN_TYPES.items():
+        path = os.path.join(cache_dir, f"{name}.bin")
+        column = columns[name]
+        with open(path + ".tmp", 'wb') as f:
+            if np is not None:
+                np.asarray(column, dtype=COLUMN_TYPES[name][1]).tofile(f)
+            else:
+                array(typecode, column).tofile(f)
+        os.replace(path + ".tmp", path)
+    meta = dict(stamp, rows=len(columns), values=columns.values)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    with open(meta_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def read_cache(stamp, cache_dir=REPORT_CACHE_DIR):
+    """Return the cached MrdColumns if they match stamp, else None"""
+    try:
+        with open(os.path.join(cache_dir, "meta.json"), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(meta.get(key) != value for key, value in stamp.items()):
+        return None
+
+    rows = meta["rows"]
+    columns = {}
+    for name, (typecode, dtype) in COLUMN_TYPES.items():
+        path = os.path.join(cache_dir, f"{name}.bin")
+        itemsize = array(typecode).itemsize
+        try:
+            if os.path.getsize(path) != rows * itemsize:
+                return None
+            if np is not None:
+                # np.memmap cannot map an empty file
+                columns[name] = np.memmap(path, dtype=dtype, mode='r', shape=(rows,)) if rows \
+                    else np.zeros(0, dtype=dtype)
+            else:
+                column = array(typecode)
+                with open(path, 'rb') as f:
+                    column.fromfile(f, rows)
+                columns[name] = column
+        except (OSError, EOFError):
+            return None
+    return MrdColumns(rows, meta["values"], columns)
+
+
+def load_columns(path, cache_dir=REPORT_CACHE_DIR, use_cache=True):
+    """Return (MrdColumns, whether they came from the cache) for an mrd_data.json file"""
+    stamp = _source_stamp(path)
+    if use_cache:
+        columns = read_cache(stamp, cache_dir)
+        if columns is not None:
+            return columns, True
+    columns = columns_from_table(load_mrd_table(path))
+    if use_cache:
+        try:
+            write_cache(columns, stamp, cache_dir)
+        except OSError as e:
+            # The report still runs on the parsed columns
+            print(f"Warning: could not write the report cache to {cache_dir}: {str(e)}", file=sys.stderr)
+            return columns, False
+        # Read back so the report runs on the same (mapped) columns either way
+        cached = read_cache(stamp, cache_dir)
+        if cached is not None:
+            columns = cached
+    return columns, False
+
+
+def _count(codes, size, mask=None):
+    """Number of rows per code, optionally only the rows where mask is set"""
+    if np is not None:
+        if mask is not None:
+            codes = codes[np.asarray(mask, dtype=bool)]
+        return np.bincount(codes, minlength=size).tolist()
+    counts = Counter(codes if mask is None else compress(codes, mask))
+    return [counts.get(code, 0) for code in range(size)]
+
+
+def dimension_counts(columns, name):
+    """Rows of (value, registrations, paid, unpaid) for one dimension, busiest first"""
+    values = columns.values[name]
+    totals = _count(columns[name], len(values))
+    paid = _count(columns[name], len(values), columns["paid"])
+    rows = [(value, total, paid_count, total - paid_count)
+            for value, total, paid_count in zip(values, totals, paid) if total]
+    rows.sort(key=lambda row: (-row[1], row[0]))
+    return rows
+
+
+def time_buckets(columns, bucket_minutes=DEFAULT_BUCKET_MINUTES):
+    """Rows of (bucket start, registrations, paid) in time order
+
+    Registrations without a registeredAt are left out.
+    """
+    width = bucket_minutes * 60
+    registered = columns["registered"]
+    if np is not None:
+        registered = np.asarray(registered)
+        known = registered >= 0
+        starts = registered[known] // width * width
+        paid = np.asarray(columns["paid"])[known].astype(bool)
+        buckets, totals = np.unique(starts, return_counts=True)
+        paid_counts = dict(zip(*np.unique(starts[paid], return_counts=True))) if paid.any() else {}
+        return [(int(start), int(total), int(paid_counts.get(start, 0)))
+                for start, total in zip(buckets, totals)]
+    # Bucket numbers rather than start times keep the loops in C; a missing
+    # time (-1) lands in bucket -1
+    totals = Counter(map(floordiv, registered, repeat(width)))
+    paid_counts = Counter(compress(map(floordiv, registered, repeat(width)), columns["paid"]))
+    return [(bucket * width, totals[bucket], paid_counts[bucket]) for bucket in sorted(totals) if bucket >= 0]
+
+
+def build_report(columns, bucket_minutes=DEFAULT_BUCKET_MINUTES):
+    """The full report as a JSON-ready dict"""
+    paid = int(sum(_count(columns["paid"], 2)[1:]))
+    report = {
+        "registrations": len(columns),
+        "paid": paid,
+        "unpaid": len(columns) - paid
+    }
+    for name in DIMENSIONS:
+        report[name] = [{"value": value, "registrations": total, "paid": paid_count, "unpaid": unpaid}
+                        for value, total, paid_count, unpaid in dimension_counts(columns, name)]
+    report["timeline"] = {
+        "bucketMinutes": bucket_minutes,
+        "buckets": [{"start": format_timestamp(start), "registrations": total, "paid": paid_count,
+                     "perMinute": round(total / bucket_minutes, 2)}
+                    for start, total, paid_count in time_buckets(columns, bucket_minutes)]
+    }
+    return report
+
+
+def report_rows(report):
+    """Flatten a report into (section, value, registrations, paid, unpaid, per minute) rows for CSV"""
+    yield "total", "", report["registrations"], report["paid"], report["unpaid"], ""
+    for name in DIMENSIONS:
+        for entry in report[name]:
+            yield name, entry["value"], entry["registrations"], entry["paid"], entry["unpaid"], ""
+    for entry in report["timeline"]["buckets"]:
+        yield ("timeline", entry["start"], entry["registrations"], entry["paid"],
+               entry["registrations"] - entry["paid"], entry["perMinute"])
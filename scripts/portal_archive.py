@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+import zipfile
+from datetime import datetime
+
+# Archive format shared by snapshot-portal.py and restore-portal.py.
+#
+# A snapshot is a single zip file:
+#
+#   manifest.json      source URL, time and item counts
+#   <section>.json     what the API returned for events, combos, galleries,
+#                      team and mrd
+#   images/<sha1>.ext  poster and gallery images, stored once per content
+#
+# JSON sections are deflated; images are stored as they are, since they are
+# already compressed. Items point at their image through an "archiveImage"
+# key added next to the API's imageDetails.
+
+ARCHIVE_VERSION = 1
+SECTIONS = ("events", "combos", "galleries", "team", "mrd")
+SECTION_LABELS = {"events": "Events", "combos": "Combos", "galleries": "Gallery images",
+                  "team": "Team members", "mrd": "MRD records"}
+
+
+def image_url(item):
+    """Return the hosted image URL of an API item, None if it has none"""
+    details = item.get('imageDetails') or {}
+    return details.get('secure_url') or details.get('secureUrl') or item.get('imageUrl')
+
+
+class SnapshotWriter:
+    """Write a snapshot archive; images can be added from several threads"""
+
+    def __init__(self, path, source):
+        self.path = path
+        self.manifest = {
+            "version": ARCHIVE_VERSION,
+            "source": source,
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "counts": {},
+            "images": 0
+        }
+        self._lock = threading.Lock()
+        self._images = set()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._zip = zipfile.ZipFile(path + ".tmp", 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def add_image(self, content, url):
+        """Store image bytes once and return their name in the archive"""
+        ext = os.path.splitext(url.split('?')[0])[1].lower() or ".jpg"
+        name = f"images/{hashlib.sha1(content).hexdigest()}{ext}"
+        with self._lock:
+            if name not in self._images:
+                self._zip.writestr(name, content, compress_type=zipfile.ZIP_STORED)
+                self._images.add(name)
+        return name
+
+    def write_section(self, section, items):
+        with self._lock:
+            self._zip.writestr(f"{section}.json", json.dumps(items))
+            self.manifest["counts"][section] = len(items)
+
+    def close(self):
+        """Finish the archive and move it into place"""
+        with self._lock:
+            self.manifest["images"] = len(self._images)
+            self._zip.writestr("manifest.json", json.dumps(self.manifest, indent=2))
+            self._zip.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def abort(self):
+        self._zip.close()
+        os.remove(self.path + ".tmp")
+
+
+class SnapshotReader:
+    """Read a snapshot archive"""
+
+    def __init__(self, path):
+        self._zip = zipfile.ZipFile(path)
+        self._lock = threading.Lock()
+        self.manifest = json.loads(self._zip.read("manifest.json"))
+        if self.manifest.get("version") != ARCHIVE_VERSION:
+            raise ValueError(f"{path}: unsupported snapshot version {self.manifest.get('version')}")
+
+    def section(self, section):
+        """Return the items of a section, or an empty list if it was skipped"""
+        if section not in self.manifest["counts"]:
+            return []
+        return json.loads(self._zip.read(f"{section}.json"))
+
+    def extract_image(self, name, directory):
+        """Write an archived image to directory and return its path"""
+        path = os.path.join(directory, os.path.basename(name))
+        if not os.path.exists(path):
+            with self._lock:
+                content = self._zip.read(name)
+            # Per-thread temporary name, two items may share an image
+            temporary = f"{path}.{threading.get_ident()}.tmp"
+            with open(temporary, 'wb') as f:
+                f.write(content)
+            os.replace(temporary, path)
+        return path
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,79 @@
+import os
+import re
+
+# Matching poster files to events and domains.
+#
+# An event's poster is DOMAIN_EventName.ext (with or without underscores
+# between the words), else any file whose name contains both the domain and
+# the event name once punctuation and case are dropped, else the domain's
+# own DOMAIN.ext. The uploaders and the offline validator share these rules.
+
+POSTER_EXTENSIONS = ['.jpeg', '.jpg', '.png', '.gif']
+
+
+def normalize_name(name):
+    """Normalize event name for filename matching"""
+    # Remove special characters and spaces, convert to lowercase
+    return re.sub(r'[^a-zA-Z0-9]', '', name).lower()
+
+
+class PosterIndex:
+    """The files of a poster directory, listed once, and the rules matching them to events
+
+    find_event_poster and find_domain_poster build one per lookup; callers
+    matching many events against one directory can keep their own.
+    Raises OSError if the directory cannot be listed.
+    """
+
+    def __init__(self, posters_dir):
+        self.posters_dir = posters_dir
+        with os.scandir(posters_dir) as entries:
+            self.names = [entry.name for entry in entries if entry.is_file()]
+        self._files = set(self.names)
+        self._normalized = None
+
+    def event_poster(self, domain, event_name):
+        """Return (path, "event" or "domain") of the poster for an event, (None, None) if none"""
+        # 1. First, check for exact domain_eventName match
+        for ext in POSTER_EXTENSIONS:
+            # DOMAIN_EventName.ext, then with underscores: DOMAIN_Event_Name.ext
+            for filename in (f"{domain}_{event_name.replace(' ', '')}{ext}",
+                             f"{domain}_{event_name.replace(' ', '_')}{ext}"):
+                if filename in self._files:
+                    return os.path.join(self.posters_dir, filename), "event"
+
+        # 2. Search for any file that contains domain + event name
+        if self._normalized is None:
+            self._normalized = [(normalize_name(os.path.splitext(filename)[0]), filename) for filename in self.names]
+        normalized_event_name = normalize_name(event_name)
+        for filename_normalized, filename in self._normalized:
+            if domain.lower() in filename_normalized and normalized_event_name in filename_normalized:
+                return os.path.join(self.posters_dir, filename), "event"
+
+        # 3. Fall back to domain-level poster
+        domain_poster = self.domain_poster(domain)
+        if domain_poster:
+            return domain_poster, "domain"
+
+        # 4. No matching poster found
+        return None, None
+
+    def domain_poster(self, domain):
+        """Return the path of a domain's poster, None if there is none"""
+        for ext in POSTER_EXTENSIONS:
+            if f"{domain}{ext}" in self._files:
+                return os.path.join(self.posters_dir, f"{domain}{ext}")
+        return None
+
+
+def find_event_poster(posters_dir, domain, event_name):
+    """Find a poster for an event with fallback to domain poster"""
+    return PosterIndex(posters_dir).event_poster(domain, event_name)
+
+
+def find_domain_poster(posters_dir, domain):
+    """Find a poster for a domain"""
+    try:
+        return PosterIndex(posters_dir).domain_poster(domain)
+    except OSError:
+        return None
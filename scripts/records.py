@@ -0,0 +1,244 @@
+import calendar
+import json
+import os
+import sys
+import time
+from array import array
+
+from user_stream import UserStream, JsonArrayWriter, journal_files, merge_journals
+
+# Compact record model for MRD data.
+#
+# Profile values such as college, department and year repeat across
+# thousands of records, so they are interned and stored once. MRD
+# registrations are kept as columns that point back at a single copy of each
+# user profile. Users themselves are streamed one at a time (see
+# user_stream.py) and never all held in memory.
+#
+# mrd_data.json doubles as the GID registry: GidRegistry indexes it by GID,
+# and every run's registrations are merged into it instead of replacing it.
+# A user's GIDs live there only, users.json no longer carries them.
+
+PROFILE_FIELDS = ("name", "email", "contact", "college", "year", "department", "rollNo")
+
+MRD_COMPACT_FORMAT = "mrd-compact/1"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def intern_value(value):
+    """Intern strings so repeated values share one object"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def parse_timestamp(value):
+    """Convert 'YYYY-MM-DD HH:MM:SS' to epoch seconds, -1 if missing or invalid"""
+    if not value:
+        return -1
+    try:
+        return calendar.timegm(time.strptime(value, TIMESTAMP_FORMAT))
+    except ValueError:
+        return -1
+
+
+def format_timestamp(seconds):
+    """Inverse of parse_timestamp"""
+    if seconds < 0:
+        return None
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(seconds))
+
+
+class MrdTable:
+    """Columnar store of MRD registrations
+
+    Each user profile is stored once in 'profiles'; every registration is one
+    row across the id, gid, profile, has_paid and registered_at columns.
+    """
+
+    def __init__(self):
+        self.profiles = []
+        self._profile_index = {}
+        self.ids = array('q')
+        self.gids = []
+        self.profile = array('l')
+        self.has_paid = bytearray()
+        self.registered_at = array('q')
+
+    def __len__(self):
+        return len(self.gids)
+
+    def add_profile(self, record):
+        """Return the row number of a profile, adding it if it is new"""
+        email = record.get("email")
+        index = self._profile_index.get(email)
+        if index is None:
+            index = len(self.profiles)
+            self.profiles.append(tuple(intern_value(record.get(name)) for name in PROFILE_FIELDS))
+            self._profile_index[email] = index
+        return index
+
+    def add(self, record, profile=None):
+        """Append one MRD registration given as an API response dict; a missing id is stored as -1"""
+        id_ = record.get("id")
+        self.ids.append(-1 if id_ is None else id_)
+        self.gids.append(record.get("gid"))
+        self.profile.append(self.add_profile(record) if profile is None else profile)
+        self.has_paid.append(1 if record.get("hasPaid") else 0)
+        self.registered_at.append(parse_timestamp(record.get("registeredAt")))
+
+    def add_group(self, group):
+        """Append all registrations from one compact group"""
+        profile = self.add_profile(group["profile"])
+        for id_, gid, paid, registered in zip(group["id"], group["gid"],
+                                              group["hasPaid"], group["registeredAt"]):
+            self.add({"id": id_, "gid": gid, "hasPaid": paid, "registeredAt": registered},
+                     profile=profile)
+
+    def record(self, row):
+        """Return one registration as a full MRD record dict"""
+        record = {"id": self.ids[row], "gid": self.gids[row]}
+        record.update(zip(PROFILE_FIELDS, self.profiles[self.profile[row]]))
+        record["hasPaid"] = bool(self.has_paid[row])
+        record["registeredAt"] = format_timestamp(self.registered_at[row])
+        return record
+
+    def records(self):
+        for row in range(len(self)):
+            yield self.record(row)
+
+    def groups(self):
+        """Yield compact groups, one per profile, in first-seen order"""
+        rows = [[] for _ in self.profiles]
+        for row, profile in enumerate(self.profile):
+            rows[profile].append(row)
+        for profile, profile_rows in enumerate(rows):
+            if profile_rows:
+                yield make_group(
+                    dict(zip(PROFILE_FIELDS, self.profiles[profile])),
+                    [self.record(row) for row in profile_rows]
+                )
+
+
+class GidRegistry(MrdTable):
+    """MrdTable with one row per GID, indexed by GID and counted per email
+
+    Adding a GID that is already there updates its row when the new record
+    is a full API response, and is ignored otherwise.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._rows = {}
+        self._counts = {}
+
+    def __contains__(self, gid):
+        return gid in self._rows
+
+    def add(self, record, profile=None):
+        gid = record.get("gid")
+        if not gid:
+            return
+        row = self._rows.get(gid)
+        if row is not None:
+            if record.get("id") not in (None, -1):
+                self.ids[row] = record["id"]
+                self.has_paid[row] = 1 if record.get("hasPaid") else 0
+                self.registered_at[row] = parse_timestamp(record.get("registeredAt"))
+            return
+        self._rows[gid] = len(self.gids)
+        super().add(record, profile)
+        self._counts[self.profile[-1]] = self._counts.get(self.profile[-1], 0) + 1
+
+    def lookup(self, gid):
+        """The MRD record of a GID, None if it is not registered"""
+        row = self._rows.get(gid)
+        return None if row is None else self.record(row)
+
+    def count(self, email):
+        """Number of GIDs registered to an email"""
+        return self._counts.get(self._profile_index.get(email), 0)
+
+
+def registrations_due(registry, user, mrd_count, top_up=False):
+    """(GIDs of the user's legacy 'gids' list missing from the registry, registrations still due)
+
+    mrd_count registrations are due for every user. With top_up they are
+    only due until the user holds mrd_count GIDs, counting the legacy ones.
+    """
+    legacy = [gid for gid in dict.fromkeys(user.get("gids") or ()) if gid and gid not in registry]
+    if not top_up:
+        return legacy, mrd_count
+    return legacy, max(0, mrd_count - registry.count(user.get("email")) - len(legacy))
+
+
+def make_group(profile, records):
+    """Build one compact mrd_data group from a profile and its MRD records"""
+    return {
+        "profile": {name: profile.get(name) for name in PROFILE_FIELDS},
+        "id": [record.get("id") for record in records],
+        "gid": [record.get("gid") for record in records],
+        "hasPaid": [bool(record.get("hasPaid")) for record in records],
+        "registeredAt": [record.get("registeredAt") for record in records]
+    }
+
+
+def mrd_writer(path):
+    """Open a streaming writer for the compact mrd_data format
+
+    The file is {"format": "mrd-compact/1", "users": [group, ...]} where each
+    group carries a user profile once and its registrations as columns.
+    """
+    return JsonArrayWriter(path, key="users", header={"format": MRD_COMPACT_FORMAT}, compact=True)
+
+
+def write_mrd_journals(path):
+    """Merge the MRD groups collected in index-keyed journals into mrd_data.json
+
+    The registrations already in the file are kept, groups from every shard
+    are added in users.json order, GIDs that are already there are not added
+    twice, and the journals are removed. Returns the number of groups merged.
+    """
+    files = journal_files(path)
+    registry = load_gid_registry(path)
+    merged = 0
+    for _, group in merge_journals(files):
+        registry.add_group(group)
+        merged += 1
+    write_mrd_table(registry, path)
+    for journal in files:
+        os.remove(journal)
+    return merged
+
+
+def load_gid_registry(path):
+    """Load mrd_data.json as a GidRegistry, empty if the file does not exist"""
+    if not os.path.exists(path):
+        return GidRegistry()
+    return load_mrd_table(path, GidRegistry())
+
+
+def load_mrd_table(path, table=None):
+    """Load mrd_data.json in either the legacy list format or the compact one
+
+    Rows go into table when one is given, a new MrdTable otherwise.
+    """
+    table = MrdTable() if table is None else table
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+    if first == "[":
+        with open(path, 'r', encoding='utf-8') as f:
+            for record in json.load(f):
+                table.add(record)
+    else:
+        with UserStream(path) as groups:
+            for group in groups:
+                table.add_group(group)
+    return table
+
+
+def write_mrd_table(table, path):
+    """Write an MrdTable in the compact mrd_data format"""
+    with mrd_writer(path) as writer:
+        for group in table.groups():
+            writer.write(group)
@@ -1,11 +1,11 @@
-import requests
 import json
 import time
 import os
 import argparse
 
+from api_session import BASE_URL, get_session
+
 # API configuration
-BASE_URL = "http://localhost:8080"
 LOGIN_ENDPOINT = f"{BASE_URL}/api/auth/login"
 ADMIN_ENDPOINT = f"{BASE_URL}/api/admin"
 
@@ -13,7 +13,7 @@ def login_user(credentials):
     """Login as a user and get JWT token"""
     print(f"Logging in as {credentials['email']}...")
     
-    response = requests.post(
+    response = get_session().post(
         LOGIN_ENDPOINT, 
         headers={"Content-Type": "application/json"},
         data=json.dumps(credentials)
@@ -35,7 +35,7 @@ def is_token_valid(token):
     # Make a simple request to check token validity
     test_endpoint = f"{BASE_URL}/api/auth/verify"
     try:
-        response = requests.get(
+        response = get_session().get(
             test_endpoint,
             headers={"Authorization": f"Bearer {token}"}
         )
@@ -62,7 +62,7 @@ def create_admin(token, admin_data):
     if "department" in admin_data:
         create_data["department"] = admin_data["department"]
     
-    response = requests.post(
+    response = get_session().post(
         ADMIN_ENDPOINT,
         headers={
             "Content-Type": "application/json",
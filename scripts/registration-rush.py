@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import deadlines
+from api_session import BASE_URL
+from latency_stats import recorder
+from run_history import append_run
+from rush_scenario import (DEFAULT_INTERVAL, DRAIN_SECONDS, OPERATIONS, PERCENTILES, RushStats, arrival_times,
+                           make_student, run_student, run_summary, student_pools, write_report)
+
+RUSH_FILE = os.path.join("logs", "registration_rush.jsonl")
+
+def format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.0f} ms"
+
+def window_label(start, interval):
+    return f"{start}s-{start + interval}s"
+
+def print_window(summary, interval, out):
+    error_rate = summary["errors"] / summary["calls"] if summary["calls"] else 0
+    print(f"{window_label(summary['start'], interval):<13}  arrived {summary['arrived']:>5}  "
+          f"done {summary['finished']:>5}  calls {summary['calls']:>6} ({summary['throughput']:.1f}/s)  "
+          f"errors {error_rate:6.1%}  " + "  ".join(f"p{pct} {format_ms(summary[f'p{pct}'])}" for pct in PERCENTILES),
+          file=out, flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the backend with an opening-day registration rush")
+    parser.add_argument('--rate', type=float, default=5.0, help="Students arriving per second at full load (default: 5)")
+    parser.add_argument('--ramp-up', type=float, default=30.0, help="Seconds over which the arrival rate climbs to --rate (default: 30)")
+    parser.add_argument('--duration', type=float, default=120.0, help="Seconds during which students arrive, ramp-up included (default: 120)")
+    parser.add_argument('--think-time', type=float, default=1.0, help="Mean pause in seconds between a student's calls (default: 1)")
+    parser.add_argument('--mrd-count', type=int, default=1, help="MRD registrations per student (default: 1)")
+    parser.add_argument('--max-users', type=int, default=200, help="Students in flight at once; later arrivals wait and are reported as late (default: 200)")
+    parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL, help=f"Reporting window in seconds (default: {DEFAULT_INTERVAL})")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for arrivals, think times and student details (default: 0)")
+    parser.add_argument('--users-file', default="json/users.json", help="users.json to draw colleges, years and departments from")
+    parser.add_argument('--output', help="Also write the report to this JSON file")
+    parser.add_argument('--no-save', action='store_true', help=f"Do not append the report to {RUSH_FILE}")
+    parser.add_argument('--verbose', action='store_true', help="Show every call's output")
+    parser.add_argument('--dry-run', action='store_true', help="Print the arrival schedule without sending anything")
+    args = parser.parse_args()
+
+    if args.rate <= 0 or args.duration <= 0 or args.ramp_up < 0 or args.think_time < 0:
+        print("Error: --rate and --duration must be positive, --ramp-up and --think-time not negative")
+        sys.exit(1)
+    if args.mrd_count < 0 or args.max_users < 1 or args.interval < 1:
+        print("Error: --mrd-count must not be negative, --max-users and --interval must be at least 1")
+        sys.exit(1)
+
+    arrivals = arrival_times(args.rate, args.ramp_up, args.duration, args.seed)
+    pools = student_pools(args.users_file)
+    run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    calls = len(arrivals) * (2 + args.mrd_count)
+    print(f"Registration rush against {BASE_URL}: {len(arrivals)} students over {args.duration:g}s "
+          f"(up to {args.rate:g}/s after {args.ramp_up:g}s), {calls} calls at most")
+    print(f"Drawing from {len(pools[0])} colleges, {len(pools[1])} years and {len(pools[2])} departments")
+    if args.dry_run:
+        for start in range(0, int(args.duration), args.interval):
+            count = sum(1 for at in arrivals if start <= at < start + args.interval)
+            print(f"{window_label(start, args.interval):<13}  arriving {count:>5}  ({count / args.interval:.1f}/s)")
+        print("Dry run completed, no requests were sent.")
+        return
+
+    stats = RushStats(args.interval)
+    # Calls still running DRAIN_SECONDS after the last arrival are cut off
+    deadlines.set_deadline(time.time() + args.duration + DRAIN_SECONDS)
+    out = sys.stdout
+    shown = set()
+
+    def show_closed():
+        for index in stats.closed_windows():
+            if index not in shown:
+                shown.add(index)
+                print_window(stats.window_summary(index), args.interval, out)
+
+    def start_student(number, scheduled):
+        stats.user_started(time.perf_counter() - scheduled)
+        student = make_student(run_id, number, pools, random.Random(f"{args.seed}-{number}"))
+        run_student(student, stats, args.think_time, args.mrd_count, random.Random(f"{args.seed}-{number}-think"))
+
+    print("\nCalls and latencies per window (latencies of successful calls only):")
+    futures = []
+    with open(os.devnull, 'w') as devnull, redirect_stdout(out if args.verbose else devnull), \
+            ThreadPoolExecutor(max_workers=args.max_users, thread_name_prefix="student") as pool:
+        try:
+            for number, at in enumerate(arrivals):
+                scheduled = stats.start + at
+                while time.perf_counter() < scheduled:
+                    show_closed()
+                    time.sleep(min(0.1, max(0.0, scheduled - time.perf_counter())))
+                futures.append(pool.submit(start_student, number, scheduled))
+            pending = futures
+            while pending:
+                _, pending = wait(pending, timeout=0.5)
+                show_closed()
+        except KeyboardInterrupt:
+            print("\nInterrupted, waiting for the students in flight...", file=out)
+            deadlines.set_deadline(time.time())
+            for future in futures:
+                future.cancel()
+
+    windows = [stats.window_summary(index) for index in stats.window_indexes()]
+    for summary in windows:
+        if summary["start"] // args.interval not in shown:
+            print_window(summary, args.interval, out)
+    # Rush latencies would skew --plan's estimates for seeding this backend
+    recorder.take()
+
+    report = run_summary(stats, {"run": run_id, "backend": BASE_URL, "rate": args.rate, "rampUp": args.ramp_up,
+                                 "duration": args.duration, "thinkTime": args.think_time,
+                                 "mrdCount": args.mrd_count, "maxUsers": args.max_users,
+                                 "interval": args.interval, "seed": args.seed, "students": len(arrivals)},
+                         windows)
+
+    print("\n=== Registration Rush Summary ===")
+    print(f"Students: {len(arrivals)} in {report['seconds']:.1f}s, "
+          f"{sum(summary['calls'] for summary in windows) / max(report['seconds'], 1e-9):.1f} calls/s overall")
+    for operation in OPERATIONS:
+        totals = report["operations"][operation]
+        print(f"  {operation:<9} {totals['calls']:>6} calls  {totals['errors']:>5} errors ({totals['errorRate']:.1%})  "
+              + "  ".join(f"p{pct} {format_ms(totals[f'p{pct}'])}" for pct in PERCENTILES))
+    if report["cancelled"]:
+        print(f"Students cut off at the end of the drain: {report['cancelled']}")
+    if report["lateStarts"]:
+        print(f"Students who started over 1s late because --max-users were busy: {report['lateStarts']} "
+              f"(worst {report['maxStartLag']:.1f}s)")
+
+    if args.output:
+        write_report(report, args.output)
+        print(f"Report written to {args.output}")
+    if not args.no_save:
+        append_run(report, RUSH_FILE)
+        print(f"Report appended to {RUSH_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import json
+import os
+import argparse
+
+from daemon_client import run_in_daemon
+from entities import (create_combo, create_event, create_team_member, upload_combo_poster, upload_gallery_image,
+                      upload_poster)
+from file_watch import GALLERY_MANIFEST, UploadManifest, file_signature
+from records import write_mrd_journals
+from retry_queue import DEAD_LETTER_FILE, MAX_ATTEMPTS, RetryQueue, read_dead_letters, resend, write_dead_letter
+from token_manager import is_token_valid, track_admins
+from user_stream import UserJournal, UserStream, apply_journal, journal_path
+from user_tasks import import_user, register_user_mrd
+
+class ReplayContext:
+    """Fresh tokens and the local files replayed items write their results to"""
+    
+    def __init__(self, admins_file, users_file, mrd_file):
+        self.admins_file = admins_file
+        self.users_file = users_file
+        self.mrd_file = mrd_file
+        self.user_updates = {}
+        self.groups = None
+        self.manifest = None
+        self._admin_token = None
+    
+    def admin_token(self):
+        """A valid admin token, logging in again if the stored ones are stale"""
+        if self._admin_token is None:
+            with open(self.admins_file, 'r') as f:
+                admins_data = json.load(f)
+            track_admins(admins_data, self.admins_file)
+            accounts = [admins_data.get('superadmin', {})] + list(admins_data.get('admins', []))
+            self._admin_token = next((account['jwt'] for account in accounts
+                                      if is_token_valid(account.get('jwt'))), "")
+            if not self._admin_token:
+                print(f"❌ No valid admin token in {self.admins_file}")
+        return self._admin_token
+    
+    def write(self, index, user):
+        """Journal interface for user tasks; only the JWT is saved, matched by email"""
+        if user.get("jwt"):
+            self.user_updates[user["email"]] = user["jwt"]
+    
+    def mrd_groups(self):
+        if self.groups is None:
+            self.groups = UserJournal(self.mrd_file, journal_path(self.mrd_file))
+        return self.groups
+    
+    def gallery_manifest(self):
+        if self.manifest is None:
+            self.manifest = UploadManifest(GALLERY_MANIFEST)
+        return self.manifest
+    
+    def save(self):
+        """Write JWTs to users.json and GIDs to mrd_data.json"""
+        if self.groups is not None:
+            self.groups.close()
+            print(f"✅ Merged {write_mrd_journals(self.mrd_file)} replayed MRD groups into {self.mrd_file}")
+        if self.user_updates:
+            with UserStream(self.users_file) as users, UserJournal(self.users_file) as journal:
+                for index, user in enumerate(users):
+                    token = self.user_updates.get(user.get("email"))
+                    if token is not None:
+                        journal.write(index, dict(user, jwt=token))
+            print(f"✅ Updated {apply_journal(self.users_file)} users in {self.users_file}")
+
+def replay_item(item, context):
+    """(task, dead_letter) that runs a dead-lettered item through its step's handler
+    
+    task() returns True on success; dead_letter() describes what is left.
+    """
+    kind = item["kind"]
+    if kind == "user":
+        counts = {"registered": 0, "profiles": 0, "jwt_updated": 0}
+        return import_user(item["user"], item["index"], context, counts, registered=item.get("registered", False))
+    if kind == "mrd":
+        counts = {"successful": 0}
+        task, _, dead_letter = register_user_mrd(item["user"], item["index"], item["count"], [],
+                                                 context, context.mrd_groups(), counts)
+        return task, dead_letter
+    
+    def unchanged():
+        return item
+    
+    if kind == "event":
+        return lambda: create_event(context.admin_token(), item["event"])[0], unchanged
+    if kind == "combo":
+        return lambda: create_combo(context.admin_token(), item["combo"])[0], unchanged
+    if kind == "team_member":
+        return lambda: create_team_member(context.admin_token(), item["member"]), unchanged
+    if kind == "event_poster":
+        return lambda: upload_poster(context.admin_token(), item["event_id"], item["poster"]), unchanged
+    if kind == "combo_poster":
+        return lambda: upload_combo_poster(context.admin_token(), item["combo_id"], item["poster"]), unchanged
+    if kind == "gallery_image":
+        def upload_image():
+            signature = file_signature(item["image"])
+            if not upload_gallery_image(context.admin_token(), item["image"], item["year"]):
+                return False
+            context.gallery_manifest().mark_uploaded(item["image"], signature)
+            return True
+        return upload_image, unchanged
+    raise ValueError(f"unknown dead-letter item kind '{kind}'")
+
+def resend_request(request, context):
+    """Task that resends a raw request, for entries written without an item"""
+    def task():
+        token = context.admin_token() if "Authorization" in request.get("headers", {}) else None
+        response = resend(request, token)
+        if response.ok or response.status_code == 409:
+            return True
+        print(f"❌ {response.status_code} - {response.text}")
+        return False
+    return task
+
+def replay_entry(entry, context, dead_letter_file, counts):
+    """(task, on_give_up) that replays one dead letter and writes it back if it fails again"""
+    if "item" in entry:
+        run, dead_letter = replay_item(entry["item"], context)
+    else:
+        run, dead_letter = resend_request(entry["request"], context), None
+    
+    def fail(error):
+        entry["error"] = error
+        if dead_letter:
+            entry["item"] = dead_letter()
+        write_dead_letter(dead_letter_file, entry)
+        counts["failed"] += 1
+    
+    def task():
+        try:
+            succeeded = run()
+        except OSError as e:
+            print(f"❌ Cannot replay {entry.get('task')}: {str(e)}")
+            fail(str(e))
+            return
+        
+        if succeeded:
+            print(f"✅ Replayed {entry.get('task')}")
+            counts["succeeded"] += 1
+        else:
+            print(f"❌ Replay of {entry.get('task')} failed")
+            fail("replay failed, see the replay output")
+    
+    def give_up(error):
+        entry["attempts"] = entry.get("attempts", 0) + MAX_ATTEMPTS
+        fail(str(error))
+    
+    return task, give_up
+
+def describe_entry(entry):
+    item = entry.get("item")
+    if item:
+        return f"{item['kind']} item"
+    request = entry["request"]
+    return f"{request['method']} {request['url']}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the items that ran out of retries")
+    parser.add_argument('--file', default=DEAD_LETTER_FILE, help=f"Dead-letter file (default: {DEAD_LETTER_FILE})")
+    parser.add_argument('--source', help="Only replay entries written by this script (e.g. users-data-import.py)")
+    parser.add_argument('--admins-file', default="json/admins.json", help="Admins to take a fresh token from")
+    parser.add_argument('--users-file', default="json/users.json", help="users.json that replayed users' JWTs are saved to")
+    parser.add_argument('--mrd-file', default="json/mrd_data.json", help="GID registry that replayed MRD registrations are merged into")
+    parser.add_argument('--dry-run', action='store_true', help="List the entries without resending them")
+    args = parser.parse_args()
+    
+    dead_letter_file = args.file
+    replaying_file = dead_letter_file + ".replaying"
+    
+    # Entries left behind by an interrupted replay come first
+    entries = read_dead_letters(replaying_file) + read_dead_letters(dead_letter_file)
+    if not entries:
+        print(f"No dead letters in {dead_letter_file}")
+        return
+    
+    selected = [entry for entry in entries if not args.source or entry.get("source") == args.source]
+    print(f"Found {len(entries)} dead letters, replaying {len(selected)}")
+    
+    if args.dry_run:
+        print("DRY RUN MODE: No requests will be sent")
+        for index, entry in enumerate(selected, 1):
+            print(f"  {index}. [{entry.get('source')}] {entry.get('task')}: {describe_entry(entry)} ({entry.get('error')})")
+        return
+    
+    # Move the entries aside; whatever fails again is written back to the file
+    with open(replaying_file + ".tmp", 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+    os.replace(replaying_file + ".tmp", replaying_file)
+    if os.path.exists(dead_letter_file):
+        os.remove(dead_letter_file)
+    for entry in entries:
+        if entry not in selected:
+            write_dead_letter(dead_letter_file, entry)
+    
+    counts = {"succeeded": 0, "failed": 0}
+    context = ReplayContext(args.admins_file, args.users_file, args.mrd_file)
+    
+    with RetryQueue(dead_letter_file=None) as queue:
+        for entry in selected:
+            task, give_up = replay_entry(entry, context, dead_letter_file, counts)
+            queue.submit(entry.get("task", describe_entry(entry)), task, give_up)
+    
+    # Save what the server returned; journals that cannot be applied now are
+    # applied by the next run of the user import or MRD step
+    try:
+        context.save()
+    except (OSError, ValueError) as e:
+        print(f"❌ Error saving replayed results: {str(e)}")
+    os.remove(replaying_file)
+    
+    # Print summary
+    print("\n=== Dead Letter Replay Summary ===")
+    print(f"Entries replayed: {len(selected)}")
+    print(f"Succeeded: {counts['succeeded']}")
+    print(f"Failed again: {counts['failed']}")
+    if counts["failed"]:
+        print(f"Remaining entries are in {dead_letter_file}")
+
+if __name__ == "__main__":
+    if not run_in_daemon():
+        main()
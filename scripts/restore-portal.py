@@ -0,0 +1,246 @@
+import json
+import random
+import time
+import argparse
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from api_session import BASE_URL, get_session
+from daemon_client import run_in_daemon
+from entities import (MRD_ENDPOINT, IdResolver, combo_payload, create_combo, create_event,
+                      create_team_member, register_mrd, upload_combo_poster, upload_gallery_image,
+                      upload_poster)
+from portal_archive import SECTIONS, SnapshotReader
+from seed_schemas import EVENT_SCHEMA
+from token_manager import is_token_valid, track_admins
+
+# Replay a snapshot taken by snapshot-portal.py into an empty backend.
+#
+# Events, gallery images, team members and MRD records are restored at the
+# same time on one thread pool, each event followed by its poster. Combos
+# start once every event has its new id, since they refer to events by id.
+# Images are extracted from the archive to a temporary directory and sent
+# through the usual upload calls.
+#
+# MRD records are registered again, and the backend issues new GIDs for
+# them. Nothing is remapped: registries such as json/mrd_data.json and
+# anything else holding the archived GIDs still refer to the old ones.
+
+TEAM_FIELDS = ("name", "email", "year", "linkedInLink", "facebookLink", "instagramLink",
+               "githubLink", "imageLink", "designation")
+
+def event_payload(event):
+    """Fields of an archived event that the create endpoint accepts"""
+    return {key: event[key] for key in EVENT_SCHEMA.fields if event.get(key) is not None}
+
+def team_payload(member):
+    """Flatten an archived team member back into the create request"""
+    data = {**member, **(member.get('socialLinks') or {})}
+    payload = {key: data.get(key) or "" for key in TEAM_FIELDS}
+    payload['designation'] = payload['designation'] or "MEMBER"
+    return payload
+
+def combo_event_ids(combo):
+    """Ids of the events an archived combo bundles"""
+    if combo.get('eventIds'):
+        return list(combo['eventIds'])
+    return [event.get('id') for event in combo.get('events', [])]
+
+class Restore:
+    """Restore the sections of one archive with a pool of workers"""
+
+    def __init__(self, reader, admin_tokens, image_dir):
+        self.reader = reader
+        self.admin_tokens = admin_tokens
+        self.token = admin_tokens[0]['token']
+        self.image_dir = image_dir
+        self.resolver = IdResolver(self.token)
+
+    def image(self, item):
+        name = item.get('archiveImage')
+        return self.reader.extract_image(name, self.image_dir) if name else None
+
+    def event(self, event):
+        """Create an event and upload its poster; return (new id, counts)"""
+        counts = Counter()
+        # Spread event creation across admins, as create-events.py does
+        token = random.choice(self.admin_tokens)['token']
+        created, event_id = create_event(token, event_payload(event))
+        if created and event_id is None:
+            event_id = self.resolver.event_id(event['name'])
+        if event_id is None:
+            counts["events_failed"] += 1
+            return None, counts
+        counts["events"] += 1
+
+        poster = self.image(event)
+        if poster:
+            counts["event_posters" if upload_poster(self.token, event_id, poster) else "uploads_failed"] += 1
+        return event_id, counts
+
+    def combo(self, combo, event_ids):
+        """Create a combo for the restored events and upload its poster"""
+        counts = Counter()
+        payload = combo_payload(combo, event_ids)
+        created, combo_id = create_combo(self.token, payload)
+        if created and combo_id is None:
+            combo_id = self.resolver.combo_id(combo['name'])
+        if combo_id is None:
+            counts["combos_failed"] += 1
+            return counts
+        counts["combos"] += 1
+
+        poster = self.image(combo)
+        if poster:
+            counts["combo_posters" if upload_combo_poster(self.token, combo_id, poster) else "uploads_failed"] += 1
+        return counts
+
+    def gallery_item(self, item):
+        path = self.image(item)
+        if not path:
+            return Counter(galleries_failed=1)
+        ok = upload_gallery_image(self.token, path, item.get('paridhiYear', ''))
+        return Counter(galleries=1) if ok else Counter(galleries_failed=1)
+
+    def team_member(self, member):
+        ok = create_team_member(self.token, team_payload(member))
+        return Counter(team=1) if ok else Counter(team_failed=1)
+
+    def mrd_record(self, record):
+        """Register the MRD again, and mark it paid if it was
+
+        The record gets a new GID; the archived one is not kept.
+        """
+        gid, _ = register_mrd(record['email'])
+        if gid is None:
+            return Counter(mrd_failed=1)
+        if record.get('hasPaid'):
+            response = get_session().patch(
+                f"{MRD_ENDPOINT}/{gid}/payment",
+                headers={"Authorization": f"Bearer {self.token}"}
+            )
+            if response.status_code != 200:
+                print(f"❌ Failed to mark MRD {gid} as paid: {response.status_code} - {response.text}")
+        return Counter(mrd=1)
+
+    def run(self, sections, workers):
+        counts = Counter()
+
+        def safely(fn, *args):
+            try:
+                return fn(*args)
+            except requests.RequestException as e:
+                print(f"❌ Error restoring {fn.__name__}: {str(e)}")
+                return Counter({f"{fn.__name__}_errors": 1})
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            event_futures = {}
+            if "events" in sections:
+                event_futures = {pool.submit(safely, self.event, event): event
+                                 for event in self.reader.section("events")}
+            others = []
+            for section, fn in (("galleries", self.gallery_item), ("team", self.team_member),
+                                ("mrd", self.mrd_record)):
+                if section in sections:
+                    others += [pool.submit(safely, fn, item) for item in self.reader.section(section)]
+
+            # Archived event id -> id in the new backend
+            new_ids = {}
+            for future in as_completed(event_futures):
+                result = future.result()
+                if isinstance(result, Counter):
+                    counts.update(result)
+                    continue
+                event_id, event_counts = result
+                counts.update(event_counts)
+                if event_id is not None:
+                    new_ids[event_futures[future].get('id')] = event_id
+
+            if "combos" in sections:
+                for combo in self.reader.section("combos"):
+                    old_ids = combo_event_ids(combo)
+                    if not old_ids or any(old_id not in new_ids for old_id in old_ids):
+                        print(f"❌ Skipping combo {combo['name']}, not all of its events were restored")
+                        counts["combos_failed"] += 1
+                        continue
+                    others.append(pool.submit(safely, self.combo, combo, [new_ids[i] for i in old_ids]))
+
+            for future in others:
+                counts.update(future.result())
+        return counts
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Restore a snapshot from snapshot-portal.py into an empty backend",
+        epilog="Restored MRD records get new GIDs from the backend. The archived GIDs are not reused or "
+               "remapped, so json/mrd_data.json and other lists of the old GIDs do not match the restored portal."
+    )
+    parser.add_argument('archive', help="Snapshot archive to restore")
+    parser.add_argument('--admins-file', default="json/admins.json", help="Path to admins JSON file")
+    parser.add_argument('--skip', type=str, default="", help=f"Comma-separated sections to leave out ({','.join(SECTIONS)})")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent API calls (default: 8)")
+    parser.add_argument('--dry-run', action='store_true', help="Show what the archive holds without making changes")
+    args = parser.parse_args()
+
+    skip = {section.strip() for section in args.skip.split(',')}
+    sections = [section for section in SECTIONS if section not in skip]
+    if "events" not in sections and "combos" in sections:
+        print("Warning: combos need their events, skipping combos")
+        sections.remove("combos")
+
+    try:
+        reader = SnapshotReader(args.archive)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Error opening {args.archive}: {str(e)}")
+        return
+
+    with reader:
+        manifest = reader.manifest
+        print(f"Snapshot of {manifest['source']} taken {manifest['created']}: "
+              + ", ".join(f"{count} {section}" for section, count in manifest['counts'].items())
+              + f", {manifest['images']} images")
+
+        if args.dry_run:
+            print("DRY RUN MODE: No changes will be made")
+            print(f"Would restore {', '.join(sections)} into {BASE_URL}")
+            return
+
+        # Load admins data
+        try:
+            with open(args.admins_file, 'r') as f:
+                admins_data = json.load(f)
+        except Exception as e:
+            print(f"Error loading admins file: {str(e)}")
+            return
+
+        track_admins(admins_data, args.admins_file)
+        accounts = [admins_data.get('superadmin', {})] + list(admins_data.get('admins', []))
+        admin_tokens = [{'email': account.get('email', 'unknown'), 'token': account['jwt']}
+                        for account in accounts if is_token_valid(account.get('jwt'))]
+        if not admin_tokens:
+            print("No valid admin tokens found. Cannot restore.")
+            return
+
+        start_time = time.time()
+        with tempfile.TemporaryDirectory(prefix="paridhi-restore-") as image_dir:
+            counts = Restore(reader, admin_tokens, image_dir).run(sections, max(1, args.workers))
+
+    # Print summary
+    print("\n=== Portal Restore Summary ===")
+    print(f"Target: {BASE_URL}")
+    print(f"Events created/validated: {counts['events']} (failed: {counts['events_failed'] + counts['event_errors']})")
+    print(f"Event posters uploaded: {counts['event_posters']}")
+    print(f"Combos created/validated: {counts['combos']} (failed: {counts['combos_failed'] + counts['combo_errors']})")
+    print(f"Combo posters uploaded: {counts['combo_posters']}")
+    print(f"Gallery images uploaded: {counts['galleries']} (failed: {counts['galleries_failed'] + counts['gallery_item_errors']})")
+    print(f"Team members added: {counts['team']} (failed: {counts['team_failed'] + counts['team_member_errors']})")
+    print(f"MRD records registered: {counts['mrd']} (failed: {counts['mrd_failed'] + counts['mrd_record_errors']})")
+    print(f"Failed uploads: {counts['uploads_failed']}")
+    print(f"Completed in {time.time() - start_time:.2f} seconds")
+
+if __name__ == "__main__":
+    if not run_in_daemon():
+        main()
@@ -0,0 +1,242 @@
+import heapq
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+import deadlines
+from api_session import RetryableError, get_session, retryable_errors
+from deadlines import DeadlineExceeded
+from item_counts import counter as items
+
+# Retries for transient API failures.
+#
+# Scripts hand each unit of work to a RetryQueue as a task. When a task hits
+# a retryable failure (connection error, 429, 502, 503, ...) it is scheduled
+# again after an exponential backoff with full jitter, and the queue moves on
+# to the next item instead of sleeping. Retries run as soon as they are due,
+# between new items, and whatever is left is drained at the end. A task that
+# is still failing after MAX_ATTEMPTS is written to the dead-letter file,
+# together with the request that failed (credentials redacted) and the item
+# the task was working on. replay-dead-letters.py runs the item through the
+# step's own handler again, so what the server returns is saved as usual.
+#
+# Tasks are called again from the start, so they keep track of the steps they
+# have already done and skip them on the next attempt.
+#
+# Worker pools use run() instead of submit(): the worker thread waits out its
+# item's backoff itself, and any number of workers can share one queue.
+#
+# Once the step's deadline (see deadlines.py) has passed, new tasks and
+# pending retries are cancelled instead of run. Their on_give_up is still
+# called, so partial results are recorded.
+#
+# Every task counts as one item in item_counts.py, whatever number of
+# attempts it takes.
+
+MAX_ATTEMPTS = 5
+BASE_DELAY = 0.5
+MAX_DELAY = 30.0
+DEAD_LETTER_FILE = os.path.join("logs", "dead_letters.jsonl")
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds to wait before retry number `attempt` (1-based)"""
+    delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+    if retry_after:
+        delay = max(delay, min(retry_after, MAX_DELAY))
+    return delay
+
+
+def write_dead_letter(path, entry):
+    """Append one entry to a dead-letter file"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def read_dead_letters(path=DEAD_LETTER_FILE):
+    """Return the entries of a dead-letter file, skipping torn lines"""
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return entries
+
+
+class RetryQueue:
+    """Run tasks now, and retry the ones that fail transiently later
+
+    Use as a context manager; leaving the block drains the pending retries.
+    """
+
+    def __init__(self, source=None, dead_letter_file=DEAD_LETTER_FILE, max_attempts=MAX_ATTEMPTS):
+        self.source = source or os.path.basename(sys.argv[0])
+        self.dead_letter_file = dead_letter_file
+        self.max_attempts = max_attempts
+        self.retried = 0
+        self.dead = 0
+        self.cancelled = 0
+        self._delayed = []
+        self._sequence = 0
+        # Counters and the dead-letter file are shared by run()'s threads
+        self._lock = threading.Lock()
+
+    def submit(self, description, task, on_give_up=None, item=None):
+        """Run task() after any retries that are due
+
+        on_give_up(error) is called if the task runs out of attempts. Without a
+        dead_letter_file, recording the failure is left to on_give_up. item is
+        the dead letter's description of the work for replay: a dict with a
+        "kind" key, or a function returning one when the task gives up.
+        """
+        items.add("submitted")
+        self.run_due()
+        if deadlines.expired():
+            self._cancel(description, on_give_up)
+            return
+        self._schedule(description, task, on_give_up, item, 1)
+
+    def run(self, description, task, on_give_up=None, item=None):
+        """Run task() and its retries in the calling thread, sleeping through the backoff
+
+        Takes the same arguments as submit(). Safe to call from several
+        threads at once; the retries of submit() are not touched.
+        """
+        items.add("submitted")
+        attempt = 1
+        while not deadlines.expired():
+            delay = self._attempt(description, task, on_give_up, item, attempt)
+            if delay is None:
+                return
+            left = deadlines.remaining()
+            if left is not None and delay > left:
+                break
+            time.sleep(delay)
+            attempt += 1
+        self._cancel(description, on_give_up)
+
+    def run_due(self):
+        """Run the retries whose backoff has elapsed"""
+        while self._delayed and self._delayed[0][0] <= time.monotonic():
+            _, _, attempt, description, task, on_give_up, item = heapq.heappop(self._delayed)
+            self._schedule(description, task, on_give_up, item, attempt)
+
+    def drain(self):
+        """Wait for and run every pending retry"""
+        while self._delayed:
+            wait = self._delayed[0][0] - time.monotonic()
+            left = deadlines.remaining()
+            if left is not None and wait > left:
+                # The deadline comes first, give up on everything pending
+                while self._delayed:
+                    _, _, _, description, _, on_give_up, _ = heapq.heappop(self._delayed)
+                    self._cancel(description, on_give_up)
+                return
+            if wait > 0:
+                print(f"Waiting {wait:.1f}s for {len(self._delayed)} pending retries...")
+                time.sleep(wait)
+            self.run_due()
+
+    def _schedule(self, description, task, on_give_up, item, attempt):
+        delay = self._attempt(description, task, on_give_up, item, attempt)
+        if delay is not None:
+            self._sequence += 1
+            heapq.heappush(self._delayed, (time.monotonic() + delay, self._sequence,
+                                           attempt + 1, description, task, on_give_up, item))
+
+    def _attempt(self, description, task, on_give_up, item, attempt):
+        """Run one attempt; return the backoff before the next one, None when done"""
+        try:
+            with retryable_errors():
+                task()
+        except DeadlineExceeded:
+            self._cancel(description, on_give_up)
+        except RetryableError as e:
+            if attempt >= self.max_attempts:
+                print(f"❌ Giving up on {description} after {attempt} attempts: {str(e)}")
+                with self._lock:
+                    self.dead += 1
+                    if self.dead_letter_file:
+                        self._dead_letter(description, e, attempt, item)
+                items.add("failed")
+                if on_give_up:
+                    on_give_up(e)
+                return None
+            delay = backoff_delay(attempt, e.retry_after)
+            print(f"⏳ {description} failed ({str(e)}), retry {attempt}/{self.max_attempts - 1} in {delay:.1f}s")
+            with self._lock:
+                self.retried += 1
+            return delay
+        else:
+            items.add("succeeded")
+        return None
+
+    def _cancel(self, description, on_give_up):
+        with self._lock:
+            if not self.cancelled:
+                print(f"⏰ Deadline reached, cancelling {description} and the work still pending")
+            self.cancelled += 1
+        items.add("failed")
+        if on_give_up:
+            on_give_up(DeadlineExceeded("deadline passed"))
+
+    def _dead_letter(self, description, error, attempts, item=None):
+        entry = {
+            "time": datetime.now().isoformat(timespec='seconds'),
+            "source": self.source,
+            "task": description,
+            "attempts": attempts,
+            "error": str(error),
+            "request": error.request
+        }
+        if item is not None:
+            entry["item"] = item() if callable(item) else item
+        try:
+            write_dead_letter(self.dead_letter_file, entry)
+        except OSError as e:
+            print(f"Warning: could not write {self.dead_letter_file}: {str(e)}")
+
+    def print_summary(self):
+        if self.retried or self.dead:
+            print(f"Retries: {self.retried}")
+            print(f"Dead-lettered: {self.dead}" + (f" (see {self.dead_letter_file})" if self.dead and self.dead_letter_file else ""))
+        if self.cancelled:
+            print(f"Cancelled at the deadline: {self.cancelled}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.drain()
+
+
+def resend(request, token=None):
+    """Send a request recorded in a dead-letter entry again
+
+    The recorded Authorization header is redacted (or, in older files,
+    stale), so it is replaced with token.
+    """
+    kwargs = {key: request[key] for key in ("headers", "params", "json", "data") if key in request}
+    headers = kwargs.get("headers")
+    if headers and "Authorization" in headers:
+        kwargs["headers"] = dict(headers, Authorization=f"Bearer {token}")
+    files = {}
+    try:
+        for field, (name, path, mime) in request.get("files", {}).items():
+            files[field] = (name, open(path, 'rb'), mime)
+        return get_session().request(request["method"], request["url"], files=files or None, **kwargs)
+    finally:
+        for _, f, _ in files.values():
+            f.close()
@@ -0,0 +1,85 @@
+import sys
+import time
+import argparse
+
+from benchmark_suite import (BENCHMARK_FILE, CASES, DEFAULT_REPEAT, SCALES, environment, previous_results,
+                             run_case)
+from run_history import append_run, read_runs
+
+DEFAULT_THRESHOLD = 0.25
+
+def format_time(seconds):
+    for unit, factor in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if seconds * factor >= 1:
+            return f"{seconds * factor:.2f} {unit}"
+    return f"{seconds * 1e9:.0f} ns"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scripts' helpers at synthetic scales")
+    parser.add_argument('--cases', type=str, default="", help="Comma-separated cases to run (default: all)")
+    parser.add_argument('--scales', type=str, default=",".join(map(str, SCALES)), help=f"Comma-separated scales (default: {','.join(map(str, SCALES))})")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help=f"Samples per case and scale (default: {DEFAULT_REPEAT})")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help=f"Relative slowdown against the previous run that counts as a regression (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument('--file', default=BENCHMARK_FILE, help=f"Results file (default: {BENCHMARK_FILE})")
+    parser.add_argument('--no-save', action='store_true', help="Do not append this run's results to the file")
+    parser.add_argument('--list', action='store_true', help="List the cases and exit")
+    args = parser.parse_args()
+
+    if args.list:
+        for case in CASES:
+            print(case.name + (f" (up to {case.limit} items)" if case.limit else ""))
+        return
+
+    try:
+        scales = sorted({int(scale) for scale in args.scales.split(',') if scale.strip()})
+    except ValueError:
+        print(f"Error: invalid --scales '{args.scales}'")
+        sys.exit(1)
+    selected = {name.strip() for name in args.cases.split(',') if name.strip()}
+    unknown = selected - {case.name for case in CASES}
+    if unknown:
+        print(f"Error: unknown cases {', '.join(sorted(unknown))} (see --list)")
+        sys.exit(1)
+    if args.repeat < 1:
+        print("Error: --repeat must be at least 1")
+        sys.exit(1)
+
+    env = environment()
+    previous = previous_results(read_runs(args.file), env)
+    run = {"run": time.strftime("%Y%m%d_%H%M%S"), "environment": env, "results": []}
+    regressions = []
+
+    print(f"Python {env['python']} on {env['platform']}/{env['machine']}, best of {args.repeat}")
+    for case in CASES:
+        if selected and case.name not in selected:
+            continue
+        print(f"\n=== {case.name} ===")
+        for scale in case.scales(scales):
+            result = run_case(case, scale, args.repeat)
+            run["results"].append(result)
+            line = (f"{scale:>9}  {format_time(result['best']):>10}  {format_time(result['per_item']):>10}/item"
+                    f"  (median {format_time(result['median'])}, {result['number']} calls per sample)")
+            before = previous.get((case.name, scale))
+            if before:
+                change = result["best"] / before["best"] - 1
+                line += f"  {change:+.0%}"
+                if change > args.threshold:
+                    line += "  ❌"
+                    regressions.append((case.name, scale, change))
+            print(line)
+        skipped = [scale for scale in scales if scale not in case.scales(scales)]
+        if skipped:
+            print(f"  Skipped scales above {case.limit}: {', '.join(map(str, skipped))}")
+
+    if not args.no_save and run["results"]:
+        append_run(run, args.file)
+        print(f"\nResults appended to {args.file}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} results slower than the previous run by more than {args.threshold:.0%}:")
+        for name, scale, change in regressions:
+            print(f"  - {name} at {scale}: {change:+.0%}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
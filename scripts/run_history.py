@@ -0,0 +1,135 @@
+import json
+import os
+import statistics
+
+from item_counts import load_counts
+from latency_stats import load_histograms
+
+# Timings of past setup runs, for spotting throughput regressions.
+#
+# setup-paridhi-portal.py appends one record per run and target to
+# RUN_HISTORY_FILE. A record holds the concurrency settings and, for every
+# step, its wall time, exit status, the items it submitted, got done and
+# failed (see item_counts.py) and the requests it sent per endpoint (count,
+# seconds, upload bytes). A step's throughput is the items it got done per
+# second; request counts grow with retries, so they are only used for the
+# per-endpoint latencies. compare-runs.py checks a run against the median of
+# the runs before it.
+
+RUN_HISTORY_FILE = os.path.join("logs", "run_history.jsonl")
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_BASELINE_RUNS = 5
+
+
+def step_record(step_id, script, seconds, ok, stats_file, items_file=None):
+    """Record of one step, with the requests it sent as found in stats_file
+
+    Its items are read from items_file; they are None for steps that hand
+    no work to a RetryQueue.
+    """
+    endpoints = {}
+    for backend_endpoints in load_histograms(stats_file).values():
+        for endpoint, histogram in backend_endpoints.items():
+            entry = endpoints.setdefault(endpoint, {"count": 0, "seconds": 0.0, "bytes": 0})
+            entry["count"] += histogram.count
+            entry["seconds"] += histogram.seconds
+            entry["bytes"] += histogram.bytes
+    return {
+        "step": step_id,
+        "script": script,
+        "seconds": round(seconds, 3),
+        "ok": ok,
+        "items": load_counts(items_file) if items_file else None,
+        "requests": sum(entry["count"] for entry in endpoints.values()),
+        "bytes": sum(entry["bytes"] for entry in endpoints.values()),
+        "endpoints": endpoints
+    }
+
+
+def append_run(record, path=RUN_HISTORY_FILE):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def read_runs(path=RUN_HISTORY_FILE):
+    """Return the recorded runs, oldest first, skipping torn lines"""
+    runs = []
+    if not os.path.exists(path):
+        return runs
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                runs.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return runs
+
+
+def settings_key(run):
+    """Runs are only compared with runs of the same backend, concurrency, sample size and replay speed"""
+    return (run.get("backend"), run.get("shards"), run.get("pipeline"), run.get("workers"), run.get("sample"),
+            run.get("replay_scale"))
+
+
+def step_throughput(step):
+    """Items a step got done per second, None if it submitted none
+
+    Runs recorded before item counts have no throughput.
+    """
+    items = step.get("items")
+    if not items or not items.get("submitted") or not step.get("seconds"):
+        return None
+    return items.get("succeeded", 0) / step["seconds"]
+
+
+def endpoint_latency(step, endpoint):
+    entry = step.get("endpoints", {}).get(endpoint)
+    if not entry or not entry["count"]:
+        return None
+    return entry["seconds"] / entry["count"]
+
+
+def baseline_runs(runs, run, count=DEFAULT_BASELINE_RUNS):
+    """The last `count` comparable runs recorded before run"""
+    earlier = runs[:runs.index(run)] if run in runs else runs
+    comparable = [other for other in earlier
+                  if settings_key(other) == settings_key(run) and not other.get("dry_run")]
+    return comparable[-count:]
+
+
+def compare_run(run, baseline, threshold=DEFAULT_THRESHOLD):
+    """Return regressions of run against the median of baseline
+
+    Each regression is a dict with the step, what was measured ("throughput"
+    or an endpoint's mean latency), the baseline and current values, and the
+    relative change.
+    """
+    regressions = []
+    for step in run.get("steps", []):
+        if not step.get("ok"):
+            continue
+        previous = [other_step for other in baseline for other_step in other.get("steps", [])
+                    if other_step.get("script") == step.get("script") and other_step.get("ok")]
+
+        throughputs = [value for value in map(step_throughput, previous) if value is not None]
+        current = step_throughput(step)
+        expected = statistics.median(throughputs) if throughputs else None
+        if expected and current is not None:
+            change = current / expected - 1
+            if change < -threshold:
+                regressions.append({"step": step["step"], "script": step["script"], "metric": "throughput",
+                                    "baseline": expected, "current": current, "change": change})
+
+        for endpoint in step.get("endpoints", {}):
+            latencies = [value for value in (endpoint_latency(other, endpoint) for other in previous) if value]
+            current = endpoint_latency(step, endpoint)
+            if latencies and current:
+                expected = statistics.median(latencies)
+                change = current / expected - 1
+                if change > threshold:
+                    regressions.append({"step": step["step"], "script": step["script"], "metric": endpoint,
+                                        "baseline": expected, "current": current, "change": change})
+    return regressions
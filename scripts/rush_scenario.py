@@ -0,0 +1,256 @@
+import json
+import math
+import random
+import threading
+import time
+
+import requests
+
+from deadlines import DeadlineExceeded
+from entities import create_profile, register_mrd, register_user
+from user_stream import UserStream
+
+# Opening-day registration rush, played by virtual users.
+#
+# Each virtual user is one student going through the same calls the seeding
+# scripts make: register_user, create_profile, then register_mrd
+# --mrd-count times, pausing for a think time between calls. Users arrive as
+# a Poisson process whose rate climbs linearly from zero to --rate over
+# --ramp-up seconds and then holds until --duration. New arrivals stop
+# there, and users still in flight get DRAIN_SECONDS more to finish (calls
+# cut off at that deadline are counted as cancelled, not as errors). Every
+# call's latency and outcome is counted in the time window it finished in,
+# so the report shows how throughput, errors and tail latency move as the
+# load builds.
+#
+# Arrival times, think times and student details come from seeded generators,
+# so a run can be repeated against another build of the backend. Emails
+# carry the run id, so every run registers fresh students.
+
+OPERATIONS = ("register", "profile", "mrd")
+PERCENTILES = (50, 95, 99)
+DEFAULT_INTERVAL = 10
+DRAIN_SECONDS = 30
+
+# Used when users.json has no values to draw from
+COLLEGES = ("Rush Institute of Technology",)
+YEARS = ("FIRST", "SECOND", "THIRD", "FOURTH")
+DEPARTMENTS = ("CSE", "ECE", "EE", "ME", "CE", "IT")
+
+
+def arrival_times(rate, ramp_up, duration, seed=0):
+    """Seconds after the start at which users arrive, in order
+
+    The rate climbs linearly to `rate` users per second over ramp_up seconds.
+    Arrivals at the full rate are thinned while the rate is still climbing.
+    """
+    rng = random.Random(seed)
+    times = []
+    now = 0.0
+    while True:
+        now += rng.expovariate(rate)
+        if now >= duration:
+            return times
+        if ramp_up <= 0 or now >= ramp_up or rng.random() < now / ramp_up:
+            times.append(now)
+
+
+def student_pools(users_file):
+    """(colleges, years, departments) seen in users.json, to draw students from"""
+    colleges, years, departments = set(), set(), set()
+    try:
+        with UserStream(users_file) as users:
+            for user in users:
+                colleges.add(user.get('college'))
+                years.add(user.get('year'))
+                departments.add(user.get('department'))
+    except (OSError, ValueError):
+        pass
+    return tuple(sorted(filter(None, colleges)) or COLLEGES), tuple(sorted(filter(None, years)) or YEARS), \
+        tuple(sorted(filter(None, departments)) or DEPARTMENTS)
+
+
+def make_student(run_id, number, pools, rng):
+    colleges, years, departments = pools
+    return {
+        "name": f"Rush Student {number}",
+        "email": f"rush-{run_id}-{number}@example.com",
+        "password": f"Rush-{run_id}-{number}",
+        "contact": f"9{rng.randrange(10 ** 9):09d}",
+        "college": rng.choice(colleges),
+        "year": rng.choice(years),
+        "department": rng.choice(departments),
+        "rollNo": f"RUSH{number:06d}"
+    }
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+
+class Window:
+    """Calls that finished within one reporting interval"""
+
+    __slots__ = ("arrived", "finished", "calls", "errors", "latencies")
+
+    def __init__(self):
+        self.arrived = 0
+        self.finished = 0
+        self.calls = dict.fromkeys(OPERATIONS, 0)
+        self.errors = dict.fromkeys(OPERATIONS, 0)
+        self.latencies = {operation: [] for operation in OPERATIONS}
+
+
+class RushStats:
+    """Latency and outcome of every call, bucketed by finishing time"""
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.in_flight = 0
+        self.cancelled = 0
+        self.late_starts = 0
+        self.max_start_lag = 0.0
+        self._lock = threading.Lock()
+        self._windows = {}
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def _window(self, at):
+        index = int(at // self.interval)
+        window = self._windows.get(index)
+        if window is None:
+            window = self._windows[index] = Window()
+        return window
+
+    def user_started(self, lag):
+        with self._lock:
+            self._window(self.elapsed()).arrived += 1
+            self.in_flight += 1
+            if lag > 1:
+                self.late_starts += 1
+            self.max_start_lag = max(self.max_start_lag, lag)
+
+    def user_finished(self, cancelled=False):
+        with self._lock:
+            self._window(self.elapsed()).finished += 1
+            self.in_flight -= 1
+            self.cancelled += cancelled
+
+    def record(self, operation, seconds, ok):
+        with self._lock:
+            window = self._window(self.elapsed())
+            window.calls[operation] += 1
+            if ok:
+                window.latencies[operation].append(seconds)
+            else:
+                window.errors[operation] += 1
+
+    def closed_windows(self):
+        """Indexes of the windows that can no longer change, in order"""
+        current = int(self.elapsed() // self.interval)
+        with self._lock:
+            return sorted(index for index in self._windows if index < current)
+
+    def window_summary(self, index):
+        """JSON-ready totals of one window"""
+        with self._lock:
+            window = self._windows.get(index) or Window()
+            latencies = sorted(value for values in window.latencies.values() for value in values)
+            calls = sum(window.calls.values())
+            errors = sum(window.errors.values())
+            summary = {
+                "start": index * self.interval,
+                "arrived": window.arrived,
+                "finished": window.finished,
+                "calls": calls,
+                "errors": errors,
+                "throughput": round(calls / self.interval, 2),
+                "byOperation": {operation: window.calls[operation] for operation in OPERATIONS}
+            }
+        for pct in PERCENTILES:
+            summary[f"p{pct}"] = percentile(latencies, pct)
+        return summary
+
+    def operation_totals(self):
+        """JSON-ready totals per operation over the whole run"""
+        with self._lock:
+            windows = list(self._windows.values())
+        totals = {}
+        for operation in OPERATIONS:
+            latencies = sorted(value for window in windows for value in window.latencies[operation])
+            calls = sum(window.calls[operation] for window in windows)
+            errors = sum(window.errors[operation] for window in windows)
+            totals[operation] = {"calls": calls, "errors": errors,
+                                 "errorRate": round(errors / calls, 4) if calls else 0.0}
+            for pct in PERCENTILES:
+                totals[operation][f"p{pct}"] = percentile(latencies, pct)
+        return totals
+
+    def window_indexes(self):
+        with self._lock:
+            return sorted(self._windows)
+
+
+def _timed(stats, operation, call, ok):
+    start = time.perf_counter()
+    try:
+        result = call()
+    except DeadlineExceeded:
+        raise
+    except requests.RequestException as e:
+        print(f"❌ {operation} failed: {str(e)}")
+        stats.record(operation, time.perf_counter() - start, False)
+        return None
+    succeeded = ok(result)
+    stats.record(operation, time.perf_counter() - start, succeeded)
+    return result if succeeded else None
+
+
+def run_student(student, stats, think_time, mrd_count, rng):
+    """One virtual user: register, create a profile, then register for MRD"""
+    def think():
+        if think_time > 0:
+            time.sleep(rng.uniform(0.5, 1.5) * think_time)
+
+    cancelled = False
+    try:
+        # A fresh student who gets 409 back counts as an error
+        token = _timed(stats, "register", lambda: register_user(student),
+                       lambda token: bool(token) and token != "existing")
+        if not token:
+            return
+        think()
+        profile = {key: student[key] for key in ("email", "contact", "college", "year", "department", "rollNo")}
+        if not _timed(stats, "profile", lambda: create_profile(token, profile), bool):
+            return
+        for _ in range(mrd_count):
+            think()
+            _timed(stats, "mrd", lambda: register_mrd(student["email"]), lambda result: result[0] is not None)
+    except DeadlineExceeded:
+        cancelled = True
+    finally:
+        stats.user_finished(cancelled)
+
+
+def run_summary(stats, settings, windows):
+    """The run's record for the load test history"""
+    return {
+        "run": settings["run"],
+        "settings": settings,
+        "seconds": round(stats.elapsed(), 3),
+        "cancelled": stats.cancelled,
+        "lateStarts": stats.late_starts,
+        "maxStartLag": round(stats.max_start_lag, 3),
+        "windows": windows,
+        "operations": stats.operation_totals()
+    }
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
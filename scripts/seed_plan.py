@@ -0,0 +1,305 @@
+import csv
+import json
+import os
+import time
+
+from api_session import BASE_URL
+from entities import COMBO_SPECS, combo_members, find_domain_poster, find_event_poster, group_by_domain
+from file_watch import IMAGE_EXTENSIONS
+from image_dedup import DEFAULT_THRESHOLD, HashCache, Image, filter_near_duplicates
+from latency_stats import LATENCY_FILE, endpoint_key, load_histograms
+from records import load_gid_registry, registrations_due
+from seed_schemas import parse_team_year
+from token_manager import Account
+from user_stream import UserStream
+
+# Offline planning for setup-paridhi-portal.py --plan.
+#
+# Every step's requests are counted from the input files the way the step
+# would send them: one registration, login or profile call per user,
+# --mrd-count MRD registrations per user (with --top-up, only the ones that
+# bring a user up to that many GIDs in the registry), one create call per event, combo and team member, and one upload per
+# poster or gallery image with its file size.
+# Admin scripts also check (or renew) every admin token first.
+#
+# Times come from the latency histograms earlier runs left behind (see
+# latency_stats.py). Uploads are costed by size at the throughput seen for
+# their endpoint. Endpoints that were never measured get DEFAULT_LATENCY. A
+# step's requests are spread over its concurrency: --shards for the user
+# steps, the pipeline's workers for --pipeline, the team import's workers,
+# one at a time otherwise.
+
+DEFAULT_LATENCY = 0.1
+TEAM_WORKERS = 8  # create-megatronix-team.py --workers default
+
+
+class StepPlan:
+    """Requests one step will send, by endpoint"""
+
+    def __init__(self, step_id, script, description, concurrency=1):
+        self.step_id = step_id
+        self.script = script
+        self.description = description
+        self.concurrency = max(1, concurrency)
+        self.requests = {}
+        self.notes = []
+
+    def add(self, method, path, count=1, nbytes=0):
+        if count <= 0:
+            return
+        _, endpoint = endpoint_key(method, f"{BASE_URL}{path}")
+        entry = self.requests.setdefault(endpoint, [0, 0])
+        entry[0] += count
+        entry[1] += nbytes
+
+    @property
+    def total_requests(self):
+        return sum(count for count, _ in self.requests.values())
+
+    @property
+    def total_bytes(self):
+        return sum(nbytes for _, nbytes in self.requests.values())
+
+
+class SeedInputs:
+    """The input files, read once for every step's plan"""
+
+    def __init__(self, admins_file, users_file, events_file, csv_file, posters_dir, mrd_file=None):
+        self.users_file = users_file
+        self.mrd_file = mrd_file or os.path.join(os.path.dirname(users_file), "mrd_data.json")
+        self.posters_dir = posters_dir
+        self.admins = self._admins(admins_file)
+        self.users, self.users_with_token = self._users(users_file)
+        self.events = self._events(events_file)
+        self.team = self._team(csv_file)
+
+    @staticmethod
+    def _admins(path):
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return [data.get('superadmin', {})] + list(data.get('admins', []))
+
+    @staticmethod
+    def _users(path):
+        users = with_token = 0
+        try:
+            with UserStream(path) as stream:
+                for user in stream:
+                    users += 1
+                    with_token += bool(user.get('jwt'))
+        except (OSError, ValueError):
+            pass
+        return users, with_token
+
+    @staticmethod
+    def _events(path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f).get('events', [])
+        except (OSError, ValueError, AttributeError):
+            return []
+
+    @staticmethod
+    def _team(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                # Rows with an unrecognised year are skipped by the import
+                return sum(1 for row in csv.DictReader(f)
+                           if (row.get('Name') or "").strip() and parse_team_year(row.get('Year')) is not None)
+        except OSError:
+            return 0
+
+    def logins_due(self):
+        """Admin accounts whose token is missing or due for renewal"""
+        due = 0
+        for admin in self.admins:
+            account = Account(admin.get('email'), admin.get('password'))
+            account.set_token(admin.get('jwt') or "")
+            if not admin.get('jwt') or (account.refresh_at is not None and account.refresh_at <= time.time()):
+                due += 1
+        return due
+
+    def mrd_due(self, mrd_count, top_up=False):
+        """MRD registrations mrd-registration.py would make for mrd_count per user"""
+        if not top_up:
+            return self.users * mrd_count
+        try:
+            registry = load_gid_registry(self.mrd_file)
+            with UserStream(self.users_file) as users:
+                return sum(registrations_due(registry, user, mrd_count, top_up)[1] for user in users)
+        except (OSError, ValueError):
+            return self.users * mrd_count
+
+    def combos(self):
+        """(spec, member events) of every combo the events allow"""
+        events_by_domain = group_by_domain(self.events)
+        return [(spec, members) for spec in COMBO_SPECS
+                for members in [combo_members(spec, events_by_domain)] if members]
+
+    def event_posters(self):
+        """Poster path of every event that has one"""
+        if not os.path.isdir(self.posters_dir):
+            return []
+        posters = []
+        for event in self.events:
+            poster, _ = find_event_poster(self.posters_dir, event.get('domain', ''), event.get('name', ''))
+            if poster:
+                posters.append(poster)
+        return posters
+
+    def combo_posters(self):
+        if not os.path.isdir(self.posters_dir):
+            return []
+        posters = [find_domain_poster(self.posters_dir, spec['domain']) for spec, _ in self.combos()]
+        return [poster for poster in posters if poster]
+
+    def gallery_images(self, dedupe_threshold=DEFAULT_THRESHOLD):
+        """Gallery images after near-duplicate filtering; (paths, exact)
+
+        Filtering needs every image's hash. When some are not cached yet all
+        images are counted, as an upper bound.
+        """
+        paths = [os.path.join(root, name)
+                 for root, _, files in os.walk(self.posters_dir)
+                 for name in files if name.lower().endswith(IMAGE_EXTENSIONS)]
+        if Image is None or dedupe_threshold is None:
+            return paths, Image is None and dedupe_threshold is not None
+        cache = HashCache()
+        if any(cache.get(path) is None for path in paths):
+            return paths, False
+        keep, _ = filter_near_duplicates(paths, dedupe_threshold, cache=cache)
+        return keep, True
+
+
+def _file_bytes(paths):
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def plan_steps(steps, inputs, mrd_count=10, shards=1, pipeline_workers=None, top_up=False):
+    """Return a StepPlan for each (step id, script name, description) in steps
+
+    pipeline_workers is set when steps 4-7 run as event-pipeline.py, and
+    top_up when mrd-registration.py runs with --top-up.
+    """
+    admin_checks = len([admin for admin in inputs.admins if admin.get('email')])
+    logins = inputs.logins_due()
+    combos = inputs.combos()
+    plans = []
+
+    for step_id, script, description in steps:
+        plan = StepPlan(step_id, script, description)
+        if script not in ("register-admins.py", "users-data-import.py", "mrd-registration.py"):
+            # Admin scripts renew due tokens and then check every token once
+            plan.add("POST", "/api/auth/login", logins)
+            plan.add("GET", "/api/auth/check-token", admin_checks)
+
+        if script == "register-admins.py":
+            plan.add("GET", "/api/auth/verify")
+            plan.add("POST", "/api/admin", max(0, len(inputs.admins) - 1))
+            plan.notes.append("admins that already exist log in once more")
+        elif script == "users-data-import.py":
+            plan.concurrency = shards
+            plan.add("POST", "/api/auth/register", inputs.users)
+            plan.add("POST", "/api/auth/login", inputs.users_with_token)
+            plan.add("POST", "/api/profiles", inputs.users - inputs.users_with_token)
+            plan.notes.append(f"{inputs.users_with_token} users with a token counted as existing")
+        elif script == "mrd-registration.py":
+            plan.concurrency = shards
+            due = inputs.mrd_due(mrd_count, top_up)
+            plan.add("POST", "/api/mrd/register", due)
+            if due < inputs.users * mrd_count:
+                plan.notes.append(f"{inputs.users * mrd_count - due} registrations already in the GID registry")
+        elif script == "create-events.py":
+            plan.add("POST", "/api/events", len(inputs.events))
+        elif script == "upload-event-posters.py":
+            posters = inputs.event_posters()
+            plan.add("GET", "/api/events")
+            plan.add("PUT", "/api/events/1/upload", len(posters), _file_bytes(posters))
+        elif script == "create-combos.py":
+            plan.add("GET", "/api/events")
+            plan.add("POST", "/api/combos", len(combos))
+        elif script == "upload-combo-posters.py":
+            posters = inputs.combo_posters()
+            plan.add("GET", "/api/combos")
+            plan.add("PUT", "/api/combos/1/upload", len(posters), _file_bytes(posters))
+        elif script == "event-pipeline.py":
+            plan.concurrency = pipeline_workers or 1
+            event_posters = inputs.event_posters()
+            combo_posters = inputs.combo_posters()
+            plan.add("POST", "/api/events", len(inputs.events))
+            plan.add("PUT", "/api/events/1/upload", len(event_posters), _file_bytes(event_posters))
+            plan.add("POST", "/api/combos", len(combos))
+            plan.add("PUT", "/api/combos/1/upload", len(combo_posters), _file_bytes(combo_posters))
+        elif script == "upload-gallery-images.py":
+            images, exact = inputs.gallery_images()
+            plan.add("POST", "/api/galleries", len(images), _file_bytes(images))
+            if not exact:
+                plan.notes.append("near-duplicates not filtered yet, image count is an upper bound")
+        elif script == "create-megatronix-team.py":
+            plan.concurrency = TEAM_WORKERS
+            plan.add("POST", "/api/megatronix-team", inputs.team)
+        plans.append(plan)
+    return plans
+
+
+def estimate_seconds(plan, histograms):
+    """Return (mean, p90, unmeasured endpoints) wall-clock estimates for a step"""
+    mean_total = p90_total = 0.0
+    unmeasured = []
+    for endpoint, (count, nbytes) in plan.requests.items():
+        histogram = histograms.get(endpoint)
+        if histogram is None or not histogram.count:
+            unmeasured.append(endpoint)
+            mean_total += count * DEFAULT_LATENCY
+            p90_total += count * DEFAULT_LATENCY
+            continue
+        mean = histogram.mean()
+        per_byte = histogram.seconds_per_byte()
+        seconds = nbytes * per_byte if nbytes and per_byte else count * mean
+        mean_total += seconds
+        p90_total += seconds * histogram.quantile(0.9) / mean if mean else seconds
+    return mean_total / plan.concurrency, p90_total / plan.concurrency, unmeasured
+
+
+def format_bytes(nbytes):
+    for unit in ("B", "KB", "MB"):
+        if nbytes < 1024:
+            return f"{nbytes:.0f} {unit}" if unit == "B" else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+    return f"{nbytes:.1f} GB"
+
+
+def format_seconds(seconds):
+    if seconds < 120:
+        return f"{seconds:.1f}s"
+    return f"{int(seconds // 60)}m {int(seconds % 60):02d}s"
+
+
+def print_plan(plans, backend=BASE_URL, latency_file=LATENCY_FILE):
+    """Print the requests and estimated time of every step; return the (mean, p90) total"""
+    histograms = load_histograms(latency_file).get(backend, {})
+    print(f"Plan for {backend} "
+          + (f"(latency history: {sum(h.count for h in histograms.values()):.0f} requests)" if histograms
+             else "(no latency history yet, assuming {:.0f} ms per request)".format(DEFAULT_LATENCY * 1000)))
+    total_mean = total_p90 = 0.0
+    total_requests = total_bytes = 0
+    for plan in plans:
+        mean, p90, unmeasured = estimate_seconds(plan, histograms)
+        total_mean += mean
+        total_p90 += p90
+        total_requests += plan.total_requests
+        total_bytes += plan.total_bytes
+        print(f"\nStep {plan.step_id}: {plan.description} ({plan.script})")
+        print(f"  {plan.total_requests} requests, {format_bytes(plan.total_bytes)} uploaded, "
+              f"concurrency {plan.concurrency}: ~{format_seconds(mean)} (p90 {format_seconds(p90)})")
+        for endpoint, (count, nbytes) in plan.requests.items():
+            print(f"    {count:>7}  {endpoint}" + (f"  {format_bytes(nbytes)}" if nbytes else "")
+                  + ("  (not measured yet)" if endpoint in unmeasured else ""))
+        for note in plan.notes:
+            print(f"  Note: {note}")
+    print(f"\nTotal: {total_requests} requests, {format_bytes(total_bytes)} uploaded, "
+          f"~{format_seconds(total_mean)} (p90 {format_seconds(total_p90)})")
+    return total_mean, total_p90
@@ -0,0 +1,133 @@
+import csv
+import json
+import os
+import shutil
+
+from entities import COMBO_SPECS, combo_members, find_domain_poster, find_event_poster, group_by_domain
+from seed_schemas import TEAM_COLUMNS, parse_team_year
+from user_stream import JsonArrayWriter, UserStream
+
+# Stratified samples of the seed inputs for setup-paridhi-portal.py --sample.
+#
+# A smoke run should reach every endpoint and code path in seconds, so the
+# sample keeps a few records of every kind instead of a random slice:
+# --sample K users per (college, year), K events per domain plus every event
+# a combo bundles (so every combo still resolves), K team members per year
+# (an unrecognised year is a group too, so the skip path still runs), and the
+# posters those events and domains use. Records are taken in file order, so
+# the same K always gives the same sample.
+#
+# The sample is written to a workspace laid out like the scripts directory.
+# Every step runs inside it, so they all see the same subset, and the tokens,
+# GIDs and journals they write stay out of the real inputs.
+
+SAMPLE_DIR = "sample"
+
+# Inputs the sample rewrites; every other file in json/ is copied as-is,
+# except the GID registry, which starts out empty like the sampled users
+USERS_FILE = os.path.join("json", "users.json")
+EVENTS_FILE = os.path.join("json", "events.json")
+MRD_FILE = os.path.join("json", "mrd_data.json")
+TEAM_CSV = os.path.join("team-members", "Contact Information.csv")
+POSTERS_DIR = "event-posters"
+
+
+def stratified(items, key, per_group):
+    """Yield the first per_group items of every key(item) group, in order"""
+    taken = {}
+    for item in items:
+        group = key(item)
+        if taken.get(group, 0) < per_group:
+            taken[group] = taken.get(group, 0) + 1
+            yield item
+
+
+def sample_events(events, per_domain):
+    """The first per_domain events of every domain and the events of every combo, in file order"""
+    keep = {id(event) for event in stratified(events, lambda event: event.get('domain'), per_domain)}
+    events_by_domain = group_by_domain(events)
+    for spec in COMBO_SPECS:
+        keep.update(id(event) for event in combo_members(spec, events_by_domain) or ())
+    return [event for event in events if id(event) in keep]
+
+
+def sample_posters(posters_dir, events):
+    """Poster paths the sampled events, their domains and combos use"""
+    if not os.path.isdir(posters_dir):
+        return []
+    posters = set()
+    for event in events:
+        poster, _ = find_event_poster(posters_dir, event.get('domain', ''), event.get('name', ''))
+        if poster:
+            posters.add(poster)
+    for domain in {event.get('domain') for event in events} | {spec['domain'] for spec in COMBO_SPECS}:
+        poster = find_domain_poster(posters_dir, domain) if domain else None
+        if poster:
+            posters.add(poster)
+    return sorted(posters)
+
+
+def _reset_dir(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+
+def write_sample(sample_dir, per_group, source_dir="."):
+    """Write a sample of the inputs in source_dir to sample_dir; return {input: (kept, total)}
+
+    json/, team-members/ and event-posters/ are rebuilt on every call, while
+    .cache/ is kept so listings and image hashes carry over between runs.
+    """
+    counts = {}
+    for name in ("json", "team-members", POSTERS_DIR):
+        _reset_dir(os.path.join(sample_dir, name))
+    os.makedirs(os.path.join(sample_dir, ".cache"), exist_ok=True)
+
+    source_json = os.path.join(source_dir, "json")
+    for name in os.listdir(source_json):
+        if name.endswith(".json") and os.path.join("json", name) not in (USERS_FILE, EVENTS_FILE, MRD_FILE):
+            shutil.copyfile(os.path.join(source_json, name), os.path.join(sample_dir, "json", name))
+
+    # Users are streamed, users.json may be far larger than the sample
+    total = 0
+
+    def counted(users):
+        nonlocal total
+        for user in users:
+            total += 1
+            yield user
+
+    with UserStream(os.path.join(source_dir, USERS_FILE)) as users, \
+            JsonArrayWriter(os.path.join(sample_dir, USERS_FILE), key="users") as writer:
+        for user in stratified(counted(users), lambda user: (user.get('college'), user.get('year')), per_group):
+            writer.write(user)
+    counts["users"] = (writer.count, total)
+
+    with open(os.path.join(source_dir, EVENTS_FILE), 'r', encoding='utf-8') as f:
+        events = json.load(f).get('events', [])
+    sampled = sample_events(events, per_group)
+    with open(os.path.join(sample_dir, EVENTS_FILE), 'w', encoding='utf-8') as f:
+        json.dump({"events": sampled}, f, indent=2)
+    counts["events"] = (len(sampled), len(events))
+
+    source_posters = os.path.join(source_dir, POSTERS_DIR)
+    posters = sample_posters(source_posters, sampled)
+    for poster in posters:
+        shutil.copy2(poster, os.path.join(sample_dir, POSTERS_DIR, os.path.basename(poster)))
+    total_posters = len(os.listdir(source_posters)) if os.path.isdir(source_posters) else 0
+    counts["posters"] = (len(posters), total_posters)
+
+    source_csv = os.path.join(source_dir, TEAM_CSV)
+    if os.path.exists(source_csv):
+        with open(source_csv, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+            fieldnames = reader.fieldnames or list(TEAM_COLUMNS)
+        sampled_rows = list(stratified(rows, lambda row: parse_team_year(row.get('Year')), per_group))
+        with open(os.path.join(sample_dir, TEAM_CSV), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
+            writer.writeheader()
+            writer.writerows(sampled_rows)
+        counts["team members"] = (len(sampled_rows), len(rows))
+    return counts
@@ -0,0 +1,315 @@
+import csv
+import json
+import os
+import re
+from datetime import datetime
+
+from posters import PosterIndex
+from user_stream import UserStream
+
+# Offline validation of the seed inputs.
+#
+# Each schema is a declarative field table that is compiled once into a list
+# of (field, check) pairs, so validating a record is a handful of dict lookups
+# and precompiled regex matches. Validators collect every problem instead of
+# stopping at the first one, and never touch the network.
+
+YEARS = ("FIRST", "SECOND", "THIRD", "FOURTH")
+DOMAINS = ("CODING", "ROBOTICS", "GAMING", "CIVIL", "ELECTRICAL", "GENERAL")
+EVENT_TYPES = ("MAIN", "ON_SPOT")
+
+EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+CONTACT_RE = re.compile(r'^\+?[0-9]{10,13}$')
+EVENT_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+# "4th Year", "fourth  YEAR", ... after lower-casing and collapsing whitespace
+TEAM_YEARS = {f"{word} year": year
+              for year, words in zip(YEARS, (("1st", "first"), ("2nd", "second"), ("3rd", "third"), ("4th", "fourth")))
+              for word in words}
+
+
+class Field:
+    """Declarative description of one field in a seed record"""
+
+    def __init__(self, kind=str, required=True, choices=None, pattern=None,
+                 date_format=None, minimum=None, items=None):
+        self.kind = kind
+        self.required = required
+        self.choices = choices
+        self.pattern = pattern
+        self.date_format = date_format
+        self.minimum = minimum
+        self.items = items
+
+
+def _compile_field(name, field):
+    """Turn a Field into a function returning an error message or None
+
+    Only the constraints a field actually declares end up in its check list.
+    """
+    kinds = (int, float) if field.kind is float else field.kind
+    type_error = f"{name} must be of type {field.kind.__name__}"
+    steps = []
+
+    if field.kind is str and field.required:
+        steps.append(lambda value: None if value.strip() else f"{name} must not be empty")
+    if field.choices:
+        choices = frozenset(field.choices)
+        choice_text = ", ".join(field.choices)
+        steps.append(lambda value: None if value in choices else f"{name} '{value}' is not one of {choice_text}")
+    if field.pattern is not None:
+        match = field.pattern.match
+        steps.append(lambda value: None if match(value) else f"{name} '{value}' is not valid")
+    if field.date_format is not None:
+        def check_date(value):
+            try:
+                datetime.strptime(value, field.date_format)
+            except ValueError:
+                return f"{name} '{value}' does not match {field.date_format}"
+            return None
+        steps.append(check_date)
+    if field.minimum is not None:
+        minimum = field.minimum
+        steps.append(lambda value: None if value >= minimum else f"{name} must be at least {minimum}")
+    if field.items is not None:
+        items = field.items
+        steps.append(lambda value: None if all(isinstance(item, items) for item in value)
+                     else f"{name} must only contain {items.__name__} values")
+
+    def check(value):
+        if value.__class__ is bool or not isinstance(value, kinds):
+            return type_error
+        for step in steps:
+            message = step(value)
+            if message:
+                return message
+        return None
+
+    return check
+
+
+class Schema:
+    """A compiled set of field checks for one kind of record"""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = tuple(fields)
+        self.required = tuple(key for key, field in fields.items() if field.required)
+        self.checks = tuple((key, _compile_field(key, field)) for key, field in fields.items())
+
+    def validate(self, record, where, errors):
+        if not isinstance(record, dict):
+            errors.append(f"{where}: expected an object")
+            return
+        for key in self.required:
+            if record.get(key) is None:
+                errors.append(f"{where}: missing required field '{key}'")
+        for key, check in self.checks:
+            value = record.get(key)
+            if value is not None:
+                message = check(value)
+                if message:
+                    errors.append(f"{where}: {message}")
+
+
+ADMIN_SCHEMA = Schema("admin", {
+    "name": Field(str),
+    "email": Field(str, pattern=EMAIL_RE),
+    "password": Field(str),
+    "role": Field(str, required=False),
+    "department": Field(str, required=False),
+    "jwt": Field(str, required=False),
+})
+
+USER_SCHEMA = Schema("user", {
+    "name": Field(str),
+    "email": Field(str, pattern=EMAIL_RE),
+    "password": Field(str),
+    "contact": Field(str, pattern=CONTACT_RE),
+    "college": Field(str),
+    "year": Field(str, choices=YEARS),
+    "department": Field(str),
+    "rollNo": Field(str),
+    "jwt": Field(str, required=False),
+    "gids": Field(list, required=False, items=str),
+})
+
+EVENT_SCHEMA = Schema("event", {
+    "domain": Field(str, choices=DOMAINS),
+    "name": Field(str),
+    "eventType": Field(str, choices=EVENT_TYPES),
+    "eventDate": Field(str, date_format=EVENT_DATE_FORMAT),
+    "description": Field(str),
+    "venue": Field(str),
+    "coordinatorDetails": Field(list, items=str),
+    "ruleBook": Field(str, required=False),
+    "minPlayers": Field(int, minimum=1),
+    "maxPlayers": Field(int, minimum=1),
+    "registrationFee": Field(float, minimum=0),
+    "prizePool": Field(float, required=False, minimum=0),
+    # Local only, for the schedule check in event_schedule.py
+    "durationMinutes": Field(int, required=False, minimum=1),
+})
+
+TEAM_COLUMNS = ("Name", "Email", "Year", "LinkedIn Profile Link", "Facebook Profile Link",
+                "Instagram Profile Link", "GitHub Account Link", "Profile Picture")
+
+
+class Report:
+    """Errors and warnings collected across all inputs"""
+
+    def __init__(self):
+        self.errors = []
+        self.warnings = []
+        self.counts = {}
+
+    @property
+    def ok(self):
+        return not self.errors
+
+
+def _check_duplicate(seen, key, where, what, errors):
+    if not key:
+        return
+    first = seen.get(key)
+    if first is not None:
+        errors.append(f"{where}: duplicate {what} '{key}' (first seen at {first})")
+    else:
+        seen[key] = where
+
+
+def validate_admins(path, report):
+    """Validate admins.json: superadmin, admins and unique emails"""
+    name = os.path.basename(path)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        report.errors.append(f"{name}: cannot be read ({str(e)})")
+        return
+
+    if not isinstance(data, dict) or 'superadmin' not in data or 'admins' not in data:
+        report.errors.append(f"{name}: must contain 'superadmin' and 'admins' sections")
+        return
+
+    seen = {}
+    ADMIN_SCHEMA.validate(data['superadmin'], f"{name}: superadmin", report.errors)
+    if isinstance(data['superadmin'], dict):
+        _check_duplicate(seen, str(data['superadmin'].get('email', '')).lower(),
+                         "superadmin", "email", report.errors)
+
+    admins = data['admins']
+    if not isinstance(admins, list):
+        report.errors.append(f"{name}: 'admins' must be a list")
+        return
+    for index, admin in enumerate(admins):
+        where = f"{name}: admins[{index}]"
+        ADMIN_SCHEMA.validate(admin, where, report.errors)
+        if isinstance(admin, dict):
+            _check_duplicate(seen, str(admin.get('email', '')).lower(), where, "email", report.errors)
+    report.counts['admins'] = len(admins) + 1
+
+
+def validate_users(path, report):
+    """Validate users.json record by record without loading it whole"""
+    name = os.path.basename(path)
+    seen = {}
+    count = 0
+    try:
+        with UserStream(path) as users:
+            for index, user in enumerate(users):
+                where = f"{name}: users[{index}]"
+                USER_SCHEMA.validate(user, where, report.errors)
+                if isinstance(user, dict):
+                    _check_duplicate(seen, str(user.get('email', '')).lower(), where, "email", report.errors)
+                count += 1
+    except (OSError, ValueError) as e:
+        report.errors.append(f"{name}: cannot be read ({str(e)})")
+    report.counts['users'] = count
+
+
+def validate_events(path, report, posters_dir=None):
+    """Validate events.json, unique names and poster coverage"""
+    name = os.path.basename(path)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        report.errors.append(f"{name}: cannot be read ({str(e)})")
+        return
+
+    events = data.get('events') if isinstance(data, dict) else None
+    if not isinstance(events, list):
+        report.errors.append(f"{name}: must contain an 'events' list")
+        return
+
+    # Posters are matched with the uploader's own rules
+    index = None
+    if posters_dir:
+        try:
+            index = PosterIndex(posters_dir)
+        except OSError:
+            pass
+    if posters_dir and index is None:
+        report.warnings.append(f"Posters directory {posters_dir} not found, skipping poster coverage")
+
+    seen = {}
+    domains = set()
+    for position, event in enumerate(events):
+        where = f"{name}: events[{position}]"
+        EVENT_SCHEMA.validate(event, where, report.errors)
+        if not isinstance(event, dict):
+            continue
+        event_name = event.get('name')
+        _check_duplicate(seen, event_name.strip().lower() if isinstance(event_name, str) else None,
+                         where, "event name", report.errors)
+        min_players, max_players = event.get('minPlayers'), event.get('maxPlayers')
+        if isinstance(min_players, int) and isinstance(max_players, int) and max_players < min_players:
+            report.errors.append(f"{where}: maxPlayers is less than minPlayers")
+
+        domain = event.get('domain')
+        if isinstance(domain, str):
+            domains.add(domain)
+        if index is not None and isinstance(domain, str) and isinstance(event_name, str):
+            if index.event_poster(domain, event_name)[0] is None:
+                report.warnings.append(f"{where}: no poster for '{domain} - {event_name}' "
+                                       f"(expected {domain}_{event_name.replace(' ', '')}.jpeg or {domain}.jpeg)")
+
+    if index is not None:
+        for domain in sorted(domains):
+            if index.domain_poster(domain) is None:
+                report.warnings.append(f"No domain poster for {domain}, combo posters in this domain will be skipped")
+    report.counts['events'] = len(events)
+
+
+def parse_team_year(value):
+    """Parse '4th Year', 'fourth year', ... into FOURTH, None if unrecognised"""
+    return TEAM_YEARS.get(" ".join(value.lower().split())) if value else None
+
+
+def validate_team_csv(path, report):
+    """Validate the Megatronix team CSV export"""
+    name = os.path.basename(path)
+    seen = {}
+    count = 0
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            missing = [column for column in TEAM_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                report.errors.append(f"{name}: missing columns {', '.join(missing)}")
+                return
+            for line, row in enumerate(reader, 2):
+                where = f"{name}: line {line}"
+                count += 1
+                member_name = (row['Name'] or "").strip()
+                email = (row['Email'] or "").strip()
+                if not member_name:
+                    report.errors.append(f"{where}: missing Name")
+                if not EMAIL_RE.match(email):
+                    report.errors.append(f"{where}: Email '{email}' is not valid")
+                if parse_team_year(row['Year']) is None:
+                    report.errors.append(f"{where}: Year '{row['Year']}' is not recognised")
+                _check_duplicate(seen, email.lower(), where, "email", report.errors)
+    except (OSError, csv.Error, UnicodeDecodeError) as e:
+        report.errors.append(f"{name}: cannot be read ({str(e)})")
+    report.counts['team members'] = count
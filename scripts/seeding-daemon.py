@@ -0,0 +1,286 @@
+import json
+import os
+import sys
+import time
+import argparse
+import importlib.util
+import socketserver
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import daemon_client
+import deadlines
+from api_session import BASE_URL
+from daemon_client import DAEMON_SCRIPTS, SOCKET_PATH, local_option, read_messages, send_message
+from item_counts import counter
+from latency_stats import recorder, save_histograms
+from listing_cache import expire_all, get_all_combos, get_all_events
+from token_manager import get_token_manager, is_token_valid, track_admins
+from tracing import tracer
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Long-running local process for ad-hoc admin tasks during the fest.
+#
+# The daemon keeps what every script would otherwise rebuild on startup: the
+# HTTP connection pool, admin tokens that have already been checked (and are
+# refreshed ahead of expiry), and the event and combo listings. Scripts in
+# DAEMON_SCRIPTS hand their command line to it over a Unix socket and stream
+# the output back (see daemon_client.py).
+#
+# Jobs run one at a time on a single worker thread, so they share that
+# thread's pooled session. Each job gets a fresh copy of its script module
+# with sys.argv and the working directory set for it, and the output of the
+# job's threads goes to the client. The daemon's own threads, such as the
+# token refresh, keep printing to the daemon's terminal and use absolute
+# paths. Cached listings are revalidated once per job with a conditional GET.
+# Runs with --watch or --shards are turned away and run by themselves.
+
+
+class ClientWriter:
+    """File-like object that streams a job's output to its client"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.lock = threading.Lock()
+        self.connected = True
+
+    def write(self, text):
+        if text and self.connected:
+            with self.lock:
+                try:
+                    send_message(self.sock, {"out": text})
+                except OSError:
+                    # Client went away, let the job finish quietly
+                    self.connected = False
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+class JobOutput:
+    """Stand-in for sys.stdout or sys.stderr that sends job output to the client
+
+    Threads that were already running when the job started belong to the
+    daemon and write to the original stream. The job's thread, and every
+    thread started while the job runs, write to the job's client.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.writer = None
+        self.daemon_threads = set()
+
+    def attach(self, writer):
+        current = threading.get_ident()
+        self.daemon_threads = {thread.ident for thread in threading.enumerate() if thread.ident != current}
+        self.writer = writer
+
+    def detach(self):
+        self.writer = None
+
+    def write(self, text):
+        writer = self.writer
+        if writer is None or threading.get_ident() in self.daemon_threads:
+            return self.stream.write(text)
+        return writer.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def load_script(script):
+    """Load a fresh copy of a script module"""
+    name = os.path.splitext(script)[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPTS_DIR, script))
+    module = importlib.util.module_from_spec(spec)
+    # Registered so shard workers can unpickle the module's functions
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class SeedingDaemon:
+    def __init__(self):
+        self.started = time.time()
+        self.jobs = 0
+        self.failed = 0
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="seeding-job")
+        self.outputs = (JobOutput(sys.stdout), JobOutput(sys.stderr))
+
+    def warm_up(self, admins_file):
+        """Check admin tokens and fetch the listings once"""
+        try:
+            with open(admins_file, 'r') as f:
+                admins_data = json.load(f)
+        except Exception as e:
+            print(f"Warning: could not load {admins_file}: {str(e)}")
+            return
+        return self.worker.submit(self._warm_up, admins_data, admins_file).result()
+
+    def _warm_up(self, admins_data, admins_file):
+        track_admins(admins_data, admins_file)
+        accounts = [admins_data.get('superadmin', {})] + list(admins_data.get('admins', []))
+        tokens = [account.get('jwt') for account in accounts if is_token_valid(account.get('jwt'))]
+        print(f"Found {len(tokens)} valid admin tokens")
+        if tokens:
+            get_all_events(tokens[0])
+            get_all_combos(tokens[0])
+
+    def run_job(self, script, args, cwd, sock, stats_file=None, trace_file=None, trace_id=None, deadline=None,
+                items_file=None):
+        """Run one script invocation; return its exit code"""
+        writer = ClientWriter(sock)
+        saved_argv, saved_cwd = sys.argv, os.getcwd()
+        start_time = time.time()
+        code = 0
+        # Request latencies and item counts are saved per job, in the job's directory
+        save_histograms(recorder.take())
+        counter.take()
+        # Spans are only recorded for jobs of a traced run
+        saved_trace = tracer.recording, tracer.trace_id
+        tracer.take()
+        tracer.recording = bool(trace_file)
+        tracer.trace_id = trace_id or saved_trace[1]
+        # The job stops at its client's deadline
+        deadlines.set_deadline(deadline)
+        try:
+            os.chdir(cwd)
+            sys.argv = [os.path.join(SCRIPTS_DIR, script)] + list(args)
+            expire_all()
+            for output in self.outputs:
+                output.attach(writer)
+            try:
+                load_script(script).main()
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+        except OSError as e:
+            writer.write(f"Error: cannot run in {cwd}: {str(e)}\n")
+            code = 1
+        finally:
+            for output in self.outputs:
+                output.detach()
+            try:
+                save_histograms(recorder.take(), stats_file)
+                counter.save(items_file)
+                tracer.save(trace_file)
+            except OSError:
+                pass
+            tracer.recording, tracer.trace_id = saved_trace
+            deadlines.set_deadline(None)
+            sys.argv = saved_argv
+            os.chdir(saved_cwd)
+
+        self.jobs += 1
+        if code:
+            self.failed += 1
+        print(f"{script} {' '.join(args)} -> exit {code} in {time.time() - start_time:.2f}s")
+        return code
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "base_url": BASE_URL,
+            "uptime": round(time.time() - self.started),
+            "jobs": self.jobs,
+            "failed": self.failed,
+            "accounts": len(get_token_manager())
+        }
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon = self.server.daemon
+        message = next(read_messages(self.request), None)
+        if message is None:
+            return
+
+        command = message.get("command")
+        if command == "status":
+            send_message(self.request, daemon.status())
+        elif command == "stop":
+            send_message(self.request, {"stopping": True})
+            threading.Thread(target=self.server.shutdown).start()
+        elif message.get("base_url", BASE_URL) != BASE_URL:
+            # Warm tokens and listings belong to this daemon's backend
+            send_message(self.request, {"refused": f"daemon seeds {BASE_URL}"})
+        elif message.get("script") in DAEMON_SCRIPTS and local_option(message.get("args", [])):
+            # Watching would hold the only job slot, and shards fork this multithreaded process
+            send_message(self.request, {"refused": f"{local_option(message['args'])} runs outside the daemon"})
+        elif message.get("script") in DAEMON_SCRIPTS:
+            future = daemon.worker.submit(daemon.run_job, message["script"],
+                                          message.get("args", []), message.get("cwd", os.getcwd()),
+                                          self.request, message.get("stats_file"),
+                                          message.get("trace_file"), message.get("trace_id"),
+                                          message.get("deadline"), message.get("items_file"))
+            send_message(self.request, {"exit": future.result()})
+        else:
+            send_message(self.request, {"error": f"not a daemon job: {message}"})
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path, admins_file):
+    if daemon_client.connect(socket_path) is not None:
+        print(f"Error: a seeding daemon is already listening on {socket_path}")
+        return
+    if os.path.exists(socket_path):
+        # Left behind by a daemon that did not shut down cleanly
+        os.remove(socket_path)
+    directory = os.path.dirname(socket_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    daemon = SeedingDaemon()
+    sys.stdout, sys.stderr = daemon.outputs
+    daemon.warm_up(admins_file)
+
+    # Jobs change the working directory while they run
+    socket_path = os.path.abspath(socket_path)
+    with DaemonServer(socket_path, RequestHandler) as server:
+        server.daemon = daemon
+        print(f"Seeding daemon {os.getpid()} for {BASE_URL} listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(socket_path)
+            daemon.worker.shutdown()
+            sys.stdout, sys.stderr = (output.stream for output in daemon.outputs)
+    print(f"Seeding daemon stopped after {daemon.jobs} jobs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep connections, tokens and listings warm for the admin scripts")
+    parser.add_argument('--socket', default=SOCKET_PATH, help=f"Unix socket to listen on (default: {SOCKET_PATH})")
+    parser.add_argument('--admins-file', default="json/admins.json", help="Admins whose tokens to check on startup")
+    parser.add_argument('--status', action='store_true', help="Show the status of the running daemon")
+    parser.add_argument('--stop', action='store_true', help="Stop the running daemon")
+    args = parser.parse_args()
+
+    if args.status or args.stop:
+        reply = daemon_client.request({"command": "stop" if args.stop else "status"}, args.socket)
+        if reply is None:
+            print(f"No seeding daemon is listening on {args.socket}")
+        elif args.stop:
+            print("Seeding daemon is stopping")
+        else:
+            print(f"Seeding daemon {reply['pid']} for {reply['base_url']}: up {reply['uptime']}s, {reply['jobs']} jobs "
+                  f"({reply['failed']} failed), {reply['accounts']} tracked accounts")
+        return
+
+    serve(args.socket, args.admins_file)
+
+if __name__ == "__main__":
+    main()
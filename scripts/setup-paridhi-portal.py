@@ -2,50 +2,281 @@ import subprocess
 import argparse
 import sys
 import os
+import signal
 import time
+import shutil
+import tempfile
+import threading
 from datetime import datetime
+from urllib.parse import urlsplit
 
-def print_header(message):
+from api_session import BASE_URL
+from cassette import CASSETTE_ENV, CASSETTE_MODE_ENV, CASSETTE_SCALE_ENV, read_cassette
+from deadlines import DEADLINE_ENV
+from file_watch import IMAGE_EXTENSIONS
+from image_dedup import HASH_CACHE, HashCache, Image, compute_hashes
+from item_counts import ITEMS_FILE_ENV
+from latency_stats import LATENCY_FILE, LATENCY_FILE_ENV, STATS_FILE_ENV
+from run_history import RUN_HISTORY_FILE, append_run, step_record
+from seed_plan import SeedInputs, format_seconds, plan_steps, print_plan
+from seed_sample import SAMPLE_DIR, write_sample
+from tracing import (TRACE_FILE_ENV, TRACE_ID_ENV, export_chrome_trace, read_trace_events, slowest_spans,
+                     tracer)
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Inputs every target workspace gets its own copy of, since the steps write
+# tokens, GIDs and journals next to them
+INPUT_DIRS = ("event-posters", "team-members")
+
+# event-pipeline.py's default --workers
+PIPELINE_WORKERS = 8
+
+# Seconds a step gets after its deadline to cancel its work and exit, before
+# it is interrupted (and then killed)
+CANCEL_GRACE = 15
+TIMEOUT_EXIT_CODE = 124
+
+# MRD registrations per user in a --sample run
+SAMPLE_MRD_COUNT = 2
+
+# Replayed latencies are kept apart from the real backend's, which --plan uses
+REPLAY_LATENCY_FILE = os.path.join(".cache", "replay_latency.json")
+
+def print_header(message, file=None):
     """Print a formatted header message"""
     line = "=" * 80
-    print(f"\n{line}")
-    print(f"{message.center(80)}")
-    print(f"{line}\n")
+    print(f"\n{line}", file=file)
+    print(f"{message.center(80)}", file=file)
+    print(f"{line}\n", file=file)
+
+def execute_script(script_name, args=None, cwd=None, env=None, log=None, deadline=None):
+    """Run a Python script and return its exit code, None if it could not run
 
-def run_script(script_name, args=None, required=True):
-    """Run a Python script and return True if successful, False otherwise"""
+    With log, the header and the script's output go to that file instead of
+    the console; cwd and env are passed on to the script's process. With a
+    deadline (epoch seconds) the script is told to stop by then through
+    PARIDHI_DEADLINE. If it is still running CANCEL_GRACE seconds later it is
+    interrupted, and killed if that does not stop it either; only then is
+    TIMEOUT_EXIT_CODE returned instead of the script's own exit code.
+    """
     if args is None:
         args = []
     
-    command = [sys.executable, script_name] + args
+    command = [sys.executable, os.path.join(SCRIPTS_DIR, script_name)] + args
+    output = {} if log is None else {"stdout": log, "stderr": subprocess.STDOUT}
+    
+    print_header(f"RUNNING: {script_name}", file=log)
+    print(f"Command: {' '.join(command)}", file=log)
+    if log is not None:
+        log.flush()
     
-    print_header(f"RUNNING: {script_name}")
-    print(f"Command: {' '.join(command)}")
+    if deadline is not None:
+        env = dict(env or os.environ, **{DEADLINE_ENV: repr(deadline)})
     
     try:
         # Run the script and capture output
         start_time = time.time()
-        result = subprocess.run(command, check=True)
+        process = subprocess.Popen(command, cwd=cwd, env=env, **output)
+        try:
+            returncode = process.wait(timeout=None if deadline is None
+                                      else max(0, deadline - time.time()) + CANCEL_GRACE)
+        except subprocess.TimeoutExpired:
+            print(f"\nTIMEOUT: {script_name} is still running past its deadline, interrupting it", file=log)
+            process.send_signal(signal.SIGINT)
+            try:
+                process.wait(timeout=CANCEL_GRACE)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            print(f"\nTIMEOUT: {script_name} ran out of time after {time.time() - start_time:.2f} seconds", file=log)
+            return TIMEOUT_EXIT_CODE
         elapsed_time = time.time() - start_time
         
-        print(f"\nSUCCESS: {script_name} completed in {elapsed_time:.2f} seconds")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"\nERROR: {script_name} failed with exit code {e.returncode}")
-        if required:
-            print("This script is required for the setup process. Stopping.")
-            return False
-        else:
-            print("This script is optional. Continuing with the setup process.")
-            return True
+        if returncode != 0:
+            print(f"\nERROR: {script_name} failed with exit code {returncode}", file=log)
+            return returncode
+        print(f"\nSUCCESS: {script_name} completed in {elapsed_time:.2f} seconds", file=log)
+        return returncode
     except Exception as e:
-        print(f"\nEXCEPTION: {script_name} raised an exception: {str(e)}")
-        if required:
-            print("This script is required for the setup process. Stopping.")
-            return False
-        else:
-            print("This script is optional. Continuing with the setup process.")
-            return True
+        print(f"\nEXCEPTION: {script_name} raised an exception: {str(e)}", file=log)
+        return None
+
+def run_script(script_name, args=None, required=True, cwd=None, env=None, log=None, deadline=None):
+    """Run a Python script and return True if the setup can go on, False otherwise"""
+    if execute_script(script_name, args, cwd, env, log, deadline) == 0:
+        return True
+    if required:
+        print("This script is required for the setup process. Stopping.", file=log)
+        return False
+    else:
+        print("This script is optional. Continuing with the setup process.", file=log)
+        return True
+
+def step_deadline(deadline, budget):
+    """The earlier of the run's deadline and now + the step's budget, None if neither is set"""
+    ends = [end for end in (deadline, budget and time.time() + budget) if end]
+    return min(ends) if ends else None
+
+def run_steps(scripts, is_selected, extra_args, deadline=None, budgets=None, **run_options):
+    """Run the selected steps in order; return (successful, failed, skipped, step records)
+
+    Each step's requests and items are collected through PARIDHI_STATS_FILE
+    and PARIDHI_ITEMS_FILE for the run history (see run_history.py). deadline (epoch seconds) bounds the
+    whole run and budgets ({step: seconds}, None for every other step) bound
+    single steps; a step that has to be interrupted fails, and once the run's
+    deadline has passed the remaining steps are not started.
+    """
+    log = run_options.get("log")
+    env = run_options.pop("env", None) or os.environ
+    successful_steps = 0
+    failed_steps = 0
+    skipped_steps = 0
+    records = []
+    
+    with tempfile.TemporaryDirectory(prefix="paridhi-stats-") as stats_dir:
+        for script in scripts:
+            script_id = script["id"]
+            script_name = script["name"]
+            script_desc = script["description"]
+            script_required = script["required"]
+            
+            # Check if this step should be run
+            if not is_selected(script_id):
+                print_header(f"SKIPPING STEP {script_id}: {script_desc}", file=log)
+                skipped_steps += 1
+                continue
+            
+            if deadline is not None and time.time() >= deadline:
+                print_header(f"STOPPING SETUP: Deadline passed before step {script_id} ({script_name})", file=log)
+                failed_steps += 1
+                skipped_steps += sum(1 for rest in scripts[scripts.index(script) + 1:] if is_selected(rest["id"]))
+                break
+            
+            # Run the script
+            stats_file = os.path.join(stats_dir, f"step{script_id}.json")
+            items_file = os.path.join(stats_dir, f"step{script_id}.items.json")
+            budget = (budgets or {}).get(script_id, (budgets or {}).get(None))
+            start_time = time.time()
+            with tracer.span(f"step {script_id} {script_name}", "step", backend=env.get("PARIDHI_BASE_URL", BASE_URL)):
+                code = execute_script(script_name, script["args"] + extra_args(script),
+                                      env=dict(env, **{STATS_FILE_ENV: stats_file, ITEMS_FILE_ENV: items_file}),
+                                      deadline=step_deadline(deadline, budget), **run_options)
+            records.append(step_record(script_id, script_name, time.time() - start_time, code == 0,
+                                       stats_file, items_file))
+            
+            if code == 0:
+                successful_steps += 1
+            elif not script_required:
+                print("This script is optional. Continuing with the setup process.", file=log)
+                successful_steps += 1
+            else:
+                print("This script is required for the setup process. Stopping.", file=log)
+                failed_steps += 1
+                print_header(f"STOPPING SETUP: Required script {script_name} failed", file=log)
+                break
+    
+    return successful_steps, failed_steps, skipped_steps, records
+
+def target_slug(url):
+    """Directory name for a target, e.g. staging.example.com_8080"""
+    parts = urlsplit(url)
+    return (parts.netloc or parts.path).replace(':', '_').replace('/', '_')
+
+def prepare_workspace(slug, source="."):
+    """Create targets/<slug> with fresh copies of the inputs in source and return its path
+
+    JSON inputs are copied so each target keeps its own tokens and GIDs.
+    Image and CSV directories are linked, and the perceptual hash cache is
+    copied so gallery deduplication does not hash the images again.
+    """
+    workspace = os.path.abspath(os.path.join("targets", slug))
+    os.makedirs(os.path.join(workspace, "json"), exist_ok=True)
+    os.makedirs(os.path.join(workspace, ".cache"), exist_ok=True)
+    
+    for name in os.listdir(os.path.join(source, "json")):
+        if name.endswith(".json"):
+            shutil.copyfile(os.path.join(source, "json", name), os.path.join(workspace, "json", name))
+    for name in INPUT_DIRS:
+        link = os.path.join(workspace, name)
+        target = os.path.abspath(os.path.join(source, name))
+        if os.path.lexists(link) and os.path.realpath(link) != target:
+            os.remove(link)
+        if os.path.exists(target) and not os.path.lexists(link):
+            os.symlink(target, link)
+    if os.path.exists(os.path.join(source, HASH_CACHE)):
+        shutil.copyfile(os.path.join(source, HASH_CACHE), os.path.join(workspace, HASH_CACHE))
+    return workspace
+
+def warm_image_hashes(source="."):
+    """Hash the gallery images in source once, before every target needs them"""
+    images_dir = os.path.join(source, "event-posters")
+    if Image is None or not os.path.isdir(images_dir):
+        return
+    paths = [os.path.join(root, name)
+             for root, _, files in os.walk(images_dir)
+             for name in files if name.lower().endswith(IMAGE_EXTENSIONS)]
+    compute_hashes(paths, HashCache(os.path.join(source, HASH_CACHE)))
+
+def fan_out(targets, scripts, is_selected, extra_args, timestamp, deadline=None, budgets=None, source="."):
+    """Run the steps against every target at once; return {url: result}"""
+    results = {}
+    slugs = {}
+    for url in targets:
+        slug = target_slug(url)
+        slugs[url] = slug if slug not in slugs.values() else f"{slug}_{len(slugs)}"
+    
+    def run_target(url):
+        slug = slugs[url]
+        log_file = os.path.join("logs", f"setup_{timestamp}_{slug}.log")
+        # Every target gets its own processes, so its own tokens and
+        # connection pools; the seeding daemon only serves the default target.
+        # Latency histograms are kept per backend in the shared file.
+        env = dict(os.environ, PARIDHI_BASE_URL=url, PARIDHI_NO_DAEMON="1",
+                   **{LATENCY_FILE_ENV: os.path.abspath(LATENCY_FILE)})
+        start_time = time.time()
+        try:
+            workspace = prepare_workspace(slug, source)
+            with open(log_file, 'w') as log:
+                print_header(f"PARIDHI PORTAL 2025 SETUP: {url}", file=log)
+                counts = run_steps(scripts, is_selected, extra_args, deadline, budgets,
+                                   cwd=workspace, env=env, log=log)
+        except OSError as e:
+            print(f"EXCEPTION: {url}: {str(e)}")
+            counts = (0, 1, 0, [])
+        results[url] = counts + (time.time() - start_time, log_file)
+        print(f"{url}: {counts[0]} steps successful, {counts[1]} failed, {counts[2]} skipped "
+              f"in {results[url][4]:.2f} seconds")
+    
+    threads = [threading.Thread(target=run_target, args=(url,)) for url in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def show_plan(scripts, is_selected, args, targets, source="."):
+    """Print the request counts and time estimates for the selected steps"""
+    steps = [(script["id"], script["name"], script["description"]) for script in scripts if is_selected(script["id"])]
+    mrd_args = next((script["args"] for script in scripts if script["name"] == "mrd-registration.py"), [])
+    mrd_count = int(mrd_args[mrd_args.index("--mrd-count") + 1]) if "--mrd-count" in mrd_args else 10
+    pipeline_args = next((script["args"] for script in scripts if script["name"] == "event-pipeline.py"), [])
+    pipeline_workers = int(pipeline_args[pipeline_args.index("--workers") + 1]) if "--workers" in pipeline_args else PIPELINE_WORKERS
+    
+    inputs = SeedInputs(*(os.path.join(source, path) for path in
+                          ("json/admins.json", "json/users.json", "json/events.json",
+                           "team-members/Contact Information.csv", "event-posters")))
+    plans = plan_steps(steps, inputs, mrd_count, args.shards, pipeline_workers, "--top-up" in mrd_args)
+    
+    print_header("PARIDHI PORTAL 2025 SETUP PLAN")
+    estimates = []
+    for backend in targets or [BASE_URL]:
+        estimates.append(print_plan(plans, backend))
+        print()
+    if len(estimates) > 1:
+        # Targets run side by side, the slowest one sets the pace
+        print(f"All {len(estimates)} targets in parallel: ~{format_seconds(max(e[0] for e in estimates))} "
+              f"(p90 {format_seconds(max(e[1] for e in estimates))})")
 
 def main():
     parser = argparse.ArgumentParser(description="Setup Paridhi Portal with all necessary data")
@@ -53,6 +284,19 @@ def main():
     parser.add_argument('--end-step', type=int, default=9, help="End at a specific step (1-9)")
     parser.add_argument('--dry-run', action='store_true', help="Run all scripts in dry-run mode (no changes)")
     parser.add_argument('--skip-steps', type=str, help="Comma-separated list of steps to skip (e.g., '3,5,7')")
+    parser.add_argument('--skip-validation', action='store_true', help="Skip the offline validation of seed inputs")
+    parser.add_argument('--shards', type=int, default=1, help="Worker processes for the user import and MRD steps (default: 1)")
+    parser.add_argument('--pipeline', action='store_true', help="Run steps 4-7 as one pipeline that overlaps event, combo and poster calls")
+    parser.add_argument('--plan', action='store_true', help="Count the requests each step would send and estimate the run time, without running anything")
+    parser.add_argument('--trace', action='store_true', help="Record spans for every step, item and request and write a Chrome trace to logs/")
+    parser.add_argument('--deadline', type=float, help="Seconds the whole run may take; work still pending then is cancelled and later steps are not started")
+    parser.add_argument('--step-timeout', type=float, help="Seconds any one step may take")
+    parser.add_argument('--step-budgets', type=str, help="Comma-separated per-step limits in seconds that override --step-timeout (e.g., '3=600,8=120')")
+    parser.add_argument('--sample', type=int, metavar='K', help=f"Smoke run on a stratified sample: K users per college/year, K events per domain plus combo events, K team members per year (written to {SAMPLE_DIR}/)")
+    parser.add_argument('--record-cassette', type=str, metavar='FILE', help="Record every request and response of the run to a cassette file")
+    parser.add_argument('--replay-cassette', type=str, metavar='FILE', help="Answer every request from a recorded cassette instead of the backend")
+    parser.add_argument('--replay-scale', type=float, default=1.0, help="Multiply the recorded latencies by this when replaying, 0 for no wait (default: 1)")
+    parser.add_argument('--targets', type=str, help="Comma-separated base URLs to seed at the same time (default: PARIDHI_BASE_URL or http://localhost:8080)")
     args = parser.parse_args()
     
     start_step = args.start_step
@@ -67,6 +311,43 @@ def main():
             print("Error: --skip-steps must be a comma-separated list of integers")
             return
     
+    targets = []
+    if args.targets:
+        targets = list(dict.fromkeys(url.strip().rstrip('/') for url in args.targets.split(',') if url.strip()))
+        if any(urlsplit(url).scheme not in ("http", "https") for url in targets):
+            print("Error: --targets must be a comma-separated list of http(s) base URLs")
+            return
+    
+    budgets = {}
+    if args.step_timeout:
+        budgets[None] = args.step_timeout
+    if args.step_budgets:
+        try:
+            for entry in args.step_budgets.split(','):
+                step, seconds = entry.split('=')
+                budgets[int(step)] = float(seconds)
+        except ValueError:
+            print("Error: --step-budgets must be a comma-separated list of step=seconds (e.g., '3=600,8=120')")
+            return
+    if args.record_cassette and args.replay_cassette:
+        print("Error: --record-cassette and --replay-cassette cannot be used together")
+        return
+    if (args.record_cassette or args.replay_cassette) and targets:
+        print("Error: cassettes record or replay a single backend and cannot be used with --targets")
+        return
+    if args.replay_cassette and not read_cassette(args.replay_cassette):
+        print(f"Error: {args.replay_cassette} is not a recorded cassette")
+        return
+    if args.replay_scale < 0:
+        print("Error: --replay-scale must not be negative")
+        return
+    if args.sample is not None and args.sample < 1:
+        print("Error: --sample must be at least 1")
+        return
+    if (args.deadline is not None and args.deadline <= 0) or any(seconds <= 0 for seconds in budgets.values()):
+        print("Error: --deadline, --step-timeout and --step-budgets must be positive")
+        return
+    
     # Define the scripts in order
     scripts = [
         {
@@ -81,14 +362,16 @@ def main():
             "name": "users-data-import.py",
             "description": "Register user accounts and create profiles",
             "required": True,
-            "args": ["--file", "json/users.json"]
+            "args": ["--file", "json/users.json"],
+            "shardable": True
         },
         {
             "id": 3,
             "name": "mrd-registration.py",
             "description": "Register users for MRD and get GIDs",
             "required": False,
-            "args": ["--file", "json/users.json", "--mrd-count", "10"]
+            "args": ["--file", "json/users.json", "--mrd-count", str(SAMPLE_MRD_COUNT if args.sample else 10)],
+            "shardable": True
         },
         {
             "id": 4,
@@ -134,6 +417,54 @@ def main():
         }
     ]
     
+    def is_selected(step):
+        return start_step <= step <= end_step and step not in skip_steps
+    
+    def extra_args(script):
+        """Flags every step gets on top of its own arguments"""
+        flags = []
+        # Add dry-run flag if needed
+        if dry_run:
+            flags.append("--dry-run")
+        # Split the user steps across worker processes if requested
+        if args.shards > 1 and script.get("shardable"):
+            flags.extend(["--shards", str(args.shards)])
+        return flags
+    
+    # Replace steps 4-7 with the event pipeline, which starts each poster and
+    # combo as soon as the events it depends on exist
+    if args.pipeline and is_selected(4):
+        stages = {5: "event-posters", 6: "combos", 7: "combo-posters"}
+        pipeline_args = ["--events-file", "json/events.json", "--admins-file", "json/admins.json",
+                         "--posters-dir", "event-posters"]
+        skipped_stages = [name for step, name in stages.items() if not is_selected(step)]
+        if skipped_stages:
+            pipeline_args.extend(["--skip", ",".join(skipped_stages)])
+        scripts = [script for script in scripts if script["id"] not in stages]
+        scripts[3] = {
+            "id": 4,
+            "name": "event-pipeline.py",
+            "description": "Create events and combos and upload their posters",
+            "required": True,
+            "args": pipeline_args
+        }
+    
+    # Every step reads its inputs from source, the sample workspace with --sample
+    source = "."
+    sample_summary = None
+    if args.sample:
+        source = os.path.abspath(SAMPLE_DIR)
+        try:
+            sample_counts = write_sample(source, args.sample)
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot write the sample to {SAMPLE_DIR}/: {str(e)}")
+            return
+        sample_summary = ", ".join(f"{kept}/{total} {name}" for name, (kept, total) in sample_counts.items())
+    
+    if args.plan:
+        show_plan(scripts, is_selected, args, targets, source)
+        return
+    
     # Create log directory if it doesn't exist
     log_dir = "logs"
     if not os.path.exists(log_dir):
@@ -143,17 +474,48 @@ def main():
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     log_file = os.path.join(log_dir, f"setup_{timestamp}.log")
     
+    # Every step appends its spans to one file, exported as a Chrome trace at the end
+    trace_events_file = None
+    if args.trace:
+        trace_events_file = os.path.abspath(os.path.join(log_dir, f"trace_{timestamp}.jsonl"))
+        os.environ[TRACE_FILE_ENV] = trace_events_file
+        os.environ[TRACE_ID_ENV] = tracer.trace_id = timestamp
+        tracer.recording = True
+    
+    # Steps record or replay through their sessions, and skip the seeding
+    # daemon while a cassette is set
+    if args.record_cassette:
+        os.environ[CASSETTE_ENV] = os.path.abspath(args.record_cassette)
+        os.environ[CASSETTE_MODE_ENV] = "record"
+    elif args.replay_cassette:
+        os.environ[CASSETTE_ENV] = os.path.abspath(args.replay_cassette)
+        os.environ[CASSETTE_MODE_ENV] = "replay"
+        os.environ[CASSETTE_SCALE_ENV] = repr(args.replay_scale)
+        os.environ[LATENCY_FILE_ENV] = os.path.abspath(REPLAY_LATENCY_FILE)
+    
     # Redirect stdout and stderr to the log file
     original_stdout = sys.stdout
     original_stderr = sys.stderr
     
     # Print setup information
     start_time = time.time()
+    deadline = start_time + args.deadline if args.deadline else None
     print_header("PARIDHI PORTAL 2025 SETUP")
     print(f"Starting setup at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"Dry run mode: {'Enabled' if dry_run else 'Disabled'}")
     print(f"Starting at step {start_step} and ending at step {end_step}")
     print(f"Skipping steps: {skip_steps if skip_steps else 'None'}")
+    print(f"Pipelined steps 4-7: {'Enabled' if args.pipeline else 'Disabled'}")
+    if args.record_cassette:
+        print(f"Recording to cassette: {args.record_cassette}")
+    elif args.replay_cassette:
+        print(f"Replaying cassette: {args.replay_cassette} (latency x{args.replay_scale:g})")
+    if sample_summary:
+        print(f"Sample: {sample_summary} (workspace {SAMPLE_DIR}/)")
+    if deadline:
+        print(f"Deadline: {datetime.fromtimestamp(deadline).strftime('%Y-%m-%d %H:%M:%S')}")
+    if targets:
+        print(f"Targets: {', '.join(targets)} (logs in {log_dir}/setup_{timestamp}_<target>.log)")
     print(f"Log file: {log_file}")
     
     # Open log file
@@ -168,44 +530,86 @@ def main():
         print(f"Dry run mode: {'Enabled' if dry_run else 'Disabled'}")
         print(f"Starting at step {start_step} and ending at step {end_step}")
         print(f"Skipping steps: {skip_steps if skip_steps else 'None'}")
+        if sample_summary:
+            print(f"Sample: {sample_summary} (workspace {SAMPLE_DIR}/)")
+        if deadline:
+            print(f"Deadline: {datetime.fromtimestamp(deadline).strftime('%Y-%m-%d %H:%M:%S')}")
+        if budgets:
+            limits = [f"{step or 'other'}={seconds:g}s" for step, seconds in budgets.items()]
+            print(f"Step time limits: {', '.join(limits)}")
         
         # Run each script in order
         successful_steps = 0
         failed_steps = 0
         skipped_steps = 0
+        results = {}
+        results_history = {}
         
-        for script in scripts:
-            script_id = script["id"]
-            script_name = script["name"]
-            script_desc = script["description"]
-            script_required = script["required"]
-            script_args = script["args"].copy()
-            
-            # Check if this step should be run
-            if script_id < start_step or script_id > end_step or script_id in skip_steps:
-                print_header(f"SKIPPING STEP {script_id}: {script_desc}")
-                skipped_steps += 1
-                continue
-            
-            # Add dry-run flag if needed
-            if dry_run:
-                script_args.append("--dry-run")
-            
-            # Run the script
-            success = run_script(script_name, script_args, script_required)
-            
-            if success:
-                successful_steps += 1
-            else:
+        # Validate every input offline before any step talks to the backend
+        if not args.skip_validation:
+            validation_args = [
+                "--admins-file", "json/admins.json",
+                "--users-file", "json/users.json",
+                "--events-file", "json/events.json",
+                "--csv-file", "team-members/Contact Information.csv",
+                "--posters-dir", "event-posters"
+            ]
+            with tracer.span("validate-seed-data.py", "step"):
+                validated = run_script("validate-seed-data.py", validation_args, required=True, cwd=source,
+                                       deadline=deadline)
+            if not validated:
                 failed_steps += 1
-                if script_required:
-                    print_header(f"STOPPING SETUP: Required script {script_name} failed")
-                    break
+                print_header("STOPPING SETUP: Seed data validation failed")
+                scripts = []
+        
+        if targets and scripts:
+            # Inputs were validated once above; hash the gallery images once
+            # too, then run every target's steps side by side
+            if is_selected(8):
+                warm_image_hashes(source)
+            results = fan_out(targets, scripts, is_selected, extra_args, timestamp, deadline, budgets, source)
+            for counts in results.values():
+                successful_steps += counts[0]
+                failed_steps += counts[1]
+                skipped_steps += counts[2]
+        elif scripts:
+            step_start = time.time()
+            counts = run_steps(scripts, is_selected, extra_args, deadline, budgets, cwd=source)
+            successful_steps, failed_steps, skipped_steps = counts[:3]
+            results_history = {BASE_URL: (counts[3], time.time() - step_start)}
+        
+        # Keep the step timings for compare-runs.py
+        if targets:
+            results_history = {url: (result[3], result[4]) for url, result in results.items()}
+        for backend, (records, seconds) in results_history.items():
+            if records:
+                append_run({
+                    "run": timestamp,
+                    "backend": backend,
+                    "dry_run": dry_run,
+                    "shards": args.shards,
+                    "pipeline": args.pipeline,
+                    "workers": PIPELINE_WORKERS if args.pipeline else 1,
+                    "targets": len(targets) or 1,
+                    "sample": args.sample,
+                    "replay_scale": args.replay_scale if args.replay_cassette else None,
+                    "seconds": round(seconds, 3),
+                    "steps": records
+                })
     
     # Restore stdout and stderr
     sys.stdout = original_stdout
     sys.stderr = original_stderr
     
+    trace_file = None
+    if trace_events_file:
+        tracer.save(trace_events_file)
+        events = read_trace_events(trace_events_file)
+        trace_file = os.path.join(log_dir, f"trace_{timestamp}.json")
+        export_chrome_trace(events, trace_file)
+        if os.path.exists(trace_events_file):
+            os.remove(trace_events_file)
+    
     # Print summary
     elapsed_time = time.time() - start_time
     print_header("SETUP SUMMARY")
@@ -214,6 +618,19 @@ def main():
     print(f"Steps failed: {failed_steps}")
     print(f"Steps skipped: {skipped_steps}")
     print(f"Log file: {log_file}")
+    if results_history:
+        print(f"Step timings appended to {RUN_HISTORY_FILE} (check with: python compare-runs.py)")
+    if trace_file:
+        print(f"Trace: {trace_file} ({len(events)} events, open in https://ui.perfetto.dev or chrome://tracing)")
+        slowest = slowest_spans(events, "http")
+        if slowest:
+            print("Slowest requests:")
+            for event in slowest:
+                print(f"  {event['dur'] / 1000:8.1f} ms  {event['name']}  {event['args'].get('status', '-')}  "
+                      f"{event['args']['id']}")
+    for url, (successful, failed, skipped, _, elapsed, target_log) in results.items():
+        print(f"\n{url}: {successful} successful, {failed} failed, {skipped} skipped in {elapsed:.2f} seconds")
+        print(f"  Log file: {target_log}")
     
     if failed_steps == 0:
         print("\nSetup completed successfully!")
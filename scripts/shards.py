@@ -0,0 +1,41 @@
+import hashlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# Sharded processing for the user scripts.
+#
+# With --shards N every user is assigned to one of N shards by a stable hash
+# of their email. Each shard runs in its own worker process with its own HTTP
+# session, writes its results to index-keyed side files, and the parent merges
+# those back in the original order.
+
+
+def shard_of(email, shards):
+    """Stable shard number for an email address"""
+    digest = hashlib.md5(email.strip().lower().encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shards
+
+
+def shard_users(users, shard=None, shards=1):
+    """Yield (index, user) for the users that belong to a shard"""
+    for index, user in enumerate(users):
+        if shard is None or shard_of(user.get("email", ""), shards) == shard:
+            yield index, user
+
+
+def run_shards(worker, shards, *args):
+    """Run worker(*args, shard, shards) for every shard in its own process
+
+    Returns the per-shard results in shard order.
+    """
+    with ProcessPoolExecutor(max_workers=shards) as pool:
+        futures = [pool.submit(worker, *args, shard, shards) for shard in range(shards)]
+        return [future.result() for future in futures]
+
+
+def sum_counts(results):
+    """Add up the counter dicts returned by each shard"""
+    total = Counter()
+    for result in results:
+        total.update(result)
+    return total
@@ -0,0 +1,175 @@
+import json
+import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from api_session import BASE_URL, get_session
+from daemon_client import run_in_daemon
+from entities import COMBOS_ENDPOINT, EVENT_ENDPOINT, GALLERIES_ENDPOINT, MRD_ENDPOINT, TEAM_ENDPOINT
+from portal_archive import SECTION_LABELS, SECTIONS, SnapshotWriter, image_url
+from token_manager import is_token_valid, track_admins
+from user_stream import UserStream
+
+# Capture what the backend currently holds into one archive (see
+# portal_archive.py), so that restore-portal.py can clone it into another
+# backend.
+#
+# Sections are fetched at the same time. Paginated listings fetch the first
+# page to learn the page count and then the rest in parallel, and every
+# poster and gallery image is downloaded once through the same pool. MRD
+# records are looked up per user, so they need the users file.
+
+def get_json(url, token, params=None):
+    """GET an API resource and return the decoded body"""
+    response = get_session().get(
+        url,
+        headers={"Authorization": f"Bearer {token}"},
+        params=params
+    )
+    response.raise_for_status()
+    return response.json()
+
+def fetch_all(url, token, pool, page_size):
+    """Fetch every item of a listing, paginated or not"""
+    first = get_json(url, token, {"page": 0, "size": page_size})
+    if isinstance(first, list):
+        return first
+
+    items = list(first.get('content', []))
+    total_pages = first.get('totalPages')
+    if total_pages is None:
+        # No page count, walk the pages in order
+        page = 1
+        while not first.get('last', True):
+            first = get_json(url, token, {"page": page, "size": page_size})
+            items.extend(first.get('content', []))
+            page += 1
+        return items
+
+    def fetch_page(page):
+        return get_json(url, token, {"page": page, "size": page_size}).get('content', [])
+
+    for content in pool.map(fetch_page, range(1, total_pages)):
+        items.extend(content)
+    return items
+
+def fetch_team(token):
+    """Fetch the Megatronix team as one list of members"""
+    team = get_json(TEAM_ENDPOINT, token)
+    if isinstance(team, list):
+        return team
+    return list(team.get('members', [])) + list(team.get('developers', []))
+
+def fetch_mrd(token, users_file, pool):
+    """Fetch the MRD records of every user in users_file"""
+    def fetch_user(email):
+        response = get_session().get(
+            f"{MRD_ENDPOINT}/user/{email}/gids",
+            headers={"Authorization": f"Bearer {token}"}
+        )
+        if response.status_code == 404:
+            return []
+        response.raise_for_status()
+        return [get_json(f"{MRD_ENDPOINT}/{gid}", token) for gid in response.json() or []]
+
+    with UserStream(users_file) as users:
+        emails = [user['email'] for user in users if user.get('email')]
+
+    records = []
+    for user_records in pool.map(fetch_user, emails):
+        records.extend(user_records)
+    return records
+
+def archive_images(writer, items, pool):
+    """Download the images items point at and record them in the archive"""
+    urls = sorted({image_url(item) for item in items} - {None})
+
+    def download(url):
+        # Hosted images are public, the API token stays with the API
+        response = get_session().get(url)
+        response.raise_for_status()
+        return url, writer.add_image(response.content, url)
+
+    names = dict(pool.map(download, urls))
+    for item in items:
+        url = image_url(item)
+        if url:
+            item['archiveImage'] = names[url]
+
+def main():
+    default_output = os.path.join("snapshots", f"portal-{datetime.now().strftime('%Y%m%d-%H%M%S')}.zip")
+    parser = argparse.ArgumentParser(description="Save the portal's events, combos, gallery, team and MRD data to an archive")
+    parser.add_argument('--output', default=default_output, help="Archive to write (default: snapshots/portal-<time>.zip)")
+    parser.add_argument('--admins-file', default="json/admins.json", help="Path to admins JSON file")
+    parser.add_argument('--users-file', default="json/users.json", help="Users whose MRD records to save")
+    parser.add_argument('--skip', type=str, default="", help=f"Comma-separated sections to leave out ({','.join(SECTIONS)})")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent API calls (default: 8)")
+    parser.add_argument('--page-size', type=int, default=50, help="Items per page for paginated listings (default: 50)")
+    args = parser.parse_args()
+
+    sections = [section for section in SECTIONS if section not in {s.strip() for s in args.skip.split(',')}]
+    if "mrd" in sections and not os.path.exists(args.users_file):
+        print(f"Warning: {args.users_file} not found, skipping MRD records")
+        sections.remove("mrd")
+
+    # Load admins data
+    try:
+        with open(args.admins_file, 'r') as f:
+            admins_data = json.load(f)
+    except Exception as e:
+        print(f"Error loading admins file: {str(e)}")
+        return
+
+    track_admins(admins_data, args.admins_file)
+    accounts = [admins_data.get('superadmin', {})] + list(admins_data.get('admins', []))
+    token = next((account['jwt'] for account in accounts if is_token_valid(account.get('jwt'))), None)
+    if not token:
+        print("No valid admin tokens found. Cannot take a snapshot.")
+        return
+
+    start_time = time.time()
+    writer = SnapshotWriter(args.output, BASE_URL)
+    workers = max(1, args.workers)
+
+    # Sections wait on their own requests, which run in a separate pool
+    with ThreadPoolExecutor(max_workers=workers) as pool, \
+            ThreadPoolExecutor(max_workers=len(SECTIONS)) as section_pool:
+        fetchers = {
+            "events": lambda: fetch_all(EVENT_ENDPOINT, token, pool, args.page_size),
+            "combos": lambda: fetch_all(COMBOS_ENDPOINT, token, pool, args.page_size),
+            "galleries": lambda: fetch_all(GALLERIES_ENDPOINT, token, pool, args.page_size),
+            "team": lambda: fetch_team(token),
+            "mrd": lambda: fetch_mrd(token, args.users_file, pool)
+        }
+        futures = {section: section_pool.submit(fetchers[section]) for section in sections}
+
+        try:
+            for section, future in futures.items():
+                items = future.result()
+                if section in ("events", "combos", "galleries"):
+                    archive_images(writer, items, pool)
+                writer.write_section(section, items)
+                print(f"✅ Saved {len(items)} {SECTION_LABELS[section].lower()}")
+        except (requests.RequestException, ValueError) as e:
+            print(f"❌ Snapshot failed: {str(e)}")
+            writer.abort()
+            return
+
+    writer.close()
+
+    # Print summary
+    print("\n=== Portal Snapshot Summary ===")
+    print(f"Source: {BASE_URL}")
+    for section in sections:
+        print(f"{SECTION_LABELS[section]}: {writer.manifest['counts'][section]}")
+    print(f"Images: {writer.manifest['images']}")
+    print(f"Archive: {args.output} ({os.path.getsize(args.output) / 1024:.1f} KB)")
+    print(f"Completed in {time.time() - start_time:.2f} seconds")
+
+if __name__ == "__main__":
+    if not run_in_daemon():
+        main()
@@ -0,0 +1,287 @@
+import base64
+import json
+import os
+import threading
+import time
+
+import requests
+
+import api_session
+from api_session import BASE_URL, get_session
+from cassette import time_shift
+from tracing import tracer
+
+# Refresh-ahead JWT management for long-running jobs.
+#
+# The backend issues JWTs that expire after 24 hours, which a long import or
+# a --watch upload can outlive. Scripts register the accounts they use, with
+# their credentials, and a background thread logs in again shortly before a
+# token that is in use expires. Refreshed admin tokens are saved back to
+# admins.json. The shared HTTP session asks the manager for
+# the latest token of the account behind every Authorization header it
+# sends, so workers that still hold an old token string switch over
+# without noticing. A request that comes back 401 anyway is sent once more
+# with a freshly obtained token.
+
+LOGIN_ENDPOINT = f"{BASE_URL}/api/auth/login"
+AUTH_VERIFY_ENDPOINT = f"{BASE_URL}/api/auth/check-token"
+
+# Refresh when this share of a token's lifetime is left, but never later
+# than MIN_REFRESH_AHEAD seconds before it expires
+REFRESH_AHEAD_RATIO = 0.1
+MIN_REFRESH_AHEAD = 300
+
+
+def token_expiry(token):
+    """Return the (iat, exp) claims of a JWT as epoch seconds, None when missing"""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        issued, expires = claims.get("iat"), claims.get("exp")
+    except (AttributeError, IndexError, ValueError):
+        return None, None
+    # Replayed tokens are as fresh as when they were recorded (see cassette.py)
+    shift = time_shift()
+    if shift:
+        issued = issued and issued + shift
+        expires = expires and expires + shift
+    return issued, expires
+
+
+class Account:
+    """Credentials and the current token of one admin or user"""
+
+    __slots__ = ("email", "password", "token", "expires", "refresh_at", "used", "on_refresh", "login_lock")
+
+    def __init__(self, email, password):
+        self.email = email
+        self.password = password
+        self.token = None
+        self.expires = None
+        self.refresh_at = None
+        self.used = False
+        self.on_refresh = None
+        # Held for the duration of a login, so one runs per account at a time
+        self.login_lock = threading.Lock()
+
+    def set_token(self, token):
+        self.token = token
+        issued, expires = token_expiry(token)
+        self.expires = expires
+        if expires is None:
+            self.refresh_at = None
+            return
+        lifetime = expires - issued if issued else 0
+        ahead = max(MIN_REFRESH_AHEAD, lifetime * REFRESH_AHEAD_RATIO)
+        if lifetime:
+            # Short-lived tokens would otherwise be due as soon as they arrive
+            ahead = min(ahead, lifetime / 2)
+        self.refresh_at = expires - ahead
+
+
+class TokenManager:
+    """Keep the tokens of tracked accounts fresh and swap them in atomically"""
+
+    def __init__(self, login_url=LOGIN_ENDPOINT):
+        self.login_url = login_url
+        self._accounts = {}
+        self._by_token = {}
+        self._verified = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._pid = None
+
+    def __len__(self):
+        """Number of tracked accounts"""
+        return len(self._accounts)
+
+    def track(self, email, password, token=None, on_refresh=None):
+        """Manage an account, logging in now if its token is missing or due
+
+        on_refresh(token) is called with every token a later login obtains.
+        Returns the token to use, or None if the account cannot log in.
+        """
+        with self._lock:
+            account = self._accounts.get(email)
+            if account is None:
+                account = self._accounts[email] = Account(email, password)
+            account.password = password
+            if on_refresh is not None:
+                account.on_refresh = on_refresh
+            if token and token != account.token:
+                # A token read from disk may be older than the one we hold
+                expires = token_expiry(token)[1]
+                if account.token is None or expires is None or expires > (account.expires or 0):
+                    account.set_token(token)
+                self._by_token[token] = account
+            self._ensure_thread()
+            self._wakeup.notify()
+        if account.token is None or (account.refresh_at is not None and account.refresh_at <= time.time()):
+            self._refresh(account, account.token)
+        return account.token
+
+    def current(self, token):
+        """Return the latest token of the account that token belongs to
+
+        Tokens the manager does not know are returned unchanged.
+        """
+        account = self._by_token.get(token)
+        if account is None:
+            return token
+        if not account.used:
+            with self._lock:
+                account.used = True
+                self._ensure_thread()
+                self._wakeup.notify()
+        return account.token
+
+    def is_valid(self, token):
+        """Check a token with the server, once for as long as it stays fresh"""
+        if not token:
+            return False
+        if token in self._verified:
+            account = self._by_token.get(token)
+            refresh_at = account.refresh_at if account else token_expiry(token)[1]
+            if refresh_at is None or refresh_at > time.time():
+                return True
+            self._verified.discard(token)
+
+        account = self._by_token.get(token)
+        try:
+            with tracer.span(f"token check {account.email if account else ''}".rstrip(), "token check"):
+                response = get_session().get(
+                    AUTH_VERIFY_ENDPOINT,
+                    headers={"Authorization": f"Bearer {token}"}
+                )
+        except requests.RequestException as e:
+            print(f"Error checking token validity: {str(e)}")
+            return False
+        if response.status_code != 200:
+            return False
+        self._verified.add(token)
+        return True
+
+    def refresh(self, token):
+        """Log in again after token was rejected; return the new token or None"""
+        self._verified.discard(token)
+        account = self._by_token.get(token)
+        if account is None:
+            return None
+        return self._refresh(account, token)
+
+    def _refresh(self, account, stale):
+        # Only one login per stale token, however many workers saw it fail.
+        # The login runs outside the manager lock so other accounts are not
+        # held up by it.
+        with account.login_lock:
+            with self._lock:
+                if account.token is not None and account.token != stale:
+                    return account.token
+            token = self._login(account)
+            if not token:
+                return None
+            with self._lock:
+                account.set_token(token)
+                self._by_token[token] = account
+            if account.on_refresh is not None:
+                account.on_refresh(token)
+            return token
+
+    def _login(self, account):
+        try:
+            with tracer.span(f"login {account.email}", "login"):
+                response = get_session().post(
+                    self.login_url,
+                    headers={"Content-Type": "application/json"},
+                    data=json.dumps({"email": account.email, "password": account.password})
+                )
+        except requests.RequestException as e:
+            print(f"❌ Could not refresh token for {account.email}: {str(e)}")
+            return None
+        if response.status_code == 200:
+            print(f"🔑 Refreshed token for {account.email}")
+            return response.json().get("token")
+        print(f"❌ Could not refresh token for {account.email}: {response.status_code} - {response.text}")
+        return None
+
+    def _ensure_thread(self):
+        # Worker processes inherit the manager but not its thread
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="token-refresh", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """Refresh tokens that are in use shortly before they expire"""
+        while True:
+            with self._lock:
+                due = [account for account in self._accounts.values()
+                       if account.used and account.refresh_at is not None]
+                now = time.time()
+                ready = [account for account in due if account.refresh_at <= now]
+                if not ready:
+                    wait = min((account.refresh_at for account in due), default=now + 3600) - now
+                    self._wakeup.wait(timeout=min(max(wait, 1), 3600))
+                    continue
+            for account in ready:
+                if self._refresh(account, account.token) is None:
+                    # Try again in a minute rather than spinning
+                    with self._lock:
+                        account.refresh_at = time.time() + 60
+
+
+_manager = None
+
+
+def get_token_manager():
+    """Return the process-wide token manager, hooking it into the HTTP sessions"""
+    global _manager
+    if _manager is None:
+        _manager = TokenManager()
+        api_session.set_token_manager(_manager)
+    return _manager
+
+
+def is_token_valid(token):
+    """Check if a JWT token is still valid"""
+    return get_token_manager().is_valid(token)
+
+
+def track_admins(admins_data, admins_file=None):
+    """Track the superadmin and admins of admins.json, refreshing stale tokens
+
+    Fresh tokens are written back into admins_data so the usual validity
+    checks see them, and saved to admins_file when it is given, including
+    the ones the background thread obtains later on.
+    """
+    manager = get_token_manager()
+    save_lock = threading.Lock()
+    # The refresh thread may save after the working directory has changed
+    admins_file = admins_file and os.path.abspath(admins_file)
+
+    def saver(account):
+        def on_refresh(token):
+            with save_lock:
+                account['jwt'] = token
+                if admins_file:
+                    _save_admins(admins_file, admins_data)
+        return on_refresh
+
+    accounts = [admins_data.get('superadmin', {})] + list(admins_data.get('admins', []))
+    for account in accounts:
+        if not account.get('email') or not account.get('password'):
+            continue
+        token = manager.track(account['email'], account['password'], account.get('jwt'),
+                              on_refresh=saver(account))
+        if token:
+            account['jwt'] = token
+
+
+def _save_admins(admins_file, admins_data):
+    try:
+        with open(admins_file + ".tmp", 'w') as f:
+            json.dump(admins_data, f, indent=2)
+        os.replace(admins_file + ".tmp", admins_file)
+    except OSError as e:
+        print(f"❌ Could not save refreshed tokens to {admins_file}: {str(e)}")
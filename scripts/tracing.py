@@ -0,0 +1,180 @@
+import atexit
+import fcntl
+import functools
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from multiprocessing import util
+
+# Span tracing for seeding runs.
+#
+# A span covers one step, one item (a user, event, combo, image, team member,
+# login or token check) or one HTTP call. Spans nest per thread, so an
+# upload's HTTP call sits inside the poster span that made it. Every request
+# carries an X-Correlation-ID header naming its span
+# ("<trace id>-<pid>-<span>"), which ties a slow span to the backend's log
+# lines for the same request.
+#
+# Spans are only kept when PARIDHI_TRACE_FILE is set. Each process then
+# appends its spans to that file as Chrome trace events, one JSON object per
+# line, when it exits. Shard workers and daemon jobs do the same.
+# export_chrome_trace() turns the file into a trace that chrome://tracing and
+# ui.perfetto.dev open. setup-paridhi-portal.py --trace does all of this for a
+# whole run.
+
+TRACE_FILE_ENV = "PARIDHI_TRACE_FILE"
+TRACE_ID_ENV = "PARIDHI_TRACE_ID"
+CORRELATION_HEADER = "X-Correlation-ID"
+
+
+class Span:
+    """An open span; args set while it runs end up in the trace"""
+
+    __slots__ = ("id", "args")
+
+    def __init__(self, span_id, args):
+        self.id = span_id
+        self.args = args
+
+
+class Tracer:
+    """Spans of this process, recorded only while `recording` is set"""
+
+    def __init__(self):
+        self.trace_id = os.environ.get(TRACE_ID_ENV) or uuid.uuid4().hex[:12]
+        self.recording = bool(os.environ.get(TRACE_FILE_ENV))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ids = itertools.count(1)
+        self._events = []
+        self._threads = {}
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def correlation_id(self, span_id):
+        return f"{self.trace_id}-{os.getpid():x}-{span_id:x}"
+
+    @contextmanager
+    def span(self, name, category, **args):
+        """Time the block as a span; yields the Span so its args can be added to"""
+        stack = self._stack()
+        span = Span(self.correlation_id(next(self._ids)), args)
+        parent = stack[-1] if stack else None
+        stack.append(span.id)
+        start_us = time.time_ns() // 1000
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            stack.pop()
+            if self.recording:
+                span.args["id"] = span.id
+                if parent:
+                    span.args["parent"] = parent
+                tid = threading.get_native_id()
+                event = {"name": name, "cat": category, "ph": "X", "ts": start_us,
+                         "dur": round((time.perf_counter() - start) * 1e6), "pid": os.getpid(),
+                         "tid": tid, "args": span.args}
+                with self._lock:
+                    self._events.append(event)
+                    if tid not in self._threads:
+                        self._threads[tid] = threading.current_thread().name
+
+    def take(self):
+        """Return the recorded events, with process and thread names, and start over"""
+        with self._lock:
+            events, self._events = self._events, []
+            threads, self._threads = self._threads, {}
+        if not events:
+            return []
+        pid = os.getpid()
+        names = [{"name": "process_name", "ph": "M", "pid": pid,
+                  "args": {"name": os.path.basename(sys.argv[0]) or "python"}}]
+        names += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                  for tid, name in threads.items()]
+        return names + events
+
+    def save(self, trace_file):
+        """Append the recorded events to trace_file and start over"""
+        events = self.take()
+        if not events or not trace_file:
+            return
+        directory = os.path.dirname(trace_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = "".join(json.dumps(event) + "\n" for event in events)
+        # Shards and concurrent steps append to the same file
+        with open(trace_file, 'a', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(data)
+
+
+tracer = Tracer()
+
+
+def traced(category, label):
+    """Decorator: run the function in a span named after category and label(*args, **kwargs)"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with tracer.span(f"{category} {label(*args, **kwargs)}", category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def read_trace_events(path):
+    events = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except OSError:
+        pass
+    return events
+
+
+def export_chrome_trace(events, path):
+    """Write events as a Chrome trace JSON file"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def slowest_spans(events, category, count=5):
+    """The longest spans of a category, longest first"""
+    spans = [event for event in events if event.get("ph") == "X" and event.get("cat") == category]
+    return sorted(spans, key=lambda event: event["dur"], reverse=True)[:count]
+
+
+def _save_at_exit():
+    try:
+        tracer.save(os.environ.get(TRACE_FILE_ENV))
+    except OSError:
+        pass
+
+
+def _after_fork(tracer):
+    # Worker processes leave through os._exit, which skips atexit handlers
+    # (see latency_stats._after_fork)
+    tracer.take()
+    tracer._local = threading.local()
+    util.Finalize(None, _save_at_exit, exitpriority=10)
+
+
+atexit.register(_save_at_exit)
+util.register_after_fork(tracer, _after_fork)
@@ -1,90 +1,57 @@
-import requests
 import json
 import os
 import random
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
-# API configuration
-BASE_URL = "http://localhost:8080"
-COMBOS_ENDPOINT = f"{BASE_URL}/api/combos"
-AUTH_VERIFY_ENDPOINT = f"{BASE_URL}/api/auth/check-token"
+from daemon_client import run_in_daemon
+from entities import find_domain_poster, upload_combo_poster
+from file_watch import IMAGE_EXTENSIONS, ready_files
+from listing_cache import COMBOS_ENDPOINT as COMBOS_LISTING, get_all_combos, invalidate
+from retry_queue import RetryQueue
+from token_manager import is_token_valid, track_admins
 
-def is_token_valid(token):
-    """Check if a JWT token is still valid"""
-    if not token:
-        return False
-        
-    try:
-        response = requests.get(
-            AUTH_VERIFY_ENDPOINT,
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        return response.status_code == 200
-    except Exception as e:
-        print(f"Error checking token validity: {str(e)}")
-        return False
-
-def get_all_combos(token):
-    """Get all combos from the API"""
-    print("Fetching all combos...")
-    
-    response = requests.get(
-        COMBOS_ENDPOINT,
-        headers={"Authorization": f"Bearer {token}"}
-    )
-    
-    if response.status_code == 200:
-        combos = response.json()
-        print(f"✅ Successfully retrieved {len(combos)} combos")
-        return combos
-    else:
-        print(f"❌ Failed to retrieve combos: {response.status_code} - {response.text}")
-        return None
-
-def upload_combo_poster(token, combo_id, image_path):
-    """Upload a poster image for a combo"""
-    upload_endpoint = f"{COMBOS_ENDPOINT}/{combo_id}/upload"
-    
-    try:
-        with open(image_path, 'rb') as image_file:
-            files = {'file': (os.path.basename(image_path), image_file, 'image/jpeg')}
-            
-            response = requests.put(
-                upload_endpoint,
-                headers={"Authorization": f"Bearer {token}"},
-                files=files
-            )
-            
-            if response.status_code == 200:
-                print(f"✅ Successfully uploaded poster for combo ID {combo_id}")
-                return True
-            else:
-                print(f"❌ Failed to upload poster for combo ID {combo_id}: {response.status_code} - {response.text}")
-                return False
-    except Exception as e:
-        print(f"❌ Error uploading poster for combo ID {combo_id}: {str(e)}")
-        return False
-
-def find_domain_poster(posters_dir, domain):
-    """Find a poster for a domain"""
-    # Try different file extensions
-    extensions = ['.jpeg', '.jpg', '.png', '.gif']
-    
-    for ext in extensions:
-        domain_poster = os.path.join(posters_dir, f"{domain}{ext}")
-        if os.path.exists(domain_poster):
-            return domain_poster
-    
-    return None
+def watch_combo_posters(token, posters_dir, workers):
+    """Upload posters for combos whose domain poster is new or changed, until interrupted"""
+    # Each worker retries its own upload, failures for good are dead-lettered
+    queue = RetryQueue()
+    
+    def upload(combo_id, poster_path):
+        return lambda: upload_combo_poster(token, combo_id, poster_path)
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for batch in ready_files(posters_dir, IMAGE_EXTENSIONS, recursive=False):
+                changed = set(batch)
+                
+                # Pick up combos created since the last batch (cheap when unchanged)
+                invalidate(COMBOS_LISTING)
+                combos = get_all_combos(token) or []
+                
+                for combo in combos:
+                    domain = combo.get('domain', 'Unknown')
+                    domain_poster = find_domain_poster(posters_dir, domain)
+                    if domain_poster in changed:
+                        print(f"  {os.path.basename(domain_poster)} changed, uploading for {combo.get('name', 'Unknown')}")
+                        pool.submit(queue.run, f"poster for combo {combo.get('name', 'Unknown')}",
+                                    upload(combo.get('id'), domain_poster),
+                                    item={"kind": "combo_poster", "combo_id": combo.get('id'), "poster": domain_poster})
+        except KeyboardInterrupt:
+            print("\nStopping watch, waiting for uploads in progress...")
+    queue.print_summary()
 
 def main():
     parser = argparse.ArgumentParser(description="Upload combo posters")
     parser.add_argument('--posters-dir', default="event-posters", help="Directory containing poster images")
     parser.add_argument('--admins-file', default="json/admins.json", help="Path to admins JSON file")
+    parser.add_argument('--dry-run', action='store_true', help="Match posters without uploading them")
+    parser.add_argument('--watch', action='store_true', help="After uploading, keep running and upload new or changed posters")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent uploads in watch mode (default: 4)")
     args = parser.parse_args()
     
     posters_dir = args.posters_dir
     admins_file = args.admins_file
+    dry_run = args.dry_run
     
     # Check if posters directory exists
     if not os.path.exists(posters_dir):
@@ -105,6 +72,11 @@ def main():
         print(f"Error loading admins file: {str(e)}")
         return
     
+    # Log in again for admins whose tokens are missing or about to expire; a dry run
+    # keeps the stored tokens and leaves admins.json alone
+    if not dry_run:
+        track_admins(admins_data, admins_file)
+    
     # Get valid admin tokens
     admin_tokens = []
     
@@ -137,49 +109,72 @@ def main():
     admin = random.choice(admin_tokens)
     print(f"Using admin: {admin['name']} ({admin['email']})")
     
+    if dry_run:
+        print("DRY RUN MODE: No changes will be made")
+    
     # Get all combos from the API
     combos = get_all_combos(admin['token'])
     if not combos:
         return
     
     # Display available domain poster files
-    poster_files = [f for f in os.listdir(posters_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))]
+    poster_files = [f for f in os.listdir(posters_dir) if f.lower().endswith(IMAGE_EXTENSIONS)]
     print(f"\nFound {len(poster_files)} poster files in {posters_dir}:")
     for i, poster in enumerate(sorted(poster_files)):
         print(f"  {i+1}. {poster}")
     
     # Process each combo
     print(f"\nProcessing {len(combos)} combos...")
-    success_count = 0
+    counts = {"success": 0, "failed": 0}
     no_poster_count = 0
     
-    for index, combo in enumerate(combos, 1):
-        combo_id = combo.get('id')
-        combo_name = combo.get('name', 'Unknown')
-        domain = combo.get('domain', 'Unknown')
-        
-        print(f"\n[{index}/{len(combos)}] Processing: {domain} - {combo_name} (ID: {combo_id})")
-        
-        # Find domain poster
-        domain_poster = find_domain_poster(posters_dir, domain)
-        
-        if domain_poster:
-            print(f"  Using domain poster: {os.path.basename(domain_poster)}")
+    def upload(combo_id, domain_poster):
+        def task():
+            counts["success" if upload_combo_poster(admin['token'], combo_id, domain_poster) else "failed"] += 1
+        return task
+    
+    def give_up(error):
+        counts["failed"] += 1
+    
+    # Uploads that hit a transient error are retried after the others
+    with RetryQueue() as queue:
+        for index, combo in enumerate(combos, 1):
+            combo_id = combo.get('id')
+            combo_name = combo.get('name', 'Unknown')
+            domain = combo.get('domain', 'Unknown')
             
-            # Upload the poster
-            if upload_combo_poster(admin['token'], combo_id, domain_poster):
-                success_count += 1
-        else:
-            print(f"  ⚠️ No domain poster found for '{domain}'")
-            print(f"  Suggested filename: {domain}.jpeg")
-            no_poster_count += 1
+            print(f"\n[{index}/{len(combos)}] Processing: {domain} - {combo_name} (ID: {combo_id})")
+            
+            # Find domain poster
+            domain_poster = find_domain_poster(posters_dir, domain)
+            
+            if domain_poster:
+                print(f"  Using domain poster: {os.path.basename(domain_poster)}")
+                
+                # Upload the poster
+                if dry_run:
+                    continue
+                queue.submit(f"poster for combo {combo_name}", upload(combo_id, domain_poster), give_up,
+                             item={"kind": "combo_poster", "combo_id": combo_id, "poster": domain_poster})
+            else:
+                print(f"  ⚠️ No domain poster found for '{domain}'")
+                print(f"  Suggested filename: {domain}.jpeg")
+                no_poster_count += 1
     
     # Print summary
     print("\n=== Combo Poster Upload Summary ===")
     print(f"Total combos processed: {len(combos)}")
-    print(f"Successfully uploaded posters: {success_count}")
     print(f"Combos with no poster available: {no_poster_count}")
-    print(f"Failed uploads: {len(combos) - success_count - no_poster_count}")
+    if not dry_run:
+        print(f"Successfully uploaded posters: {counts['success']}")
+        print(f"Failed uploads: {counts['failed']}")
+        queue.print_summary()
+    else:
+        print("Dry run completed, no changes were made.")
+    
+    if args.watch and not dry_run:
+        watch_combo_posters(admin['token'], posters_dir, max(1, args.workers))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if not run_in_daemon():
+        main()
\ No newline at end of file
@@ -1,123 +1,72 @@
-import requests
 import json
 import time
 import os
 import random
 import argparse
-import re
+from concurrent.futures import ThreadPoolExecutor
 
-# API configuration
-BASE_URL = "http://localhost:8080"
-EVENTS_ENDPOINT = f"{BASE_URL}/api/events"
-AUTH_VERIFY_ENDPOINT = f"{BASE_URL}/api/auth/check-token"
+from daemon_client import run_in_daemon
+from entities import find_event_poster, upload_poster
+from file_watch import IMAGE_EXTENSIONS, ready_files
+from listing_cache import EVENTS_ENDPOINT as EVENTS_LISTING, get_all_events, invalidate
+from retry_queue import RetryQueue
+from token_manager import is_token_valid, track_admins
 
-def is_token_valid(token):
-    """Check if a JWT token is still valid"""
-    if not token:
-        return False
-        
-    try:
-        response = requests.get(
-            AUTH_VERIFY_ENDPOINT,
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        return response.status_code == 200
-    except Exception as e:
-        print(f"Error checking token validity: {str(e)}")
-        return False
-
-def get_all_events(token):
-    """Get all events from the API"""
-    print("Fetching all events...")
-    
-    response = requests.get(
-        EVENTS_ENDPOINT,
-        headers={"Authorization": f"Bearer {token}"}
-    )
-    
-    if response.status_code == 200:
-        events = response.json()
-        print(f"✅ Successfully retrieved {len(events)} events")
-        return events
-    else:
-        print(f"❌ Failed to retrieve events: {response.status_code} - {response.text}")
-        return None
-
-def upload_poster(token, event_id, image_path):
-    """Upload a poster image for an event"""
-    upload_endpoint = f"{EVENTS_ENDPOINT}/{event_id}/upload"
-    
-    try:
-        with open(image_path, 'rb') as image_file:
-            files = {'file': (os.path.basename(image_path), image_file, 'image/jpeg')}
-            
-            response = requests.put(
-                upload_endpoint,
-                headers={"Authorization": f"Bearer {token}"},
-                files=files
-            )
-            
-            if response.status_code == 200:
-                print(f"✅ Successfully uploaded poster for event ID {event_id}")
-                return True
-            else:
-                print(f"❌ Failed to upload poster for event ID {event_id}: {response.status_code} - {response.text}")
-                return False
-    except Exception as e:
-        print(f"❌ Error uploading poster for event ID {event_id}: {str(e)}")
-        return False
-
-def normalize_name(name):
-    """Normalize event name for filename matching"""
-    # Remove special characters and spaces, convert to lowercase
-    return re.sub(r'[^a-zA-Z0-9]', '', name).lower()
-
-def find_event_poster(posters_dir, domain, event_name):
-    """Find a poster for an event with fallback to domain poster"""
-    # Normalize event name for matching
-    normalized_event_name = normalize_name(event_name)
-    
-    # Try different file extensions
-    extensions = ['.jpeg', '.jpg', '.png', '.gif']
-    
-    # 1. First, check for exact domain_eventName match (case-insensitive)
-    for ext in extensions:
-        # Check exact format: DOMAIN_EventName.ext
-        specific_poster = os.path.join(posters_dir, f"{domain}_{event_name.replace(' ', '')}{ext}")
-        if os.path.exists(specific_poster):
-            return specific_poster, "event"
-        
-        # Try with underscores: DOMAIN_Event_Name.ext
-        specific_poster = os.path.join(posters_dir, f"{domain}_{event_name.replace(' ', '_')}{ext}")
-        if os.path.exists(specific_poster):
-            return specific_poster, "event"
-    
-    # 2. Search for any file that contains domain + event name
-    for filename in os.listdir(posters_dir):
-        if os.path.isfile(os.path.join(posters_dir, filename)):
-            filename_normalized = normalize_name(os.path.splitext(filename)[0])
-            if domain.lower() in filename_normalized and normalized_event_name in filename_normalized:
-                return os.path.join(posters_dir, filename), "event"
-    
-    # 3. Fall back to domain-level poster
-    for ext in extensions:
-        domain_poster = os.path.join(posters_dir, f"{domain}{ext}")
-        if os.path.exists(domain_poster):
-            return domain_poster, "domain"
-    
-    # 4. No matching poster found
-    return None, None
+def watch_posters(token, posters_dir, local_events_map, workers):
+    """Upload posters for events whose poster file is new or changed, until interrupted"""
+    # Poster matches depend only on file names, so they are kept until a file
+    # is added, removed or renamed (which changes the directory's mtime)
+    matches = {}
+    scanned_mtime = None
+    # Each worker retries its own upload, failures for good are dead-lettered
+    queue = RetryQueue()
+    
+    def upload(event_id, poster_path):
+        return lambda: upload_poster(token, event_id, poster_path)
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for batch in ready_files(posters_dir, IMAGE_EXTENSIONS, recursive=False):
+                changed = set(batch)
+                
+                # Pick up events created since the last batch (cheap when unchanged)
+                invalidate(EVENTS_LISTING)
+                events = get_all_events(token) or []
+                
+                mtime = os.stat(posters_dir).st_mtime_ns
+                if mtime != scanned_mtime:
+                    matches.clear()
+                    scanned_mtime = mtime
+                
+                for event in events:
+                    event_name = event.get('name', 'Unknown')
+                    domain = local_events_map.get(event_name, {}).get('domain', 'UNKNOWN')
+                    key = (event.get('id'), event_name)
+                    if key not in matches:
+                        matches[key], _ = find_event_poster(posters_dir, domain, event_name)
+                    poster_path = matches[key]
+                    if poster_path in changed:
+                        print(f"  {os.path.basename(poster_path)} changed, uploading for {domain} - {event_name}")
+                        pool.submit(queue.run, f"poster for event {event_name}", upload(event.get('id'), poster_path),
+                                    item={"kind": "event_poster", "event_id": event.get('id'), "poster": poster_path})
+        except KeyboardInterrupt:
+            print("\nStopping watch, waiting for uploads in progress...")
+    queue.print_summary()
 
 def main():
     parser = argparse.ArgumentParser(description="Upload event posters")
     parser.add_argument('--posters-dir', default="event-posters", help="Directory containing poster images")
     parser.add_argument('--admins-file', default="json/admins.json", help="Path to admins JSON file")
     parser.add_argument('--events-file', default="json/events.json", help="Path to events JSON file (optional)")
+    parser.add_argument('--dry-run', action='store_true', help="Match posters without uploading them")
+    parser.add_argument('--watch', action='store_true', help="After uploading, keep running and upload new or changed posters")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent uploads in watch mode (default: 4)")
     args = parser.parse_args()
     
     posters_dir = args.posters_dir
     admins_file = args.admins_file
     events_file = args.events_file
+    dry_run = args.dry_run
     
     # Check if posters directory exists
     if not os.path.exists(posters_dir):
@@ -138,6 +87,11 @@ def main():
         print(f"Error loading admins file: {str(e)}")
         return
     
+    # Log in again for admins whose tokens are missing or about to expire; a dry run
+    # keeps the stored tokens and leaves admins.json alone
+    if not dry_run:
+        track_admins(admins_data, admins_file)
+    
     # Get valid admin tokens
     admin_tokens = []
     
@@ -170,6 +124,9 @@ def main():
     admin = random.choice(admin_tokens)
     print(f"Using admin: {admin['name']} ({admin['email']})")
     
+    if dry_run:
+        print("DRY RUN MODE: No changes will be made")
+    
     # Get all events from the API
     events = get_all_events(admin['token'])
     if not events:
@@ -195,41 +152,54 @@ def main():
     event_success = 0
     domain_fallback = 0
     no_poster = 0
+    counts = {"uploaded": 0, "failed": 0}
+    
+    def upload(event_id, poster_path):
+        def task():
+            counts["uploaded" if upload_poster(admin['token'], event_id, poster_path) else "failed"] += 1
+        return task
+    
+    def give_up(error):
+        counts["failed"] += 1
     
     # Display available poster files
-    poster_files = [f for f in os.listdir(posters_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.gif'))]
+    poster_files = [f for f in os.listdir(posters_dir) if f.lower().endswith(IMAGE_EXTENSIONS)]
     print(f"\nFound {len(poster_files)} poster files in {posters_dir}:")
     for i, poster in enumerate(sorted(poster_files)):
         print(f"  {i+1}. {poster}")
     
-    for index, event in enumerate(events, 1):
-        event_id = event.get('id')
-        event_name = event.get('name', 'Unknown')
-        
-        # Get domain from local file if available, otherwise use placeholder
-        domain = "UNKNOWN"
-        if event_name in local_events_map:
-            domain = local_events_map[event_name].get('domain', 'UNKNOWN')
-        
-        print(f"\n[{index}/{len(events)}] Processing: {domain} - {event_name} (ID: {event_id})")
-        
-        # Find appropriate poster with fallback logic
-        poster_path, poster_type = find_event_poster(posters_dir, domain, event_name)
-        
-        if poster_path and poster_type == "event":
-            print(f"  Found event-specific poster: {os.path.basename(poster_path)}")
-            event_success += 1
-        elif poster_path and poster_type == "domain":
-            print(f"  Using domain fallback poster: {os.path.basename(poster_path)}")
-            domain_fallback += 1
-        else:
-            print(f"  ⚠️ No matching poster found for '{domain} - {event_name}'")
-            print(f"  Suggested filename: {domain}_{event_name.replace(' ', '')}.jpeg")
-            no_poster += 1
-            continue
-        
-        # Upload the chosen poster
-        upload_poster(admin['token'], event_id, poster_path)
+    # Uploads that hit a transient error are retried after the others
+    with RetryQueue() as queue:
+        for index, event in enumerate(events, 1):
+            event_id = event.get('id')
+            event_name = event.get('name', 'Unknown')
+            
+            # Get domain from local file if available, otherwise use placeholder
+            domain = "UNKNOWN"
+            if event_name in local_events_map:
+                domain = local_events_map[event_name].get('domain', 'UNKNOWN')
+            
+            print(f"\n[{index}/{len(events)}] Processing: {domain} - {event_name} (ID: {event_id})")
+            
+            # Find appropriate poster with fallback logic
+            poster_path, poster_type = find_event_poster(posters_dir, domain, event_name)
+            
+            if poster_path and poster_type == "event":
+                print(f"  Found event-specific poster: {os.path.basename(poster_path)}")
+                event_success += 1
+            elif poster_path and poster_type == "domain":
+                print(f"  Using domain fallback poster: {os.path.basename(poster_path)}")
+                domain_fallback += 1
+            else:
+                print(f"  ⚠️ No matching poster found for '{domain} - {event_name}'")
+                print(f"  Suggested filename: {domain}_{event_name.replace(' ', '')}.jpeg")
+                no_poster += 1
+                continue
+            
+            # Upload the chosen poster
+            if not dry_run:
+                queue.submit(f"poster for event {event_name}", upload(event_id, poster_path), give_up,
+                             item={"kind": "event_poster", "event_id": event_id, "poster": poster_path})
     
     # Print summary
     print("\n=== Poster Upload Summary ===")
@@ -237,6 +207,15 @@ def main():
     print(f"Event-specific posters used: {event_success}")
     print(f"Domain fallback posters used: {domain_fallback}")
     print(f"Events with no poster available: {no_poster}")
+    if not dry_run:
+        print(f"Successfully uploaded posters: {counts['uploaded']}")
+        print(f"Failed uploads: {counts['failed']}")
+    queue.print_summary()
+    if dry_run:
+        print("Dry run completed, no changes were made.")
+    elif args.watch:
+        watch_posters(admin['token'], posters_dir, local_events_map, max(1, args.workers))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if not run_in_daemon():
+        main()
\ No newline at end of file
@@ -1,57 +1,20 @@
-import requests
 import json
 import os
 import random
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-# API configuration
-BASE_URL = "http://localhost:8080"
-GALLERIES_ENDPOINT = f"{BASE_URL}/api/galleries"
-AUTH_VERIFY_ENDPOINT = f"{BASE_URL}/api/auth/check-token"
+from daemon_client import run_in_daemon
+from entities import upload_gallery_image
+from file_watch import GALLERY_MANIFEST, IMAGE_EXTENSIONS, UploadManifest, file_signature, ready_files
+from image_dedup import DEFAULT_THRESHOLD, HashCache, NearDuplicateIndex, filter_near_duplicates
+from retry_queue import RetryQueue
+from token_manager import is_token_valid, track_admins
 
-def is_token_valid(token):
-    """Check if a JWT token is still valid"""
-    if not token:
-        return False
-        
-    try:
-        response = requests.get(
-            AUTH_VERIFY_ENDPOINT,
-            headers={"Authorization": f"Bearer {token}"}
-        )
-        return response.status_code == 200
-    except Exception as e:
-        print(f"Error checking token validity: {str(e)}")
-        return False
-
-def upload_gallery_image(token, image_path):
-    """Upload an image to the gallery"""
-    # Generate a random Paridhi year between 2020-2024
-    paridhi_year = random.randint(2020, 2024)
-    
-    print(f"Uploading {os.path.basename(image_path)} (Paridhi {paridhi_year})...")
-    
-    try:
-        with open(image_path, 'rb') as image_file:
-            files = {'image': (os.path.basename(image_path), image_file, 'image/jpeg')}
-            data = {'paridhiYear': str(paridhi_year)}
-            
-            response = requests.post(
-                GALLERIES_ENDPOINT,
-                headers={"Authorization": f"Bearer {token}"},
-                files=files,
-                data=data
-            )
-            
-            if response.status_code == 201:
-                print(f"✅ Successfully uploaded {os.path.basename(image_path)} to gallery")
-                return True
-            else:
-                print(f"❌ Failed to upload to gallery: {response.status_code} - {response.text}")
-                return False
-    except Exception as e:
-        print(f"❌ Error uploading to gallery: {str(e)}")
-        return False
+def random_paridhi_year():
+    """Pick a random Paridhi year between 2020-2024 for an image"""
+    return random.randint(2020, 2024)
 
 def collect_all_images(posters_dir):
     """Collect all image files from directory and subdirectories"""
@@ -59,21 +22,95 @@ def collect_all_images(posters_dir):
     
     for root, _, files in os.walk(posters_dir):
         for file in files:
-            if file.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
+            if file.lower().endswith(IMAGE_EXTENSIONS):
                 image_files.append(os.path.join(root, file))
     
     return image_files
 
+def skip_near_duplicates(image_paths, threshold, cache=None, index=None):
+    """Drop near-duplicate images, keeping one representative per cluster"""
+    keep, duplicates = filter_near_duplicates(image_paths, threshold, cache=cache, index=index)
+    if duplicates:
+        print(f"Skipping {len(duplicates)} near-duplicate images:")
+        for duplicate, representative in sorted(duplicates.items()):
+            print(f"  {os.path.basename(duplicate)} (similar to {os.path.basename(representative)})")
+    return keep
+
+def watch_gallery(token, images_dir, manifest, workers, dedupe_threshold=None):
+    """Upload new or changed images as they appear until interrupted"""
+    # Cap queued uploads so a large drop of photos doesn't pile up in memory
+    slots = threading.BoundedSemaphore(workers * 2)
+    lock = threading.Lock()
+    counts = {"uploaded": 0, "failed": 0}
+    # Each worker retries its own upload, failures for good are dead-lettered
+    queue = RetryQueue()
+    
+    def upload(image_path):
+        year = random_paridhi_year()
+        uploaded = []
+        
+        def task():
+            signature = file_signature(image_path)
+            if upload_gallery_image(token, image_path, year):
+                manifest.mark_uploaded(image_path, signature)
+                uploaded.append(True)
+        
+        try:
+            queue.run(f"gallery image {os.path.basename(image_path)}", task,
+                      item={"kind": "gallery_image", "image": os.path.abspath(image_path), "year": year})
+        except OSError as e:
+            print(f"❌ Error reading {image_path}: {str(e)}")
+        finally:
+            slots.release()
+        with lock:
+            counts["uploaded" if uploaded else "failed"] += 1
+    
+    # Start with anything that was added while nobody was watching
+    all_images = collect_all_images(images_dir)
+    if dedupe_threshold is not None:
+        cache = HashCache()
+        index = NearDuplicateIndex(dedupe_threshold)
+        all_images = skip_near_duplicates(all_images, dedupe_threshold, cache, index)
+    backlog = [path for path in all_images if not manifest.is_uploaded(path)]
+    print(f"Found {len(backlog)} images not yet uploaded")
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def submit(image_path):
+            slots.acquire()
+            pool.submit(upload, image_path)
+        
+        try:
+            for image_path in backlog:
+                submit(image_path)
+            for batch in ready_files(images_dir, IMAGE_EXTENSIONS):
+                if dedupe_threshold is not None:
+                    batch = skip_near_duplicates(batch, dedupe_threshold, cache, index)
+                for image_path in batch:
+                    if not manifest.is_uploaded(image_path):
+                        submit(image_path)
+        except KeyboardInterrupt:
+            print("\nStopping watch, waiting for uploads in progress...")
+    
+    queue.print_summary()
+    return counts
+
 def main():
     parser = argparse.ArgumentParser(description="Upload images to gallery")
     parser.add_argument('--images-dir', default="event-posters", help="Directory containing images")
     parser.add_argument('--admins-file', default="json/admins.json", help="Path to admins JSON file")
     parser.add_argument('--max-images', type=int, default=None, help="Maximum number of images to upload (default: all)")
+    parser.add_argument('--dry-run', action='store_true', help="List images without uploading them")
+    parser.add_argument('--watch', action='store_true', help="Keep running and upload new or changed images as they appear")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent uploads in watch mode (default: 4)")
+    parser.add_argument('--dedupe-threshold', type=int, default=DEFAULT_THRESHOLD, help=f"Max perceptual hash distance for near-duplicates (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument('--no-dedupe', action='store_true', help="Upload near-duplicate images too")
     args = parser.parse_args()
     
     posters_dir = args.images_dir
     admins_file = args.admins_file
     max_images = args.max_images
+    dry_run = args.dry_run
+    dedupe_threshold = None if args.no_dedupe else args.dedupe_threshold
     
     # Check if posters directory exists
     if not os.path.exists(posters_dir):
@@ -93,6 +130,11 @@ def main():
         print(f"Error loading admins file: {str(e)}")
         return
     
+    # Log in again for admins whose tokens are missing or about to expire; a dry run
+    # keeps the stored tokens and leaves admins.json alone
+    if not dry_run:
+        track_admins(admins_data, admins_file)
+    
     # Get valid admin tokens
     admin_tokens = []
     
@@ -125,8 +167,19 @@ def main():
     admin = random.choice(admin_tokens)
     print(f"Using admin: {admin['name']} ({admin['email']})")
     
+    manifest = UploadManifest(GALLERY_MANIFEST)
+    
+    if args.watch and not dry_run:
+        counts = watch_gallery(admin['token'], posters_dir, manifest, max(1, args.workers), dedupe_threshold)
+        print("\n=== Gallery Watch Summary ===")
+        print(f"Successfully uploaded to gallery: {counts['uploaded']}")
+        print(f"Failed uploads: {counts['failed']}")
+        return
+    
     # Collect all images from the directory
     all_images = collect_all_images(posters_dir)
+    if dedupe_threshold is not None:
+        all_images = skip_near_duplicates(all_images, dedupe_threshold)
     random.shuffle(all_images)  # Randomize images for variety
     
     if max_images and max_images < len(all_images):
@@ -139,21 +192,43 @@ def main():
     for i, image in enumerate(images_to_upload, 1):
         print(f"  {i}. {os.path.basename(image)}")
     
+    if dry_run:
+        print("\nDRY RUN MODE: No changes will be made")
+        print("Dry run completed, no changes were made.")
+        return
+    
     # Upload images to gallery
     print(f"\nUploading {len(images_to_upload)} images to gallery...")
-    success_count = 0
+    counts = {"success": 0, "failed": 0}
+    
+    def upload(image_path, year):
+        def task():
+            signature = file_signature(image_path)
+            if upload_gallery_image(admin['token'], image_path, year):
+                manifest.mark_uploaded(image_path, signature)
+                counts["success"] += 1
+            else:
+                counts["failed"] += 1
+        return task
     
-    for index, image_path in enumerate(images_to_upload, 1):
-        print(f"\n[{index}/{len(images_to_upload)}] Processing: {os.path.basename(image_path)}")
-        
-        if upload_gallery_image(admin['token'], image_path):
-            success_count += 1
+    def give_up(error):
+        counts["failed"] += 1
+    
+    # Uploads that hit a transient error are retried after the others
+    with RetryQueue() as queue:
+        for index, image_path in enumerate(images_to_upload, 1):
+            print(f"\n[{index}/{len(images_to_upload)}] Processing: {os.path.basename(image_path)}")
+            year = random_paridhi_year()
+            queue.submit(f"gallery image {os.path.basename(image_path)}", upload(image_path, year), give_up,
+                         item={"kind": "gallery_image", "image": os.path.abspath(image_path), "year": year})
     
     # Print summary
     print("\n=== Gallery Upload Summary ===")
     print(f"Total images processed: {len(images_to_upload)}")
-    print(f"Successfully uploaded to gallery: {success_count}")
-    print(f"Failed uploads: {len(images_to_upload) - success_count}")
+    print(f"Successfully uploaded to gallery: {counts['success']}")
+    print(f"Failed uploads: {counts['failed']}")
+    queue.print_summary()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if not run_in_daemon():
+        main()
\ No newline at end of file
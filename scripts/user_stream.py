@@ -0,0 +1,343 @@
+import glob
+import heapq
+import json
+import os
+
+# Streaming access to users.json.
+#
+# users-data-import.py and mrd-registration.py process the "users" array one
+# record at a time. Records are parsed lazily from the file and updated
+# records are appended to a journal next to it; once the run is over the
+# journal is folded back into users.json with a second streaming pass. Peak
+# memory stays at roughly one chunk plus one record, however large the file.
+
+CHUNK_SIZE = 64 * 1024
+JOURNAL_SUFFIX = ".journal"
+LATE_SUFFIX = ".late"
+
+_decoder = json.JSONDecoder()
+
+
+class UserStream:
+    """Yield the records of the 'users' array in a JSON file one at a time
+
+    Fields before the array are kept in 'header'; once the records are
+    exhausted, trailer() reads the fields after it.
+    """
+
+    def __init__(self, path, key="users", chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.key = key
+        self.chunk_size = chunk_size
+        self._file = None
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.header = {}
+
+    def __enter__(self):
+        self._file = open(self.path, 'r', encoding='utf-8')
+        try:
+            self._seek_to_array()
+        except Exception:
+            self.close()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __iter__(self):
+        self._skip_ws()
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._decode_value()
+            self._skip_ws()
+            char = self._peek()
+            self._pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                self._error(f"Expected ',' or ']' in '{self.key}' array")
+
+    def trailer(self):
+        """Fields after the array, to be called once every record has been read"""
+        fields = {}
+        self._skip_ws()
+        while self._peek() == ",":
+            self._pos += 1
+            key = self._decode_value()
+            self._expect(":")
+            fields[key] = self._decode_value()
+            self._skip_ws()
+        self._expect("}")
+        return fields
+
+    def _fill(self):
+        """Read the next chunk into the buffer, return False at end of file"""
+        if self._eof:
+            return False
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # Drop what has already been consumed so the buffer stays small
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        while self._pos >= len(self._buf):
+            if not self._fill():
+                self._error("Unexpected end of file")
+        return self._buf[self._pos]
+
+    def _skip_ws(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf) or not self._fill():
+                return
+
+    def _expect(self, char):
+        self._skip_ws()
+        if self._peek() != char:
+            self._error(f"Expected '{char}'")
+        self._pos += 1
+
+    def _decode_value(self):
+        """Decode one JSON value, reading more of the file until it is complete"""
+        self._skip_ws()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number cut off at the chunk boundary still decodes, so make sure
+            # the value is terminated before trusting it
+            if end == len(self._buf) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _seek_to_array(self):
+        """Position the stream just after the '[' of the users array"""
+        self._expect("{")
+        self._skip_ws()
+        if self._peek() == "}":
+            raise ValueError(f"JSON file must contain '{self.key}' section")
+        while True:
+            key = self._decode_value()
+            self._expect(":")
+            if key == self.key:
+                self._expect("[")
+                return
+            self.header[key] = self._decode_value()
+            self._skip_ws()
+            char = self._peek()
+            self._pos += 1
+            if char == "}":
+                raise ValueError(f"JSON file must contain '{self.key}' section")
+            if char != ",":
+                self._error("Expected ',' or '}'")
+
+    def _error(self, message):
+        raise json.JSONDecodeError(message, self._buf, self._pos)
+
+
+class JsonArrayWriter:
+    """Write a JSON array item by item, formatted like json.dump(..., indent=2)
+
+    With a key the array is wrapped in an object, e.g. {"users": [...]}, and
+    any header fields are written before it and trailer fields after it.
+    With compact=True each item is kept on a single line. Output goes to a
+    temporary file that replaces the target on close().
+    """
+
+    def __init__(self, path, key=None, header=None, compact=False):
+        self.path = path
+        self.key = key
+        self.compact = compact
+        self.count = 0
+        self.trailer = {}
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+        self._indent = "    " if key else "  "
+        if key:
+            self._file.write("{")
+            for name, value in (header or {}).items():
+                self._file.write(f"\n  {self._field(name, value)},")
+            self._file.write(f"\n  {json.dumps(key)}: [")
+        else:
+            self._file.write("[")
+
+    def _field(self, name, value):
+        if self.compact:
+            return f"{json.dumps(name)}: {json.dumps(value)}"
+        return f"{json.dumps(name)}: " + json.dumps(value, indent=2).replace("\n", "\n  ")
+
+    def write(self, item):
+        if self.compact:
+            text = json.dumps(item)
+        else:
+            text = json.dumps(item, indent=2).replace("\n", "\n" + self._indent)
+        self._file.write(("," if self.count else "") + "\n" + self._indent + text)
+        self.count += 1
+
+    def close(self):
+        closing = f"\n{self._indent[:-2]}]" if self.count else "]"
+        if self.key:
+            closing += "".join(f",\n  {self._field(name, value)}" for name, value in self.trailer.items())
+            closing += "\n}"
+        self._file.write(closing)
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def journal_path(users_path, shard=None):
+    """Path of the side file that collects updated user records"""
+    path = users_path + JOURNAL_SUFFIX
+    return path if shard is None else f"{path}.shard{shard}"
+
+
+def journal_files(users_path):
+    """All journals waiting to be applied, including per-shard and late ones
+
+    Sorting puts each late journal right after the journal it belongs to, so
+    its updates win over earlier ones for the same record.
+    """
+    path = journal_path(users_path)
+    files = glob.glob(glob.escape(path) + ".*")
+    if os.path.exists(path):
+        files.append(path)
+    return sorted(files)
+
+
+def merge_journals(paths):
+    """Merge several journals into one index-sorted stream
+
+    Regular journals are already sorted and are streamed; late journals only
+    hold the few records that were retried, and are sorted in memory.
+    """
+    streams = []
+    for path in paths:
+        if path.endswith(LATE_SUFFIX):
+            streams.append(sorted(read_journal(path), key=lambda entry: entry[0]))
+        else:
+            streams.append(read_journal(path))
+    return heapq.merge(*streams, key=lambda entry: entry[0])
+
+
+class UserJournal:
+    """Append-only log of updated user records, keyed by their array position
+
+    Records are normally written in increasing index order so that
+    apply_journal can merge the log with users.json in a single streaming
+    pass. A record written out of order (a retry that finished after later
+    users) goes to a separate late journal that is sorted when applied.
+    """
+
+    def __init__(self, users_path, path=None):
+        self.path = path or journal_path(users_path)
+        self.count = 0
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._late = None
+        self._last = -1
+
+    def write(self, index, user):
+        line = json.dumps({"index": index, "user": user}) + "\n"
+        if index >= self._last:
+            self._last = index
+            f = self._file
+        else:
+            if self._late is None:
+                self._late = open(self.path + LATE_SUFFIX, 'a', encoding='utf-8')
+            f = self._late
+        f.write(line)
+        f.flush()
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+        if self._late is not None:
+            self._late.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def read_journal(path):
+    """Yield (index, user) pairs from a journal file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn last line from an interrupted run carries no update
+                continue
+            yield entry["index"], entry["user"]
+
+
+def merge_updates(users, updates):
+    """Replace records in the users iterable with (index, user) updates
+
+    Both inputs are consumed lazily; updates must be sorted by index. When an
+    index appears more than once the last update wins.
+    """
+    updates = iter(updates)
+    pending = next(updates, None)
+    for index, user in enumerate(users):
+        while pending is not None and pending[0] < index:
+            pending = next(updates, None)
+        while pending is not None and pending[0] == index:
+            user = pending[1]
+            pending = next(updates, None)
+        yield user
+
+
+def apply_journal(users_path):
+    """Fold pending journals back into users.json, return the number of updates applied"""
+    files = journal_files(users_path)
+    if not files:
+        return 0
+
+    applied = sum(1 for path in files for _ in read_journal(path))
+    if applied:
+        # Fields around the users array are carried over unchanged
+        with UserStream(users_path) as users, \
+                JsonArrayWriter(users_path, key="users", header=users.header) as writer:
+            for user in merge_updates(users, merge_journals(files)):
+                writer.write(user)
+            writer.trailer = users.trailer()
+
+    for path in files:
+        os.remove(path)
+    return applied
@@ -0,0 +1,126 @@
+from entities import create_profile, login_user, register_mrd, register_user
+from records import PROFILE_FIELDS, make_group
+from tracing import traced
+
+# Per-user tasks of the user import and MRD steps.
+#
+# users-data-import.py and mrd-registration.py hand these tasks to their
+# RetryQueue, and replay-dead-letters.py runs the same tasks for the dead
+# letters those steps left behind. Each task factory also returns a
+# dead_letter() function describing the work still to do, which the queue
+# stores with the dead letter. Tokens are never part of it; replay logs in
+# again.
+
+
+def user_profile(user):
+    """The profile fields of a user record, as stored in dead letters and MRD groups"""
+    return {name: user[name] for name in PROFILE_FIELDS if name in user}
+
+
+def import_user(user, index, journal, counts, registered=False):
+    """Task that registers one user and creates their profile
+
+    Steps already done are remembered, so a retry picks up where the
+    previous attempt failed. With registered=True the user already exists
+    and only logs in for a fresh token before the profile call. Returns
+    (task, dead_letter); task() returns True once every step succeeded.
+    """
+    state = {"token": None, "is_new_user": True}
+
+    @traced("user", lambda: user["email"])
+    def task():
+        # Step 1: Register the user and get JWT token
+        if state["token"] is None:
+            token = "existing" if registered else register_user(user)
+            state["is_new_user"] = registered or token != "existing"
+
+            # If user already exists, try to login instead
+            if token == "existing":
+                token = login_user({
+                    "email": user["email"],
+                    "password": user["password"]
+                })
+
+            if not token:
+                return False
+
+            # Store JWT token in user data
+            state["token"] = token
+            user["jwt"] = token
+            journal.write(index, user)
+            counts["jwt_updated"] += 1
+            counts["registered"] += 1
+
+        # Step 2: Create profile ONLY for newly registered users
+        if state["is_new_user"]:
+            profile_data = {
+                "email": user["email"],
+                "contact": user["contact"],
+                "college": user["college"],
+                "year": user["year"],
+                "department": user["department"],
+                "rollNo": user["rollNo"]
+            }
+
+            if not create_profile(state["token"], profile_data):
+                return False
+            counts["profiles"] += 1
+        else:
+            print(f"ℹ️ Skipping profile creation for existing user: {user['email']}")
+        return True
+
+    def dead_letter():
+        # A user whose token was saved only misses the profile call
+        record = {key: value for key, value in user.items() if key != "jwt"}
+        return {"kind": "user", "index": index, "user": record,
+                "registered": registered or state["token"] is not None}
+
+    return task, dead_letter
+
+
+def register_user_mrd(user, index, due, legacy_gids, journal, groups, counts):
+    """Task that makes a user's due MRD registrations, resuming after a retry
+
+    Returns (task, finish, dead_letter); finish records the GIDs gathered so
+    far, along with the user's legacy GIDs, and is also used when the task
+    runs out of retries. task() returns True once every due registration
+    succeeded.
+    """
+    user_mrd_data = [dict(user, gid=gid) for gid in legacy_gids]
+    state = {"done": 0, "finished": False}
+
+    def finish(error=None):
+        if state["finished"]:
+            return
+        state["finished"] = True
+        successful_registrations = len(user_mrd_data) - len(legacy_gids)
+        if "gids" in user:
+            # The GIDs move to the registry, users.json keeps the user without them
+            del user["gids"]
+            journal.write(index, user)
+        if user_mrd_data:
+            groups.write(index, make_group(user, user_mrd_data))
+
+        counts["successful"] += successful_registrations
+        if due:
+            print(f"  Completed {successful_registrations}/{due} MRD registrations for {user['email']}")
+
+    @traced("user", lambda: user["email"])
+    def task():
+        # Perform the MRD registrations this user still needs
+        while state["done"] < due:
+            print(f"  MRD registration {state['done'] + 1}/{due}")
+            gid, mrd_data = register_mrd(user["email"])
+            state["done"] += 1
+
+            if gid:
+                user_mrd_data.append(mrd_data)
+        finish()
+        return len(user_mrd_data) - len(legacy_gids) >= due
+
+    def dead_letter():
+        # Registrations that failed for good are still owed, like the pending ones
+        missing = due - (len(user_mrd_data) - len(legacy_gids))
+        return {"kind": "mrd", "index": index, "user": user_profile(user), "count": missing}
+
+    return task, finish, dead_letter
@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from event_schedule import DEFAULT_DURATION_MINUTES, validate_schedule
+from seed_schemas import (Report, validate_admins, validate_users, validate_events,
+                          validate_team_csv)
+
+def validate_event_schedule(path, report, default_duration):
+    """Check events.json for venue and coordinator clashes"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            events = json.load(f).get('events')
+    except (OSError, ValueError, AttributeError):
+        # Reported by validate_events
+        return
+    if isinstance(events, list):
+        validate_schedule(events, report, default_duration, os.path.basename(path))
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate all seed inputs offline before any network call")
+    parser.add_argument('--admins-file', default="json/admins.json", help="Path to admins JSON file")
+    parser.add_argument('--users-file', default="json/users.json", help="Path to users JSON file")
+    parser.add_argument('--events-file', default="json/events.json", help="Path to events JSON file")
+    parser.add_argument('--csv-file', default="team-members/Contact Information.csv", help="Path to team CSV file")
+    parser.add_argument('--posters-dir', default="event-posters", help="Directory containing poster images")
+    parser.add_argument('--default-duration', type=int, default=DEFAULT_DURATION_MINUTES, help=f"Minutes an event without durationMinutes holds its venue (default: {DEFAULT_DURATION_MINUTES})")
+    parser.add_argument('--skip', type=str, default="", help="Comma-separated inputs to skip (admins,users,events,team)")
+    args = parser.parse_args()
+
+    skip = {name.strip() for name in args.skip.split(',') if name.strip()}
+    report = Report()
+    start_time = time.time()
+
+    # Validate each input, collecting every problem in one pass
+    inputs = [
+        ("admins", args.admins_file, lambda: validate_admins(args.admins_file, report)),
+        ("users", args.users_file, lambda: validate_users(args.users_file, report)),
+        ("events", args.events_file, lambda: (validate_events(args.events_file, report, args.posters_dir),
+                                              validate_event_schedule(args.events_file, report, args.default_duration))),
+        ("team", args.csv_file, lambda: validate_team_csv(args.csv_file, report)),
+    ]
+
+    for name, path, validate in inputs:
+        if name in skip:
+            continue
+        if not os.path.exists(path):
+            report.errors.append(f"{path} not found")
+            continue
+        validate()
+
+    elapsed_ms = (time.time() - start_time) * 1000
+
+    if report.warnings:
+        print(f"\n⚠️ {len(report.warnings)} warnings:")
+        for warning in report.warnings:
+            print(f"  - {warning}")
+
+    if report.errors:
+        print(f"\n❌ {len(report.errors)} errors:")
+        for error in report.errors:
+            print(f"  - {error}")
+
+    # Print summary
+    print("\n=== Seed Data Validation Summary ===")
+    for name, count in report.counts.items():
+        print(f"{name.capitalize()} checked: {count}")
+    print(f"Errors: {len(report.errors)}")
+    print(f"Warnings: {len(report.warnings)}")
+    print(f"Completed in {elapsed_ms:.1f} ms")
+
+    if not report.ok:
+        sys.exit(1)
+    print("✅ All seed inputs are valid")
+
+if __name__ == "__main__":
+    main()